@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+import fx_history
+from grid_sweep import evaluate_terms
+from updated_calculator_logic_11_26_v2 import (
+    POLICY_CONFIG,
+    CapexTiers,
+    FxTable,
+    build_tier_table,
+    capex_tiers,
+    first_term_meeting_target,
+    single_project,
+)
+
+# state of a backtest worker process, set once by _init_worker
+_WORKER: dict = {}
+
+
+def snapshot_policy_table(country: str, days, fx_rates) -> pd.DataFrame:
+    """
+    The project country's build_country_policy_table row at every snapshot,
+    stacked into one table indexed "<country> <date>", with that day's rate
+    as FXrate.
+    """
+    config = pd.DataFrame.from_dict(POLICY_CONFIG, orient="index")
+    if country not in config.index:
+        raise KeyError(f"Country '{country}' not found in policy table.")
+    table = config.loc[[country] * len(days)]
+    table.insert(0, "FXrate", np.asarray(fx_rates, dtype=float))
+    table.index = pd.Index([f"{country} {day}" for day in days])
+    return table
+
+
+def _backtest_chunk(task, tier_table: CapexTiers) -> np.ndarray:
+    # (dates, terms, [IRR %, Project NPV]) for one chunk of snapshot dates:
+    # every date is its own row of the policy / FX tables, so one prepare and
+    # one schedule cover the whole chunk
+    project, days, fx_rates, max_term = task
+    country = project.at[0, "project_country"]
+    policy_table = snapshot_policy_table(country, days, fx_rates)
+    projects = pd.concat([project] * len(days), ignore_index=True)
+    projects["project_country"] = policy_table.index
+    return evaluate_terms(
+        projects,
+        policy_table,
+        tier_table,
+        FxTable(policy_table, max_term),
+        np.arange(1, max_term + 1),
+    )
+
+
+def _init_worker(tier_table: CapexTiers) -> None:
+    _WORKER["tier_table"] = tier_table
+
+
+def _worker_chunk(task) -> np.ndarray:
+    return _backtest_chunk(task, _WORKER["tier_table"])
+
+
+def run_backtest(
+    project,
+    start: date,
+    end: date,
+    max_term: int = 25,
+    target_irr: float = 12,
+    store_dir: str | None = None,
+    workers: int = 1,
+    chunk_size: int = 64,
+    tier_table: pd.DataFrame | CapexTiers | None = None,
+) -> pd.DataFrame:
+    """
+    Re-price one project at every FX snapshot in fx_history between start
+    and end.
+
+    Each date gets the build_country_policy_table / FxTable of that
+    day's rate for the project's country (snapshot_policy_table); the
+    project's local-currency inputs stay as given. Dates are evaluated in
+    chunks of chunk_size as one (dates x years) schedule each, with every PPA
+    term 1..max_term derived from it (grid_sweep.evaluate_terms), and the
+    chunks run across a process pool when workers > 1, whose workers receive
+    the tier table once at start-up.
+
+    tier_table (build_tier_table() by default) prices CAPEX; with a
+    CapexTiers, the project country's own table is used if it has one.
+
+    Returns one row per date: the first term whose IRR reaches target_irr
+    (NaN when none does), the IRR and Project NPV (project cashflow at
+    NPV_DISCOUNT_RATE) at that term, and the project country's FX rate.
+    """
+    project = single_project(project, "Backtest")
+
+    country = project.at[0, "project_country"]
+    history = fx_history.read_range(start, end, store_dir)
+    if country not in history.columns:
+        raise KeyError(f"Country '{country}' not found in FX history.")
+    history = history[country].dropna()
+    if history.empty:
+        raise KeyError(f"No FX rates between {start} and {end} in FX history.")
+    days = [timestamp.date() for timestamp in history.index]
+    fx_rates = history.to_numpy()
+    # snapshot rows are named "<country> <date>", so resolve the country's
+    # tier table here
+    tier_table = capex_tiers(
+        build_tier_table() if tier_table is None else tier_table
+    ).for_country(country)
+
+    tasks = [
+        (project, days[i : i + chunk_size], fx_rates[i : i + chunk_size], max_term)
+        for i in range(0, len(days), chunk_size)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers, initializer=_init_worker, initargs=(tier_table,)
+        ) as pool:
+            results = np.concatenate(list(pool.map(_worker_chunk, tasks)))
+    else:
+        results = np.concatenate([_backtest_chunk(task, tier_table) for task in tasks])
+
+    irr, npv = results[..., 0], results[..., 1]
+    first, found = first_term_meeting_target(irr, target_irr)
+    rows = np.arange(len(days))
+    series = pd.DataFrame(
+        {
+            "Optimal Term": np.where(found, first + 1, np.nan),
+            "Unlevered Post-Tax IRR (%)": np.where(found, irr[rows, first], np.nan),
+            "Project NPV": np.where(found, npv[rows, first], np.nan),
+            "FX Rate": fx_rates,
+        },
+        index=pd.DatetimeIndex(days, name="Date"),
+    )
+    return series
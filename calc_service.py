@@ -0,0 +1,528 @@
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from http import HTTPStatus
+
+import numpy as np
+import pandas as pd
+
+import irr_solver
+import policy_registry
+from concurrent_calc import sample_projects
+from fx_provider import (
+    AsyncFxProvider,
+    fallback_fx_payload,
+    make_http_fetcher,
+    start_stand_in_server,
+)
+from monte_carlo import NPV_DISCOUNT_RATE
+from updated_calculator_logic_11_26_v2 import (
+    PORTFOLIO_REQUIRED_COLUMNS,
+    PROJECT_INPUT_DEFAULTS,
+    CapexTiers,
+    FxTable,
+    PolicySnapshot,
+    build_country_policy_table,
+    build_schedule_inputs,
+    build_tier_table,
+    build_unlevered_schedule,
+    capex_tiers,
+    first_term_meeting_target,
+    term_cashflows,
+    term_ebitda,
+)
+
+SERVICE_BATCH_WINDOW = 0.005  # seconds a batch stays open for more requests
+SERVICE_MAX_BATCH = 256  # projects per batch evaluation
+SERVICE_TIMEOUT = 10.0  # default per-request timeout, seconds
+SERVICE_MAX_BODY = 1024 * 1024  # bytes
+SERVICE_MAX_TERM = 50  # longest PPA term a request may search, years
+# inputs that must be positive; every other numeric input must be >= 0
+SERVICE_POSITIVE_INPUTS: tuple[str, ...] = (
+    "project_capacity_kw",
+    "epc_cost_excl_vat",
+    "current_electricity_tariff",
+    "electricity_forecast_p90",
+)
+
+# compiled tables of a service worker process; one pool per policy version
+_WORKER: dict = {}
+
+
+def _init_worker(tier_table: pd.DataFrame, policy: PolicySnapshot) -> None:
+    _WORKER["policy"], _WORKER["fx_table"] = policy, FxTable(policy)
+    _WORKER["tier_table"] = CapexTiers(tier_table)
+
+
+def _evaluate(inputs_list: list[dict], max_term: int, target_irr: float) -> list:
+    policy, tier_table = _WORKER["policy"], _WORKER["tier_table"]
+    projects = pd.DataFrame(
+        [{**PROJECT_INPUT_DEFAULTS, **inputs} for inputs in inputs_list]
+    )
+    schedule_inputs = build_schedule_inputs(
+        projects, policy, tier_table, _WORKER["fx_table"], max_term
+    )
+    schedule = build_unlevered_schedule(max_term, **schedule_inputs)
+    cashflows = term_cashflows(
+        schedule, schedule_inputs["policy"], schedule_inputs["dismantling_cost"]
+    )
+    ebitda = term_ebitda(schedule, schedule_inputs["dismantling_cost"])
+    discount = (1 + NPV_DISCOUNT_RATE) ** -np.arange(max_term + 1)
+    irr = irr_solver.irr_by_term(cashflows) * 100
+    npv = ebitda[..., 1:] @ discount[1:]
+
+    firsts, found = first_term_meeting_target(irr, target_irr)
+    results = []
+    for row in range(len(projects)):
+        first = int(firsts[row]) if found[row] else None
+        results.append(
+            {
+                "Country": projects.at[row, "project_country"],
+                "Optimal Term": None if first is None else first + 1,
+                "Unlevered Post-Tax IRR (%)": (
+                    None if first is None else float(irr[row, first])
+                ),
+                "NPV": None if first is None else float(npv[row, first]),
+                "IRR Curve": [None if np.isnan(v) else float(v) for v in irr[row]],
+            }
+        )
+    return results
+
+
+def evaluate_batch(task) -> list:
+    """
+    Optimal term, IRR, NPV and IRR curve of every project of one batch, as
+    one (projects x years) array pass; runs in a worker process. NPV is the
+    EBITDA of years 1..term at NPV_DISCOUNT_RATE, as __main__ and
+    result_store.compute_quote.
+
+    If the batch fails, its projects are evaluated one by one, so a project
+    the engine rejects gets its own exception in place of its result and
+    the others are unaffected.
+    """
+    version, inputs_list, max_term, target_irr = task
+    if version != _WORKER["policy"].version:
+        raise RuntimeError(f"Worker has policy version {_WORKER['policy'].version}.")
+    try:
+        return _evaluate(inputs_list, max_term, target_irr)
+    except Exception:
+        if len(inputs_list) == 1:
+            raise
+    results = []
+    for inputs in inputs_list:
+        try:
+            results.extend(_evaluate([inputs], max_term, target_irr))
+        except Exception as exc:
+            results.append(exc)
+    return results
+
+
+class CalculationService:
+    """
+    Long-lived calculation service with a warm process pool whose workers
+    receive the policy snapshot and compile the FX and tier tables once, at
+    start-up. The policy is policy_registry's active snapshot: the service
+    installs it (or reloads it) with the rates of `fx`, an AsyncFxProvider,
+    when they change, and follows every registry reload through an
+    invalidation hook. Each new snapshot gets a new pool, warmed in the
+    background while the old one keeps serving, then swapped in.
+
+    calculate() queues one project; requests arriving within batch_window of
+    the first one of a batch (same max_term and target_irr, up to max_batch)
+    are evaluated together by evaluate_batch in one worker. A request that
+    times out or is cancelled before its batch leaves the queue is dropped
+    from it; once the batch is running its result is discarded.
+    """
+
+    def __init__(
+        self,
+        fx: AsyncFxProvider,
+        tier_table: pd.DataFrame | None = None,
+        workers: int = 2,
+        batch_window: float = SERVICE_BATCH_WINDOW,
+        max_batch: int = SERVICE_MAX_BATCH,
+    ):
+        self.fx = fx
+        self.tier_table = build_tier_table() if tier_table is None else tier_table
+        self.tiers = capex_tiers(self.tier_table)
+        self.workers = workers
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.pool: ProcessPoolExecutor | None = None
+        self.policy: PolicySnapshot | None = None
+        self._fx_map: dict | None = None
+        self._wanted: PolicySnapshot | None = None  # newest registry snapshot
+        self._loading: asyncio.Task | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._pending: dict[tuple, list] = {}  # (max_term, target_irr) -> requests
+        self._tasks: set[asyncio.Task] = set()
+        self.stats = {"requests": 0, "batches": 0, "projects": 0, "timeouts": 0}
+
+    async def start(self) -> None:
+        self._loop = asyncio.get_running_loop()
+        policy_registry.register_invalidation(self._policy_changed)
+        await self._refresh_policy()
+        self._want_policy(policy_registry.active_snapshot())
+        await self._loading
+
+    async def close(self) -> None:
+        policy_registry.unregister_invalidation(self._policy_changed)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+        await self.fx.aclose()
+
+    async def _refresh_policy(self) -> None:
+        # new FX rates go through the registry like any other policy change
+        fx_map = await self.fx.get_rates()
+        if fx_map == self._fx_map:
+            return
+        self._fx_map = fx_map
+        try:
+            policy_registry.install_policy(build_country_policy_table(fx_map))
+        except RuntimeError:
+            policy_registry.reload_policy(fx_map=fx_map)
+
+    def _policy_changed(self, snapshot: PolicySnapshot, changed: list) -> None:
+        # registry invalidation hook: runs on the reloading thread
+        self._loop.call_soon_threadsafe(self._want_policy, snapshot)
+
+    def _want_policy(self, snapshot: PolicySnapshot) -> None:
+        if self._wanted is not None and snapshot.version <= self._wanted.version:
+            return
+        self._wanted = snapshot
+        if self._loading is None or self._loading.done():
+            self._loading = self._loop.create_task(self._load_wanted())
+            self._tasks.add(self._loading)
+            self._loading.add_done_callback(self._tasks.discard)
+
+    async def _load_wanted(self) -> None:
+        # reloads during a load are picked up when it finishes
+        while self._wanted is not self.policy:
+            await self._load_policy(self._wanted)
+
+    async def _load_policy(self, policy: PolicySnapshot) -> None:
+        version = policy.version
+        pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.tier_table, policy),
+        )
+        try:
+            # warm every worker: imports and compiled tables
+            loop = asyncio.get_running_loop()
+            task = (version, sample_projects(policy)[:1], 25, 12)
+            await asyncio.gather(
+                *(
+                    loop.run_in_executor(pool, evaluate_batch, task)
+                    for _ in range(self.workers)
+                )
+            )
+        except BaseException:
+            pool.shutdown(cancel_futures=True)
+            raise
+        previous, self.pool, self.policy = self.pool, pool, policy
+        if previous is not None:
+            previous.shutdown(wait=False)  # its running batches still finish
+
+    @staticmethod
+    def validate_options(
+        max_term=25, target_irr=12, timeout=SERVICE_TIMEOUT
+    ) -> dict[str, float]:
+        """
+        The calculation options, checked: max_term a whole number of years from
+        1 to SERVICE_MAX_TERM, target_irr a finite number and timeout a
+        positive finite number of seconds (or None for no timeout).
+        """
+        if isinstance(max_term, float) and max_term.is_integer():
+            max_term = int(max_term)
+        if not isinstance(max_term, int) or isinstance(max_term, bool):
+            raise TypeError("Option 'max_term' must be a whole number of years.")
+        if not 1 <= max_term <= SERVICE_MAX_TERM:
+            raise ValueError(
+                f"Option 'max_term' must be from 1 to {SERVICE_MAX_TERM} years."
+            )
+        numbers = {"target_irr": target_irr, "timeout": timeout}
+        for name, value in numbers.items():
+            if name == "timeout" and value is None:
+                continue
+            if (
+                not isinstance(value, (int, float))
+                or isinstance(value, bool)
+                or not np.isfinite(value)
+            ):
+                raise TypeError(f"Option '{name}' must be a finite number.")
+        if timeout is not None and timeout <= 0:
+            raise ValueError("Option 'timeout' must be positive.")
+        return {
+            "max_term": max_term,
+            "target_irr": float(target_irr),
+            "timeout": None if timeout is None else float(timeout),
+        }
+
+    def validate(self, inputs: dict) -> dict:
+        """
+        The project's calculation inputs, checked before they join a batch so
+        one bad project cannot fail the others: the required inputs present, a
+        known country, finite numbers (SERVICE_POSITIVE_INPUTS positive, the
+        rest not negative) and a capacity the tier table prices. Other keys
+        are dropped.
+        """
+        missing = [c for c in PORTFOLIO_REQUIRED_COLUMNS if c not in inputs]
+        if missing:
+            raise KeyError(f"Project is missing inputs: {', '.join(missing)}")
+        country = inputs["project_country"]
+        self.policy.position(country)
+        checked = {"project_country": country}
+        for name in (*PORTFOLIO_REQUIRED_COLUMNS, *PROJECT_INPUT_DEFAULTS):
+            if name not in inputs or name == "project_country":
+                continue
+            value = inputs[name]
+            if not isinstance(value, (int, float)) or not np.isfinite(value):
+                raise TypeError(f"Input '{name}' must be a finite number.")
+            if value < 0 or (value == 0 and name in SERVICE_POSITIVE_INPUTS):
+                raise ValueError(f"Input '{name}' must be positive.")
+            checked[name] = value
+        self.tiers.price(checked["project_capacity_kw"], country)
+        return checked
+
+    async def calculate(
+        self,
+        inputs: dict,
+        max_term: int = 25,
+        target_irr: float = 12,
+        timeout: float | None = SERVICE_TIMEOUT,
+    ) -> dict:
+        """Result of one project (see evaluate_batch), via the micro-batcher."""
+        options = self.validate_options(max_term, target_irr, timeout)
+        await self._refresh_policy()
+        inputs = self.validate(inputs)
+        self.stats["requests"] += 1
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        key = (options["max_term"], options["target_irr"])
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = []
+            task = loop.create_task(self._dispatch(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        batch.append((inputs, future))
+        if len(batch) >= self.max_batch:
+            del self._pending[key]
+            self._run(key, batch)
+        try:
+            return await asyncio.wait_for(future, options["timeout"])
+        except asyncio.TimeoutError:
+            self.stats["timeouts"] += 1
+            raise
+
+    async def _dispatch(self, key: tuple) -> None:
+        await asyncio.sleep(self.batch_window)
+        batch = self._pending.pop(key, None)
+        if batch is not None:
+            self._run(key, batch)
+
+    def _run(self, key: tuple, batch: list) -> None:
+        # requests cancelled (or timed out) while queued are left out
+        batch = [(inputs, future) for inputs, future in batch if not future.done()]
+        if not batch:
+            return
+        inputs_list = [inputs for inputs, _ in batch]
+        task = (self.policy.version, inputs_list, *key)
+        running = asyncio.get_running_loop().run_in_executor(
+            self.pool, evaluate_batch, task
+        )
+        self.stats["batches"] += 1
+        self.stats["projects"] += len(batch)
+
+        def deliver(done: asyncio.Future) -> None:
+            for i, (_, future) in enumerate(batch):
+                if future.done():
+                    continue
+                if done.cancelled():
+                    future.cancel()
+                elif done.exception() is not None:
+                    future.set_exception(done.exception())
+                elif isinstance(done.result()[i], Exception):
+                    future.set_exception(done.result()[i])
+                else:
+                    future.set_result(done.result()[i])
+
+        running.add_done_callback(deliver)
+
+    # --- HTTP/JSON front end ---------------------------------------------------
+
+    async def handle(self, method: str, path: str, body: bytes) -> tuple[int, dict]:
+        """
+        Route one request: GET /health, or POST /calculate with a project's
+        inputs as JSON, either alone or as {"project": {...}} / {"projects":
+        [...]} with optional max_term, target_irr and timeout (seconds).
+        """
+        if method == "GET" and path == "/health":
+            return HTTPStatus.OK, {
+                "status": "ok",
+                "policy_version": self.policy.version,
+                "fx_fallback": bool(self.fx.payload.get("fallback", False)),
+                **self.stats,
+            }
+        if path != "/calculate":
+            return HTTPStatus.NOT_FOUND, {"error": f"No route {method} {path}"}
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": "Use POST /calculate"}
+
+        try:
+            request = json.loads(body or b"{}")
+            projects = request.get("projects") or [request.get("project", request)]
+            options = self.validate_options(
+                request.get("max_term", 25),
+                request.get("target_irr", 12),
+                request.get("timeout", SERVICE_TIMEOUT),
+            )
+            projects = [self.validate(inputs) for inputs in projects]
+        except (ValueError, KeyError, TypeError, AttributeError) as exc:
+            return HTTPStatus.BAD_REQUEST, {"error": str(exc.args[0])}
+
+        try:
+            results = await asyncio.gather(
+                *(self.calculate(inputs, **options) for inputs in projects)
+            )
+        except asyncio.TimeoutError:
+            return HTTPStatus.GATEWAY_TIMEOUT, {"error": "Calculation timed out."}
+        except ValueError as exc:
+            return HTTPStatus.BAD_REQUEST, {"error": str(exc)}
+        except Exception as exc:
+            return HTTPStatus.INTERNAL_SERVER_ERROR, {"error": repr(exc)}
+        if "projects" in request:
+            return HTTPStatus.OK, {"results": results}
+        return HTTPStatus.OK, results[0]
+
+    async def serve_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        # HTTP/1.1 with keep-alive; a client that disconnects cancels its
+        # pending request
+        leftover = b""  # first byte of a pipelined request, read while waiting
+        try:
+            while True:
+                request_line = leftover + await reader.readline()
+                leftover = b""
+                if not request_line.strip():
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                keep_alive = headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length", 0))
+                if length > SERVICE_MAX_BODY:
+                    status = HTTPStatus.REQUEST_ENTITY_TOO_LARGE
+                    payload = {"error": "Request body too large."}
+                    keep_alive = False
+                else:
+                    body = await reader.readexactly(length) if length else b""
+                    handling = asyncio.ensure_future(self.handle(method, path, body))
+                    closed = asyncio.ensure_future(reader.read(1))
+                    await asyncio.wait(
+                        {handling, closed}, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    if closed.done() and not closed.result() and not handling.done():
+                        handling.cancel()  # client went away
+                        await asyncio.gather(handling, return_exceptions=True)
+                        break
+                    status, payload = await handling
+                    closed.cancel()
+                    leftover = (await asyncio.gather(closed, return_exceptions=True))[0]
+                    if not isinstance(leftover, bytes):
+                        leftover = b""
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+                    "Content-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n"
+                    f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode()
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+async def run_service(
+    host: str = "127.0.0.1",
+    port: int = 8080,
+    workers: int = 2,
+    batch_window: float = SERVICE_BATCH_WINDOW,
+    fx_url: str | None = None,
+    offline: bool = False,
+) -> None:
+    """
+    Serve CalculationService over HTTP until cancelled. offline=True serves
+    FX from a local stand-in server with the static development rates, with
+    an empty temporary cache directory so no cached live rates are read.
+    """
+    stand_in = cache_dir = None
+    if offline:
+        # served as regular rates, so the provider does not keep refreshing
+        payload = dict(fallback_fx_payload(), fallback=False)
+        stand_in, fx_url = start_stand_in_server(payload)
+        cache_dir = tempfile.TemporaryDirectory(prefix="calc_service_fx_")
+    fetch, session = (
+        make_http_fetcher(fx_url, params={}) if fx_url else make_http_fetcher()
+    )
+    service = CalculationService(
+        AsyncFxProvider(
+            fetch,
+            cache_dir=None if cache_dir is None else cache_dir.name,
+            write_cache=not offline,
+        ),
+        workers=workers,
+        batch_window=batch_window,
+    )
+    await service.start()
+    server = await asyncio.start_server(service.serve_connection, host, port)
+    print(f"Serving on http://{host}:{server.sockets[0].getsockname()[1]}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+        session.close()
+        if stand_in is not None:
+            stand_in.shutdown()
+            cache_dir.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Calculation HTTP/JSON service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--batch-ms", type=float, default=SERVICE_BATCH_WINDOW * 1000)
+    parser.add_argument("--fx-url", default=None)
+    parser.add_argument("--offline", action="store_true")
+    args = parser.parse_args()
+    try:
+        asyncio.run(
+            run_service(
+                args.host,
+                args.port,
+                args.workers,
+                args.batch_ms / 1000,
+                args.fx_url,
+                args.offline,
+            )
+        )
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+from grid_sweep import SWEEP_METRICS, SWEEP_PROJECT, evaluate_terms, sweep_projects
+from updated_calculator_logic_11_26_v2 import CapexTiers, capex_tiers
+
+LAND_M2_PER_KWP = 10.0  # ground-mount land use; the __main__ site is 1 MW on 10,000 m2
+CAPACITY_OBJECTIVES = {"Project NPV": "Project NPV", "IRR": "Unlevered IRR (%)"}
+
+
+def candidate_capacities(
+    min_kw: float,
+    max_kw: float,
+    n: int,
+    tier_table: pd.DataFrame | CapexTiers,
+    country: str | None = None,
+) -> np.ndarray:
+    """
+    n evenly spaced capacities in [min_kw, max_kw], plus the tier breakpoints
+    of the country's tier table inside that range (where the CAPEX slope
+    changes), sorted and unique.
+    """
+    tiers = capex_tiers(tier_table)
+    size_above = tiers.tables[tiers.country_tables.get(country, 0)][0]
+    breakpoints = size_above[(size_above >= min_kw) & (size_above <= max_kw)]
+    return np.unique(np.concatenate([np.linspace(min_kw, max_kw, n), breakpoints]))
+
+
+def evaluate_capacities(
+    capacities,
+    tariff: float,
+    country: str,
+    ppa_term: int,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table,
+    project: dict[str, float] = SWEEP_PROJECT,
+    land_rent_expense: float | None = None,
+) -> pd.DataFrame:
+    """
+    Unlevered IRR (%) and Project NPV of the sweep_projects project at every
+    capacity, as one array pass. `land_rent_expense` (local currency per year)
+    replaces the per-kWp land rent with a fixed rent for the whole site.
+    """
+    capacities = np.asarray(capacities, dtype=float)
+    projects = sweep_projects(
+        capacities,
+        np.full(len(capacities), tariff),
+        [country] * len(capacities),
+        policy_table,
+        fx_table,
+        project,
+    )
+    if land_rent_expense is not None:
+        projects["land_rent_expense"] = land_rent_expense
+    metrics = evaluate_terms(
+        projects, policy_table, tier_table, fx_table, np.array([ppa_term])
+    )[:, 0]
+    return pd.DataFrame(
+        metrics,
+        index=pd.Index(capacities, name="Capacity (kW)"),
+        columns=SWEEP_METRICS,
+    )
+
+
+def optimize_capacity(
+    tariff: float,
+    country: str,
+    ppa_term: int,
+    surface_area_m2: float,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table,
+    objective: str = "Project NPV",
+    project: dict[str, float] = SWEEP_PROJECT,
+    land_rent_expense: float | None = None,
+    m2_per_kwp: float = LAND_M2_PER_KWP,
+    min_kw: float | None = None,
+    n: int = 2_000,
+    refine: int = 200,
+) -> Tuple[pd.Series, pd.DataFrame]:
+    """
+    Capacity that maximizes Project NPV (cashflow at NPV_DISCOUNT_RATE) or
+    IRR (`objective`) for one tariff (USD/kWh), country and PPA term, within
+    the land limit surface_area_m2 / m2_per_kwp.
+
+    n candidate sizes from min_kw (default: max / n) to the land limit, plus
+    the tier breakpoints in between, are evaluated in one array pass through
+    the full cashflow model (evaluate_capacities); then `refine` sizes between
+    the best candidate's neighbours are evaluated the same way.
+
+    Returns the optimum (capacity, IRR, Project NPV) and the curve of every
+    evaluated size, sorted by capacity.
+    """
+    if objective not in CAPACITY_OBJECTIVES:
+        raise KeyError(
+            f"Objective '{objective}' not found in {', '.join(CAPACITY_OBJECTIVES)}."
+        )
+    max_kw = surface_area_m2 / m2_per_kwp
+    min_kw = max_kw / n if min_kw is None else min_kw
+    if not 0 < min_kw <= max_kw:
+        raise ValueError(
+            f"No capacity fits: minimum {min_kw} kW, land limit {max_kw} kW."
+        )
+    column = CAPACITY_OBJECTIVES[objective]
+    args = (tariff, country, ppa_term, policy_table, tier_table, fx_table, project)
+
+    capacities = candidate_capacities(min_kw, max_kw, n, tier_table, country)
+    curve = evaluate_capacities(capacities, *args, land_rent_expense)
+    values = curve[column].to_numpy()
+    if np.isnan(values).all():
+        raise ValueError(f"No capacity has a finite {objective}.")
+    best = int(np.nanargmax(values))
+
+    if refine and len(capacities) > 1:
+        lower = capacities[max(best - 1, 0)]
+        upper = capacities[min(best + 1, len(capacities) - 1)]
+        fine = evaluate_capacities(
+            np.linspace(lower, upper, refine + 2)[1:-1], *args, land_rent_expense
+        )
+        curve = pd.concat([curve, fine]).sort_index()
+        curve = curve[~curve.index.duplicated()]
+
+    optimum = curve.loc[curve[column].idxmax()]
+    optimum["Capacity (kW)"] = optimum.name
+    return optimum, curve
@@ -0,0 +1,253 @@
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from updated_calculator_logic_11_26_v2 import (
+    CapexTiers,
+    FxTable,
+    PolicySnapshot,
+    PreparedProject,
+    build_tier_table,
+    capex_tiers,
+    dev_build_country_policy_table,
+)
+
+# One sample project per country for the stress check and the benchmark; money
+# in USD, converted at the year-1 rate (the __main__ project is 1 MW in Colombia).
+SAMPLE_PROJECT_USD: dict[str, float] = {
+    "project_capacity_kw": 1_000,
+    "epc_cost_excl_vat": 520_000,
+    "epc_cost_vat": 84,
+    "current_electricity_tariff": 0.09,
+    "electricity_forecast_p90": 1_275_000,
+    "land_rent_expense": 5_582.5,
+    "percentage_invested_by_offtaker": 0.12,
+    "recs_enabled": True,
+}
+LOCAL_CURRENCY_INPUTS = (
+    "epc_cost_excl_vat",
+    "epc_cost_vat",
+    "current_electricity_tariff",
+    "land_rent_expense",
+)
+
+
+def evaluate_project(
+    inputs: dict,
+    policy: PolicySnapshot,
+    tier_table: CapexTiers,
+    fx_table: FxTable,
+    max_term: int = 25,
+    target_irr: float = 12,
+) -> dict:
+    """
+    Optimal term, IRR and NPV (EBITDA at 10%, as __main__) of one project.
+
+    A pure function of its arguments: the tables are only read, so any
+    number of threads may call it at once with the same tables.
+    """
+    project = PreparedProject(inputs, policy, tier_table, fx_table)
+    irr_curve, optimal_term = project.irr_curve(max_term, target_irr)
+    return {
+        "Optimal Term": optimal_term,
+        "Unlevered Post-Tax IRR (%)": (
+            float(irr_curve[optimal_term]) if optimal_term is not None else None
+        ),
+        "NPV": project.npv(optimal_term) if optimal_term is not None else None,
+        "IRR Curve": irr_curve.to_numpy(),
+    }
+
+
+class CalculationPool:
+    """
+    Thread pool evaluating projects against one set of compiled tables.
+
+    The policy table, tier table and FX table are compiled once
+    (PolicySnapshot, CapexTiers, FxTable) and shared read-only by every task;
+    each task carries all of its own state, so results do not depend on the
+    number of threads or on what else runs. On free-threaded CPython (3.13t)
+    the tasks run in parallel; with the GIL, NumPy releases it inside larger
+    array operations only.
+    """
+
+    def __init__(
+        self,
+        policy_table: pd.DataFrame | PolicySnapshot,
+        tier_table: pd.DataFrame | CapexTiers,
+        fx_table: FxTable | None = None,
+        max_workers: int | None = None,
+    ):
+        self.policy = (
+            policy_table
+            if isinstance(policy_table, PolicySnapshot)
+            else PolicySnapshot(policy_table)
+        )
+        self.tier_table = capex_tiers(tier_table)
+        self.fx_table = fx_table if fx_table is not None else FxTable(self.policy)
+        self.executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix="calc"
+        )
+
+    def submit(
+        self, inputs: dict, max_term: int = 25, target_irr: float = 12
+    ) -> Future:
+        return self.executor.submit(
+            evaluate_project,
+            inputs,
+            self.policy,
+            self.tier_table,
+            self.fx_table,
+            max_term,
+            target_irr,
+        )
+
+    def map(self, inputs_list, max_term: int = 25, target_irr: float = 12) -> list:
+        """evaluate_project for every inputs dict, in order."""
+        futures = [self.submit(inputs, max_term, target_irr) for inputs in inputs_list]
+        return [future.result() for future in futures]
+
+    def close(self) -> None:
+        self.executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def sample_projects(
+    policy: PolicySnapshot, project: dict[str, float] = SAMPLE_PROJECT_USD
+) -> list[dict]:
+    """`project` in every country of the policy snapshot, in local currency."""
+    projects = []
+    for country in policy.countries:
+        fx_rate = policy.lookup(country)["FXrate"]
+        inputs = dict(project, project_country=country)
+        for name in LOCAL_CURRENCY_INPUTS:
+            inputs[name] = project[name] * fx_rate
+        projects.append(inputs)
+    return projects
+
+
+def _same_result(a: dict, b: dict) -> bool:
+    return all(
+        (
+            np.array_equal(a[key], b[key], equal_nan=True)
+            if key == "IRR Curve"
+            else a[key] == b[key]
+        )
+        for key in a
+    )
+
+
+def stress_check(
+    n_threads: int = 64,
+    rounds: int = 8,
+    policy_table: pd.DataFrame | None = None,
+    max_terms=(25, 30, 40),
+) -> dict:
+    """
+    Evaluate the sample projects from n_threads threads released together,
+    `rounds` times each, and compare every result with a serial run.
+
+    Each thread walks the projects and max_terms in a different order, so
+    threads also race on the FX table's lazy extension (a fresh FxTable
+    starts at 25 years). Returns the number of evaluations and of results
+    that differ from the serial ones (expected: 0).
+    """
+    policy = PolicySnapshot(
+        dev_build_country_policy_table() if policy_table is None else policy_table
+    )
+    tier_table = CapexTiers(build_tier_table())
+    tasks = [
+        (inputs, max_term)
+        for inputs in sample_projects(policy)
+        for max_term in max_terms
+    ]
+    expected = [
+        evaluate_project(inputs, policy, tier_table, FxTable(policy), max_term=max_term)
+        for inputs, max_term in tasks
+    ]
+
+    fx_table = FxTable(policy)
+    start = threading.Barrier(n_threads)
+    mismatches = [0] * n_threads
+
+    def worker(thread: int) -> None:
+        order = np.random.default_rng(thread).permutation(len(tasks))
+        start.wait()
+        for _ in range(rounds):
+            for i in order:
+                inputs, max_term = tasks[i]
+                result = evaluate_project(
+                    inputs, policy, tier_table, fx_table, max_term=max_term
+                )
+                mismatches[thread] += not _same_result(result, expected[i])
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return {
+        "threads": n_threads,
+        "evaluations": n_threads * rounds * len(tasks),
+        "mismatches": sum(mismatches),
+    }
+
+
+def gil_enabled() -> bool:
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return True if is_gil_enabled is None else is_gil_enabled()
+
+
+def scaling_benchmark(
+    thread_counts=(1, 2, 4, 8, 16, 32, 64),
+    n_tasks: int = 512,
+    policy_table: pd.DataFrame | None = None,
+) -> pd.DataFrame:
+    """
+    Throughput of CalculationPool.map over n_tasks sample projects for each
+    thread count, with the speed-up over one thread. Run it on a
+    free-threaded build (python3.13t, `python3.13t concurrent_calc.py`) to
+    measure parallel scaling; with the GIL the speed-up stays near 1.
+    """
+    policy_table = (
+        dev_build_country_policy_table() if policy_table is None else policy_table
+    )
+    rows = []
+    for n_threads in thread_counts:
+        with CalculationPool(
+            policy_table, build_tier_table(), max_workers=n_threads
+        ) as pool:
+            projects = sample_projects(pool.policy)
+            tasks = [projects[i % len(projects)] for i in range(n_tasks)]
+            pool.map(tasks[:n_threads])  # start the threads
+            started = time.perf_counter()
+            pool.map(tasks)
+            elapsed = time.perf_counter() - started
+        rows.append(
+            {
+                "Threads": n_threads,
+                "Seconds": elapsed,
+                "Projects / s": n_tasks / elapsed,
+            }
+        )
+    table = pd.DataFrame(rows).set_index("Threads")
+    table["Speed-up"] = table["Projects / s"] / table["Projects / s"].iloc[0]
+    return table
+
+
+if __name__ == "__main__":
+    print(f"Python {sys.version.split()[0]}, GIL enabled: {gil_enabled()}")
+    print(f"CPUs: {os.cpu_count()}")
+    print(stress_check())
+    print(scaling_benchmark())
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+from grid_sweep import evaluate_terms
+from updated_calculator_logic_11_26_v2 import (
+    PolicySnapshot,
+    first_term_meeting_target,
+    lookup_fx_paths,
+    single_project,
+)
+
+# portfolio columns in the project country's currency; converted to each
+# compared country at the ratio of the year-1 FX rates
+LOCAL_CURRENCY_COLUMNS: tuple[str, ...] = (
+    "epc_cost_excl_vat",
+    "epc_cost_vat",
+    "current_electricity_tariff",
+    "land_rent_expense",
+)
+COMPARISON_COLUMNS: tuple[str, ...] = (
+    "Optimal Term",
+    "Unlevered Post-Tax IRR (%)",
+    "Project NPV (USD)",
+    "Max Term IRR (%)",
+)
+
+
+def broadcast_project(
+    project,
+    policy_table: pd.DataFrame | PolicySnapshot,
+    fx_table,
+    countries=None,
+) -> pd.DataFrame:
+    """
+    One copy of a one-row portfolio table per country (default: every
+    country of the policy table), with the LOCAL_CURRENCY_COLUMNS converted
+    from the project country's currency to each country's.
+    """
+    project = single_project(project, "Country comparison")
+    if countries is None:
+        countries = (
+            policy_table.countries
+            if isinstance(policy_table, PolicySnapshot)
+            else policy_table.index
+        )
+    countries = list(countries)
+
+    home = project["project_country"].iloc[0]
+    fx_rate = lookup_fx_paths([home, *countries], fx_table, 1)[:, 0]
+    projects = pd.concat([project] * len(countries), ignore_index=True)
+    projects["project_country"] = countries
+    for name in LOCAL_CURRENCY_COLUMNS:
+        projects[name] = projects[name].to_numpy(dtype=float) * fx_rate[1:] / fx_rate[0]
+    return projects
+
+
+def compare_countries(
+    project,
+    policy_table: pd.DataFrame | PolicySnapshot,
+    tier_table,
+    fx_table,
+    max_term: int = 25,
+    target_irr: float = 12,
+    countries=None,
+    rank_by: str = "Project NPV (USD)",
+) -> pd.DataFrame:
+    """
+    Evaluate one project in every country of the policy table at once and
+    rank the countries.
+
+    The project is broadcast across the countries (broadcast_project), so
+    FX, escalators, VAT, corporate tax and exemption years enter the engine
+    as one vector per country; one (countries x years) schedule gives every
+    PPA term 1..max_term (grid_sweep.evaluate_terms).
+
+    Returns one row per country, sorted by `rank_by` (highest first, NaN
+    last): the first term whose IRR reaches target_irr (NaN when none does),
+    the IRR and Project NPV at that term (the engine's USD project cashflow
+    at NPV_DISCOUNT_RATE), and the IRR at max_term.
+    """
+    if rank_by not in COMPARISON_COLUMNS:
+        raise KeyError(
+            f"Column '{rank_by}' not found in {', '.join(COMPARISON_COLUMNS)}."
+        )
+    projects = broadcast_project(project, policy_table, fx_table, countries)
+    terms = np.arange(1, max_term + 1)
+    metrics = evaluate_terms(projects, policy_table, tier_table, fx_table, terms)
+    irr, npv = metrics[..., 0], metrics[..., 1]
+
+    first, found = first_term_meeting_target(irr, target_irr)
+    rows = np.arange(len(projects))
+    table = pd.DataFrame(
+        {
+            "Optimal Term": np.where(found, first + 1, np.nan),
+            "Unlevered Post-Tax IRR (%)": np.where(found, irr[rows, first], np.nan),
+            "Project NPV (USD)": np.where(found, npv[rows, first], np.nan),
+            "Max Term IRR (%)": irr[:, -1],
+        },
+        index=pd.Index(projects["project_country"], name="Country"),
+    )
+    return table.sort_values(rank_by, ascending=False, na_position="last")
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, timedelta
+from typing import Callable
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Directory of the daily fx_cache_YYYY-MM-DD.json files; FX_CACHE_DIR in the
+# environment overrides it.
+FX_CACHE_DIR = os.environ.get(
+    "FX_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "fx_cache")
+)
+FX_CACHE_TTL_SECONDS = 3600  # in-process copy; re-checked against disk after this
+FX_CACHE_KEEP_DAYS = 30  # daily files older than this are deleted
+
+_memory: dict = {}  # day -> (loaded at, payload)
+_memory_lock = threading.Lock()
+
+
+def cache_path(day: date, cache_dir: str | None = None) -> str:
+    return os.path.join(cache_dir or FX_CACHE_DIR, f"fx_cache_{day.isoformat()}.json")
+
+
+def read_cached(day: date, cache_dir: str | None = None) -> dict | None:
+    try:
+        with open(cache_path(day, cache_dir), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def read_newest(cache_dir: str | None = None) -> dict | None:
+    """Payload of the most recent daily file, or None when there is none."""
+    paths = sorted(
+        glob.glob(os.path.join(cache_dir or FX_CACHE_DIR, "fx_cache_*.json"))
+    )
+    for path in reversed(paths):
+        try:
+            with open(path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+    return None
+
+
+def write_atomic(path: str, data: dict) -> None:
+    """Write JSON to a temporary file next to `path`, then rename it over."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".fx_cache_", suffix=".tmp", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+@contextmanager
+def file_lock(path: str):
+    """Exclusive lock on `path` shared by all processes on the machine."""
+    with open(path, "a+") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def evict_stale(
+    today: date,
+    cache_dir: str | None = None,
+    keep_days: int | None = None,
+    history_dir: str | None = None,
+) -> list[str]:
+    """
+    Delete daily cache files older than keep_days; returns the removed paths.
+
+    The files not yet in the FX history store (history_dir, default
+    fx_history.FX_HISTORY_DIR) are imported into it first, and only days
+    up to the store's last day are deleted, so a file that fails to import
+    is kept rather than lost.
+    """
+    import fx_history  # fx_history imports this module
+
+    cache_dir = cache_dir or FX_CACHE_DIR
+    try:
+        fx_history.import_cache_files(cache_dir, history_dir)
+    except (KeyError, ValueError, OSError):
+        pass  # kept until it imports
+    archived = fx_history.last_date(history_dir)
+    if archived is None:
+        return []
+    keep_days = FX_CACHE_KEEP_DAYS if keep_days is None else keep_days
+    oldest = min(today - timedelta(days=keep_days), archived + timedelta(days=1))
+    oldest = oldest.isoformat()
+    removed = []
+    for path in glob.glob(os.path.join(cache_dir, "fx_cache_*.json")):
+        day = os.path.basename(path)[len("fx_cache_") : -len(".json")]
+        if day < oldest:
+            try:
+                os.remove(path)
+                removed.append(path)
+            except FileNotFoundError:
+                pass
+    return removed
+
+
+def get_latest(
+    fetch: Callable[[], dict],
+    cache_dir: str | None = None,
+    ttl: float | None = None,
+    today: date | None = None,
+    history_dir: str | None = None,
+) -> dict:
+    """
+    Today's FX payload, fetching it with `fetch()` at most once per day.
+
+    Lookups go in-process copy -> daily file -> network. The in-process copy
+    is served for `ttl` seconds without touching the disk. On a miss the
+    daily file is read; if it does not exist yet, one process takes the cache
+    directory lock, checks again, fetches, writes the file atomically and
+    evicts stale files (after importing them into the FX history store
+    `history_dir`), while the others wait for the lock and then read the
+    new file. Within a process the same is serialized by a thread lock.
+    """
+    today = today or date.today()
+    ttl = FX_CACHE_TTL_SECONDS if ttl is None else ttl
+    cache_dir = cache_dir or FX_CACHE_DIR
+
+    entry = _memory.get(today)
+    if entry is not None and time.monotonic() - entry[0] < ttl:
+        return entry[1]
+
+    with _memory_lock:
+        entry = _memory.get(today)
+        if entry is not None and time.monotonic() - entry[0] < ttl:
+            return entry[1]
+
+        data = read_cached(today, cache_dir)
+        if data is None:
+            os.makedirs(cache_dir, exist_ok=True)
+            with file_lock(os.path.join(cache_dir, ".fx_cache.lock")):
+                data = read_cached(today, cache_dir)
+                if data is None:
+                    data = fetch()
+                    write_atomic(cache_path(today, cache_dir), data)
+                    evict_stale(today, cache_dir, history_dir=history_dir)
+        # only today's payload is ever served, so earlier days are dropped
+        _memory.clear()
+        _memory[today] = (time.monotonic(), data)
+
+    return data
+
+
+def clear_memory_cache() -> None:
+    with _memory_lock:
+        _memory.clear()
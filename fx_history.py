@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import glob
+import json
+import os
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+import fx_cache
+from updated_calculator_logic_11_26_v2 import CURRENCY_BY_COUNTRY, fx_rates_by_country
+
+# Store layout: meta.json holds the first date and the column (country) order;
+# rates.f64 holds one row of float64 rates per calendar day from that date,
+# appended in date order. Days without rates are NaN rows, so the row of a
+# date is (date - start).days.
+FX_HISTORY_DIR = os.environ.get(
+    "FX_HISTORY_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "fx_history"),
+)
+
+_metas: dict = {}  # meta path -> (modified time, meta)
+_maps: dict = {}  # rates path -> (file size, memmap)
+
+
+def _paths(store_dir: str | None) -> tuple[str, str]:
+    store_dir = store_dir or FX_HISTORY_DIR
+    return os.path.join(store_dir, "meta.json"), os.path.join(store_dir, "rates.f64")
+
+
+def read_meta(store_dir: str | None = None) -> dict | None:
+    meta_path, _ = _paths(store_dir)
+    try:
+        modified = os.stat(meta_path).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    cached = _metas.get(meta_path)
+    if cached is None or cached[0] != modified:
+        with open(meta_path, "r") as f:
+            meta = json.load(f)
+        meta["start"] = date.fromisoformat(meta["start"])
+        cached = _metas[meta_path] = (modified, meta)
+    return cached[1]
+
+
+def _rates(store_dir: str | None, meta: dict) -> np.ndarray:
+    # memory-mapped (days, countries) view, re-mapped when the file has grown
+    _, rates_path = _paths(store_dir)
+    size = os.path.getsize(rates_path)
+    cached = _maps.get(rates_path)
+    if cached is None or cached[0] != size:
+        n_cols = len(meta["columns"])
+        n_rows = size // (8 * n_cols)
+        # plain ndarray view of the map: indexing a np.memmap is much slower
+        rates = (
+            np.asarray(
+                np.memmap(
+                    rates_path, dtype=np.float64, mode="r", shape=(n_rows, n_cols)
+                )
+            )
+            if n_rows
+            else np.empty((0, n_cols))
+        )
+        cached = _maps[rates_path] = (size, rates)
+    return cached[1]
+
+
+def last_date(store_dir: str | None = None) -> date | None:
+    """Last day with a row in the store (None for an empty store)."""
+    meta = read_meta(store_dir)
+    if meta is None:
+        return None
+    n_rows = len(_rates(store_dir, meta))
+    return meta["start"] + timedelta(days=n_rows - 1) if n_rows else None
+
+
+def append_rates(
+    day: date, fx_map: dict[str, float], store_dir: str | None = None
+) -> None:
+    """
+    Append one day of rates (country -> rate). Days must be appended in
+    increasing order; skipped days are stored as NaN rows.
+    """
+    store_dir = store_dir or FX_HISTORY_DIR
+    os.makedirs(store_dir, exist_ok=True)
+    meta_path, rates_path = _paths(store_dir)
+    with fx_cache.file_lock(os.path.join(store_dir, ".fx_history.lock")):
+        meta = read_meta(store_dir)
+        if meta is None:
+            meta = {"start": day, "columns": list(CURRENCY_BY_COUNTRY)}
+            fx_cache.write_atomic(
+                meta_path, {"start": day.isoformat(), "columns": meta["columns"]}
+            )
+            open(rates_path, "ab").close()
+
+        n_cols = len(meta["columns"])
+        n_rows = os.path.getsize(rates_path) // (8 * n_cols)
+        row = (day - meta["start"]).days
+        if row < n_rows:
+            raise ValueError(
+                f"FX history already has rates up to "
+                f"{meta['start'] + timedelta(days=n_rows - 1)}; cannot append {day}."
+            )
+
+        missing = [c for c in meta["columns"] if c not in fx_map]
+        if missing:
+            raise KeyError(f"Country '{missing[0]}' not found in FX rates for {day}.")
+        block = np.full((row - n_rows + 1, n_cols), np.nan)
+        block[-1] = [fx_map[c] for c in meta["columns"]]
+        with open(rates_path, "ab") as f:
+            f.write(block.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def read_rates(day: date, store_dir: str | None = None) -> dict[str, float]:
+    """Country -> rate on `day`: one row read at a fixed offset."""
+    meta = read_meta(store_dir)
+    rates = _rates(store_dir, meta) if meta is not None else np.empty((0, 0))
+    row = (day - meta["start"]).days if meta is not None else -1
+    if not 0 <= row < len(rates) or np.isnan(rates[row]).all():
+        raise KeyError(f"No FX rates for {day} in FX history.")
+    return dict(zip(meta["columns"], rates[row].tolist()))
+
+
+def read_range(
+    start: date, end: date, store_dir: str | None = None, dropna: bool = True
+) -> pd.DataFrame:
+    """
+    Rates for start..end inclusive (clipped to the stored days), one row per
+    date, one column per country. Only the pages of that range are read from
+    the memory map; with dropna=False the values are a view of it.
+    """
+    meta = read_meta(store_dir)
+    if meta is None:
+        raise KeyError("FX history is empty.")
+    rates = _rates(store_dir, meta)
+    first = max((start - meta["start"]).days, 0)
+    stop = min((end - meta["start"]).days + 1, len(rates))
+    stop = max(stop, first)
+    index = pd.DatetimeIndex(
+        pd.date_range(meta["start"] + timedelta(days=first), periods=stop - first),
+        name="Date",
+    )
+    frame = pd.DataFrame(
+        rates[first:stop], index=index, columns=meta["columns"], copy=False
+    )
+    return frame.dropna(how="all") if dropna else frame
+
+
+def import_cache_files(
+    source_dir: str | None = None, store_dir: str | None = None
+) -> list[date]:
+    """
+    Append every fx_cache_YYYY-MM-DD.json in source_dir (default: the FX
+    cache directory) newer than the store's last day, in date order.
+    Returns the imported dates.
+    """
+    source_dir = source_dir or fx_cache.FX_CACHE_DIR
+    newest = last_date(store_dir)
+    imported = []
+    for path in sorted(glob.glob(os.path.join(source_dir, "fx_cache_*.json"))):
+        name = os.path.basename(path)[len("fx_cache_") : -len(".json")]
+        try:
+            day = date.fromisoformat(name)
+        except ValueError:
+            continue
+        if newest is not None and day <= newest:
+            continue
+        with open(path, "r") as f:
+            append_rates(day, fx_rates_by_country(json.load(f)), store_dir)
+        imported.append(day)
+    return imported
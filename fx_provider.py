@@ -0,0 +1,170 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Awaitable, Callable, Tuple
+
+import requests
+
+import fx_cache
+from updated_calculator_logic_11_26_v2 import (
+    API_KEY,
+    CURRENCY_BY_COUNTRY,
+    dev_build_country_policy_table,
+    fx_rates_by_country,
+)
+
+OPENEXCHANGERATES_URL = "https://openexchangerates.org/api/latest.json"
+FX_MAX_AGE_SECONDS = 3600  # older rates are still served, but trigger a refresh
+
+
+def make_http_fetcher(
+    url: str = OPENEXCHANGERATES_URL,
+    params: dict | None = None,
+    timeout: float = 10,
+    session: requests.Session | None = None,
+) -> Tuple[Callable[[], Awaitable[dict]], requests.Session]:
+    """
+    Async fetch function for an openexchangerates-style latest.json endpoint.
+
+    Requests go through one requests.Session, whose connection pool keeps the
+    HTTPS connection alive between refreshes; the blocking call runs in a
+    worker thread so the event loop is never blocked. Point `url` at a local
+    stand-in server (start_stand_in_server) to run without the live API.
+    Returns the fetch function and the session (close it when done).
+    """
+    session = session or requests.Session()
+    if params is None:
+        params = {"app_id": API_KEY, "symbols": ",".join(CURRENCY_BY_COUNTRY.values())}
+
+    def get() -> dict:
+        resp = session.get(url, params=params, timeout=timeout)
+        resp.raise_for_status()
+        return resp.json()
+
+    async def fetch() -> dict:
+        return await asyncio.to_thread(get)
+
+    return fetch, session
+
+
+def fallback_fx_payload() -> dict:
+    """Static dev_build_country_policy_table rates in latest.json form."""
+    fx_rates = dev_build_country_policy_table()["FXrate"]
+    return {
+        "rates": {CURRENCY_BY_COUNTRY[c]: float(r) for c, r in fx_rates.items()},
+        "fallback": True,
+    }
+
+
+class AsyncFxProvider:
+    """
+    Stale-while-revalidate holder of the latest FX rates.
+
+    get_rates() never waits on the network: it returns the last known rates
+    (from memory, else today's or the newest fx_cache file, else the
+    dev_build_country_policy_table values) and, when they are older than
+    max_age or are the fallback, starts one background refresh through
+    `fetch`. A successful refresh replaces the rates and is written to the
+    daily fx_cache file so synchronous callers see it too; a failed refresh
+    keeps the stale rates and is retried on a later call.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[], Awaitable[dict]],
+        max_age: float = FX_MAX_AGE_SECONDS,
+        cache_dir: str | None = None,
+        write_cache: bool = True,
+    ):
+        self.fetch = fetch
+        self.max_age = max_age
+        self.cache_dir = cache_dir
+        self.write_cache = write_cache
+        self.payload: dict | None = None
+        self.updated_at = float("-inf")
+        self.last_error: BaseException | None = None
+        self._refresh: asyncio.Task | None = None
+
+    def _load_last_known(self) -> None:
+        data = fx_cache.read_cached(date.today(), self.cache_dir)
+        if data is None:
+            data = fx_cache.read_newest(self.cache_dir)
+            # a previous day's file is usable but already due for a refresh
+            self.updated_at = float("-inf")
+        else:
+            self.updated_at = time.monotonic()
+        self.payload = data if data is not None else fallback_fx_payload()
+
+    def is_stale(self) -> bool:
+        return (
+            self.payload is None
+            or self.payload.get("fallback", False)
+            or time.monotonic() - self.updated_at >= self.max_age
+        )
+
+    async def _do_refresh(self) -> None:
+        try:
+            data = await self.fetch()
+            fx_rates_by_country(data)  # reject payloads missing a currency
+        except Exception as exc:
+            self.last_error = exc
+            return
+        self.payload = data
+        self.updated_at = time.monotonic()
+        self.last_error = None
+        if self.write_cache:
+            path = fx_cache.cache_path(date.today(), self.cache_dir)
+            await asyncio.to_thread(fx_cache.write_atomic, path, data)
+
+    def refresh(self) -> asyncio.Task:
+        """Start a background refresh unless one is already running."""
+        if self._refresh is None or self._refresh.done():
+            self._refresh = asyncio.get_running_loop().create_task(self._do_refresh())
+        return self._refresh
+
+    async def get_rates(self) -> dict[str, float]:
+        if self.payload is None:
+            self._load_last_known()
+        if self.is_stale():
+            self.refresh()
+        return fx_rates_by_country(self.payload)
+
+    async def aclose(self) -> None:
+        if self._refresh is not None and not self._refresh.done():
+            self._refresh.cancel()
+            try:
+                await self._refresh
+            except asyncio.CancelledError:
+                pass
+
+
+def start_stand_in_server(
+    payload: dict, host: str = "127.0.0.1", port: int = 0, delay: float = 0.0
+) -> Tuple[ThreadingHTTPServer, str]:
+    """
+    Local HTTP server answering every GET with `payload` as JSON after
+    `delay` seconds, in a daemon thread. Returns the server (call shutdown()
+    when done) and its URL.
+    """
+    body = json.dumps(payload).encode()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}/api/latest.json"
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+import irr_solver
+from monte_carlo import EXCEEDANCE_LEVELS, NPV_DISCOUNT_RATE
+from updated_calculator_logic_11_26_v2 import (
+    build_schedule_inputs,
+    build_unlevered_schedule,
+)
+
+# Annual volatility of log FX devaluation per country. Panama and Ecuador are
+# dollarized, so their paths stay deterministic.
+FX_VOLATILITY: dict[str, float] = {
+    "Colombia": 0.12,
+    "Peru": 0.06,
+    "Chile": 0.10,
+    "Mexico": 0.11,
+    "Panama": 0.00,
+    "Costa Rica": 0.05,
+    "Honduras": 0.03,
+    "Guatemala": 0.02,
+    "Ecuador": 0.00,
+}
+
+# Correlation between the yearly FX shocks of any two countries, unless a full
+# matrix is given.
+FX_CORRELATION = 0.5
+# (scenario, project) rows per schedule chunk; ~12-20 KB of working arrays each
+FX_CHUNK_ROWS = 8192
+
+
+def fx_shock_correlation(countries, correlation=FX_CORRELATION) -> np.ndarray:
+    """
+    Correlation matrix of the yearly FX shocks for `countries`.
+
+    `correlation` is either one number used for every pair or a DataFrame
+    indexed and columned by country.
+    """
+    if isinstance(correlation, pd.DataFrame):
+        missing = [c for c in countries if c not in correlation.index]
+        if missing:
+            raise KeyError(
+                f"Country '{missing[0]}' not found in FX correlation matrix."
+            )
+        return correlation.loc[countries, countries].to_numpy(dtype=float)
+    matrix = np.full((len(countries), len(countries)), float(correlation))
+    np.fill_diagonal(matrix, 1.0)
+    return matrix
+
+
+def simulate_fx_paths(
+    policy_table: pd.DataFrame,
+    n_scenarios: int,
+    years: int = 25,
+    volatility=FX_VOLATILITY,
+    correlation=FX_CORRELATION,
+    seed: int = 0,
+) -> np.ndarray:
+    """
+    Correlated FX devaluation paths, shape (scenarios, countries, years).
+
+    Countries follow the row order of `policy_table`. Year 1 is the spot
+    FXrate, as in build_fx_table; each later year multiplies the rate by
+    (1 + Devaluation Factor / 100) * exp(sigma * z - sigma ** 2 / 2), with z
+    standard normal and correlated across countries within a year. The mean
+    path is therefore the deterministic build_fx_table path.
+    """
+    countries = list(policy_table.index)
+    if isinstance(volatility, dict):
+        missing = [c for c in countries if c not in volatility]
+        if missing:
+            raise KeyError(f"Country '{missing[0]}' not found in FX volatility.")
+        sigma = np.array([volatility[c] for c in countries], dtype=float)
+    else:
+        sigma = np.full(len(countries), float(volatility))
+
+    try:
+        cholesky = np.linalg.cholesky(fx_shock_correlation(countries, correlation))
+    except np.linalg.LinAlgError as exc:
+        raise ValueError("FX correlation matrix is not positive definite.") from exc
+
+    rng = np.random.default_rng(seed)
+    z = rng.standard_normal((n_scenarios, years - 1, len(countries))) @ cholesky.T
+    drift = np.log1p(policy_table["Devaluation Factor"].to_numpy(dtype=float) / 100)
+    log_steps = drift + sigma * z - sigma**2 / 2  # (scenarios, years - 1, countries)
+
+    log_path = np.zeros((n_scenarios, len(countries), years))
+    np.cumsum(log_steps.transpose(0, 2, 1), axis=-1, out=log_path[..., 1:])
+    spot = policy_table["FXrate"].to_numpy(dtype=float)
+    return spot[:, np.newaxis] * np.exp(log_path)
+
+
+def simulate_portfolio_fx(
+    projects: pd.DataFrame,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame,
+    fx_table: pd.DataFrame,
+    fx_paths: np.ndarray,
+    ppa_term=25,
+    chunk_rows: int = FX_CHUNK_ROWS,
+) -> pd.DataFrame:
+    """
+    Portfolio IRR and NPV under each FX scenario of `fx_paths`.
+
+    `fx_paths` comes from simulate_fx_paths on the same policy_table and
+    replaces the deterministic fx_table path of every project's country;
+    `ppa_term` is one term or one per project. Each chunk of scenarios runs
+    through build_unlevered_schedule as one (scenarios x projects x years)
+    array of at most chunk_rows scenario x project rows (at least one
+    scenario), so memory stays bounded whatever the portfolio size. The
+    portfolio cashflow is the sum of the project cashflows (USD); NPV is the
+    portfolio EBITDA discounted at NPV_DISCOUNT_RATE. Returns one row per
+    scenario.
+    """
+    terms = np.broadcast_to(np.asarray(ppa_term, dtype=int), (len(projects),))
+    horizon = int(terms.max())
+    if fx_paths.shape[-1] < horizon:
+        raise ValueError(
+            f"FX paths cover {fx_paths.shape[-1]} years, PPA term needs {horizon}."
+        )
+
+    schedule_inputs = build_schedule_inputs(
+        projects, policy_table, tier_table, fx_table, horizon
+    )
+    country_index = policy_table.index.get_indexer(projects["project_country"])
+    discount = (1 + NPV_DISCOUNT_RATE) ** -np.arange(1, horizon + 1)
+
+    chunk_size = max(1, chunk_rows // len(projects))
+    irr = np.empty(len(fx_paths))
+    npv = np.empty(len(fx_paths))
+    for start in range(0, len(fx_paths), chunk_size):
+        chunk = slice(start, start + chunk_size)
+        # (scenarios, projects, years); the other inputs broadcast over scenarios
+        schedule_inputs["fx_rates"] = fx_paths[chunk][:, country_index, :horizon]
+        schedule = build_unlevered_schedule(terms, **schedule_inputs)
+        irr[chunk] = irr_solver.irr(schedule["Project Cashflow"].sum(axis=1)) * 100
+        npv[chunk] = schedule["EBITDA"][..., 1:].sum(axis=1) @ discount
+
+    results = pd.DataFrame(
+        {"Portfolio IRR (%)": irr, "Portfolio NPV (EBITDA @10%)": npv}
+    )
+    results.index.name = "Scenario"
+    return results
+
+
+def summarize_scenarios(results: pd.DataFrame) -> pd.DataFrame:
+    """Mean, std, min, max and P90 / P50 / P10 of every scenario column."""
+    summary = results.agg(["mean", "std", "min", "max"]).T
+    summary.columns = ["Mean", "Std", "Min", "Max"]
+    for label, q in EXCEEDANCE_LEVELS.items():
+        summary[label] = results.quantile(q)
+    summary.index.name = "Metric"
+    return summary
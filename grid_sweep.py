@@ -0,0 +1,276 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+import pandas as pd
+
+import irr_solver
+from monte_carlo import NPV_DISCOUNT_RATE
+from updated_calculator_logic_11_26_v2 import (
+    FX_TABLE_YEARS,
+    CapexTiers,
+    FxTable,
+    PolicySnapshot,
+    build_schedule_inputs,
+    build_unlevered_schedule,
+    lookup_country_policies,
+    lookup_fx_paths,
+    term_cashflows,
+)
+
+# Per-kWp assumptions of a swept project; money in USD, converted to local
+# currency at the year-1 FX rate of each country.
+SWEEP_PROJECT: dict[str, float] = {
+    "specific_yield_kwh_per_kwp": 1_275.0,
+    "epc_cost_usd_per_kwp": 750.0,
+    "land_rent_usd_per_kwp": 0.0,
+}
+
+SWEEP_AXES = ("Capacity (kW)", "Tariff (USD/kWh)", "Country", "PPA Term")
+SWEEP_METRICS = ("Unlevered IRR (%)", "Project NPV")
+
+# state of a sweep worker process, set once by _init_worker
+_WORKER: dict = {}
+
+
+def sweep_projects(
+    capacity,
+    tariff,
+    country,
+    policy_table: pd.DataFrame | PolicySnapshot,
+    fx_table: pd.DataFrame | FxTable,
+    project: dict[str, float] = SWEEP_PROJECT,
+) -> pd.DataFrame:
+    """
+    Project table with one row per (capacity, tariff, country) triple of the
+    given equal-length arrays. Tariffs are USD/kWh; EPC VAT is charged at the
+    country VAT.
+    """
+    capacity = np.asarray(capacity, dtype=float)
+    country = list(country)
+    fx_rate = lookup_fx_paths(country, fx_table, 1)[:, 0]
+    vat = lookup_country_policies(country, policy_table)["VAT"]
+    epc_cost_excl_vat = capacity * project["epc_cost_usd_per_kwp"] * fx_rate
+    return pd.DataFrame(
+        {
+            "project_capacity_kw": capacity,
+            "project_country": country,
+            "epc_cost_excl_vat": epc_cost_excl_vat,
+            "epc_cost_vat": epc_cost_excl_vat * vat,
+            "current_electricity_tariff": np.asarray(tariff, dtype=float) * fx_rate,
+            "electricity_forecast_p90": capacity
+            * project["specific_yield_kwh_per_kwp"],
+            "land_rent_expense": capacity * project["land_rent_usd_per_kwp"] * fx_rate,
+        }
+    )
+
+
+def evaluate_terms(
+    projects: pd.DataFrame,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame,
+    fx_table: pd.DataFrame,
+    terms: np.ndarray,
+) -> np.ndarray:
+    """
+    Unlevered IRR (%) and Project NPV (project cashflow at NPV_DISCOUNT_RATE)
+    of every project at every PPA term, shape (projects, terms, 2), from one
+    schedule built to the longest term.
+    """
+    horizon = int(terms.max())
+    schedule_inputs = build_schedule_inputs(
+        projects, policy_table, tier_table, fx_table, horizon
+    )
+    schedule = build_unlevered_schedule(horizon, **schedule_inputs)
+    cashflows = term_cashflows(
+        schedule, schedule_inputs["policy"], schedule_inputs["dismantling_cost"]
+    )[:, terms - 1, :]
+    discount = (1 + NPV_DISCOUNT_RATE) ** -np.arange(horizon + 1)
+    return np.stack(
+        [irr_solver.irr_by_term(cashflows) * 100, cashflows @ discount], axis=-1
+    )
+
+
+def _grid_chunk(grid: dict, tables: dict, start: int, stop: int) -> np.ndarray:
+    # flat grid rows start..stop, C order over capacity x tariff x country
+    i, j, k = np.unravel_index(np.arange(start, stop), grid["shape"])
+    projects = sweep_projects(
+        grid["capacities"][i],
+        grid["tariffs"][j],
+        grid["countries"][k],
+        tables["policy_table"],
+        tables["fx_table"],
+        grid["project"],
+    )
+    return evaluate_terms(
+        projects,
+        tables["policy_table"],
+        tables["tier_table"],
+        tables["fx_table"],
+        grid["terms"],
+    )
+
+
+def _share_frame(frame: pd.DataFrame) -> tuple[SharedMemory, dict]:
+    # numeric columns go to one shared float block (integer columns become
+    # float; every reader casts them); the rest (e.g. Currency Unit) is small
+    # and travels with the spec
+    numeric = frame.select_dtypes("number")
+    values = numeric.to_numpy(dtype=float)
+    shm = SharedMemory(create=True, size=max(values.nbytes, 1))
+    np.ndarray(values.shape, dtype=float, buffer=shm.buf)[:] = values
+    spec = {
+        "name": shm.name,
+        "shape": values.shape,
+        "index": frame.index,
+        "columns": frame.columns,
+        "numeric": numeric.columns,
+        "other": frame.drop(columns=numeric.columns),
+    }
+    return shm, spec
+
+
+def _share_table(table, horizon: int) -> tuple[SharedMemory | None, dict]:
+    # DataFrames and FxTable (as its frame) go to shared memory; the compiled
+    # policy snapshot and CAPEX tiers are a few small arrays and travel as
+    # they are, once per worker
+    if isinstance(table, FxTable):
+        table = table.to_frame(max(horizon, table.years, FX_TABLE_YEARS))
+    if isinstance(table, pd.DataFrame):
+        return _share_frame(table)
+    return None, {"table": table}
+
+
+def _attach_table(spec: dict) -> tuple[SharedMemory | None, object]:
+    if "table" in spec:
+        return None, spec["table"]
+    return _attach_frame(spec)
+
+
+def _attach_frame(spec: dict) -> tuple[SharedMemory, pd.DataFrame]:
+    # pool workers share the parent's resource tracker, so attaching here does
+    # not hand ownership of the block to the worker; the parent unlinks it.
+    # The numeric columns stay views on the shared block: no cast, no concat.
+    shm = SharedMemory(name=spec["name"])
+    values = np.ndarray(spec["shape"], dtype=float, buffer=shm.buf)
+    values.flags.writeable = False
+    frame = pd.DataFrame(
+        values, index=spec["index"], columns=spec["numeric"], copy=False
+    )
+    for name, column in spec["other"].items():
+        frame[name] = column
+    return shm, frame[spec["columns"]]
+
+
+def _init_worker(table_specs: dict, result_spec: dict, grid: dict) -> None:
+    blocks, tables = {}, {}
+    for name, spec in table_specs.items():
+        blocks[name], tables[name] = _attach_table(spec)
+    blocks["result"] = SharedMemory(name=result_spec["name"])
+    _WORKER["blocks"] = blocks
+    _WORKER["tables"] = tables
+    _WORKER["grid"] = grid
+    _WORKER["result"] = np.ndarray(
+        result_spec["shape"], dtype=float, buffer=blocks["result"].buf
+    )
+
+
+def _sweep_chunk(bounds: tuple[int, int]) -> tuple[int, int]:
+    start, stop = bounds
+    _WORKER["result"][start:stop] = _grid_chunk(
+        _WORKER["grid"], _WORKER["tables"], start, stop
+    )
+    return bounds
+
+
+def run_grid_sweep(
+    capacities,
+    tariffs,
+    countries,
+    terms,
+    policy_table: pd.DataFrame | PolicySnapshot,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table: pd.DataFrame | FxTable,
+    project: dict[str, float] = SWEEP_PROJECT,
+    workers: int = 1,
+    chunk_size: int = 256,
+) -> pd.DataFrame:
+    """
+    Unlevered IRR and Project NPV over the capacity x tariff (USD/kWh) x country x
+    PPA term grid.
+
+    The capacity x tariff x country product is split in chunks of chunk_size
+    projects; each chunk is one array pass over all terms (evaluate_terms).
+    With workers > 1 the chunks run in a ProcessPoolExecutor: the policy, FX
+    and tier tables are placed once in shared memory and attached by every
+    worker at start-up rather than pickled per task (a PolicySnapshot or
+    CapexTiers is sent to each worker once instead), and workers write their
+    rows straight into a preallocated shared result array, so the output
+    order is fixed whatever order chunks finish in.
+
+    Returns one row per grid point (index SWEEP_AXES, in C order) with the
+    SWEEP_METRICS columns.
+    """
+    grid = {
+        "capacities": np.asarray(capacities, dtype=float),
+        "tariffs": np.asarray(tariffs, dtype=float),
+        "countries": np.asarray(countries, dtype=object),
+        "terms": np.asarray(list(terms), dtype=int),
+        "project": project,
+    }
+    grid["shape"] = (
+        len(grid["capacities"]),
+        len(grid["tariffs"]),
+        len(grid["countries"]),
+    )
+    n_projects = int(np.prod(grid["shape"]))
+    result_shape = (n_projects, len(grid["terms"]), len(SWEEP_METRICS))
+    bounds = [
+        (start, min(start + chunk_size, n_projects))
+        for start in range(0, n_projects, chunk_size)
+    ]
+    tables = {
+        "policy_table": policy_table,
+        "tier_table": tier_table,
+        "fx_table": fx_table,
+    }
+
+    if workers > 1:
+        blocks, specs = [], {}
+        try:
+            for name, table in tables.items():
+                shm, specs[name] = _share_table(table, int(grid["terms"].max()))
+                if shm is not None:
+                    blocks.append(shm)
+            result_block = SharedMemory(
+                create=True, size=int(np.prod(result_shape)) * 8
+            )
+            blocks.append(result_block)
+            result_spec = {"name": result_block.name, "shape": result_shape}
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(specs, result_spec, grid),
+            ) as pool:
+                list(pool.map(_sweep_chunk, bounds))
+            result = np.ndarray(
+                result_shape, dtype=float, buffer=result_block.buf
+            ).copy()
+        finally:
+            for shm in blocks:
+                shm.close()
+                shm.unlink()
+    else:
+        result = np.empty(result_shape)
+        for start, stop in bounds:
+            result[start:stop] = _grid_chunk(grid, tables, start, stop)
+
+    index = pd.MultiIndex.from_product(
+        [grid["capacities"], grid["tariffs"], grid["countries"], grid["terms"]],
+        names=SWEEP_AXES,
+    )
+    return pd.DataFrame(
+        result.reshape(-1, len(SWEEP_METRICS)), index=index, columns=SWEEP_METRICS
+    )
@@ -0,0 +1,242 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterator, Tuple
+
+import numpy as np
+import pandas as pd
+
+import irr_solver
+from updated_calculator_logic_11_26_v2 import build_unlevered_schedule
+
+# Stochastic inputs: schedule input (or policy key) -> (kind, standard deviation).
+# "relative" draws base * (1 + std * Z), "absolute" draws base + std * Z, with Z
+# standard normal; every draw is floored at zero.
+RISK_FACTORS: dict[str, tuple[str, float]] = {
+    "specific_power_output": ("relative", 0.05),
+    "annual_power_degradation": ("relative", 0.25),
+    "Electric Tariff Escalator": ("absolute", 0.01),
+    "O&M Escalator": ("absolute", 0.005),
+}
+
+IRR_BIN_EDGES = np.linspace(-100.0, 100.0, 4001)  # %, 0.05% wide bins
+NPV_BINS = 4000
+NPV_DISCOUNT_RATE = 0.10  # same rate as the calculator's EBITDA NPV
+
+# P90 is the value exceeded in 90% of scenarios (the 10th percentile), the
+# same convention as electricity_forecast_p90.
+EXCEEDANCE_LEVELS: dict[str, float] = {"P90": 0.10, "P50": 0.50, "P10": 0.90}
+
+
+def sample_scenarios(
+    schedule_inputs: dict,
+    size: int,
+    rng: np.random.Generator,
+    risk_factors: dict[str, tuple[str, float]] = RISK_FACTORS,
+) -> dict:
+    """
+    Copy of schedule_inputs (one project) with every risk factor replaced by
+    `size` random draws around its base value.
+    """
+    scenarios = dict(schedule_inputs)
+    scenarios["policy"] = dict(schedule_inputs["policy"])
+    for name, (kind, std) in risk_factors.items():
+        target = scenarios["policy"] if name in scenarios["policy"] else scenarios
+        base = np.asarray(target[name], dtype=float).reshape(-1)[0]
+        shock = std * rng.standard_normal(size)
+        if kind == "relative":
+            draws = base * (1 + shock)
+        elif kind == "absolute":
+            draws = base + shock
+        else:
+            raise ValueError(f"Unknown risk factor kind '{kind}' for '{name}'.")
+        target[name] = np.maximum(draws, 0.0)
+    return scenarios
+
+
+def evaluate_scenarios(scenarios: dict, ppa_term: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Unlevered IRR (%) and EBITDA NPV of every scenario at one PPA term."""
+    schedule = build_unlevered_schedule(ppa_term, **scenarios)
+    irr = irr_solver.irr(schedule["Project Cashflow"]) * 100
+    discount = (1 + NPV_DISCOUNT_RATE) ** -np.arange(1, ppa_term + 1)
+    npv = schedule["EBITDA"][..., 1:] @ discount
+    return irr, npv
+
+
+def _new_stats(edges: np.ndarray) -> dict:
+    return {
+        "count": 0,
+        "nan_count": 0,
+        "mean": 0.0,
+        "m2": 0.0,
+        "min": np.inf,
+        "max": -np.inf,
+        "edges": edges,
+        "histogram": np.zeros(len(edges) - 1, dtype=np.int64),
+    }
+
+
+def _stats_of(values: np.ndarray, edges: np.ndarray) -> dict:
+    stats = _new_stats(edges)
+    finite = values[np.isfinite(values)]
+    stats["nan_count"] = int(values.size - finite.size)
+    if finite.size:
+        stats["count"] = int(finite.size)
+        stats["mean"] = float(finite.mean())
+        stats["m2"] = float(((finite - stats["mean"]) ** 2).sum())
+        stats["min"] = float(finite.min())
+        stats["max"] = float(finite.max())
+        # values beyond the edges are counted in the outermost bins
+        clipped = np.clip(finite, edges[0], edges[-1])
+        stats["histogram"] = np.histogram(clipped, bins=edges)[0]
+    return stats
+
+
+def _merge_stats(a: dict, b: dict) -> dict:
+    # parallel mean / sum-of-squares update (Chan et al.)
+    count = a["count"] + b["count"]
+    merged = dict(a)
+    merged["count"] = count
+    merged["nan_count"] = a["nan_count"] + b["nan_count"]
+    merged["min"] = min(a["min"], b["min"])
+    merged["max"] = max(a["max"], b["max"])
+    merged["histogram"] = a["histogram"] + b["histogram"]
+    if count:
+        delta = b["mean"] - a["mean"]
+        merged["mean"] = a["mean"] + delta * b["count"] / count
+        merged["m2"] = a["m2"] + b["m2"] + delta**2 * a["count"] * b["count"] / count
+    return merged
+
+
+def histogram_quantile(histogram: np.ndarray, edges: np.ndarray, q: float) -> float:
+    """Quantile q of the binned values, interpolating linearly inside a bin."""
+    total = histogram.sum()
+    if total == 0:
+        return np.nan
+    cumulative = np.cumsum(histogram)
+    target = q * total
+    idx = int(np.searchsorted(cumulative, target))
+    before = cumulative[idx - 1] if idx else 0
+    fraction = (target - before) / histogram[idx] if histogram[idx] else 0.0
+    return float(edges[idx] + fraction * (edges[idx + 1] - edges[idx]))
+
+
+def summarize_stats(stats: dict) -> dict[str, float]:
+    summary = {
+        "Scenarios": stats["count"],
+        "No IRR": stats["nan_count"],
+        "Mean": stats["mean"] if stats["count"] else np.nan,
+        "Std": (
+            np.sqrt(stats["m2"] / (stats["count"] - 1))
+            if stats["count"] > 1
+            else np.nan
+        ),
+        "Min": stats["min"] if stats["count"] else np.nan,
+        "Max": stats["max"] if stats["count"] else np.nan,
+    }
+    for label, q in EXCEEDANCE_LEVELS.items():
+        summary[label] = histogram_quantile(stats["histogram"], stats["edges"], q)
+    return summary
+
+
+def _simulate_chunk(task) -> dict[str, dict]:
+    schedule_inputs, ppa_term, risk_factors, seed, size, edges = task
+    rng = np.random.default_rng(seed)
+    scenarios = sample_scenarios(schedule_inputs, size, rng, risk_factors)
+    irr, npv = evaluate_scenarios(scenarios, ppa_term)
+    return {
+        "Unlevered IRR (%)": _stats_of(irr, edges["Unlevered IRR (%)"]),
+        "NPV (EBITDA @10%)": _stats_of(npv, edges["NPV (EBITDA @10%)"]),
+    }
+
+
+def iter_monte_carlo(
+    schedule_inputs: dict,
+    ppa_term: int,
+    n_scenarios: int,
+    chunk_size: int = 2048,
+    seed: int = 0,
+    risk_factors: dict[str, tuple[str, float]] = RISK_FACTORS,
+    workers: int = 1,
+) -> Iterator[Tuple[int, dict[str, dict]]]:
+    """
+    Run n_scenarios draws of one project in chunks of chunk_size, yielding
+    (scenarios done, running statistics per metric) after every chunk.
+
+    Chunk i always draws from child i of SeedSequence(seed), so results are
+    reproducible and do not depend on `workers`. Only the per-chunk schedule
+    and the running statistics (moments, min/max, fixed-bin histograms) are
+    held in memory, so memory stays flat however many scenarios are drawn.
+    The NPV histogram range is fixed from the first chunk.
+    """
+    n_chunks = -(-n_scenarios // chunk_size)
+    sizes = [chunk_size] * (n_chunks - 1) + [n_scenarios - chunk_size * (n_chunks - 1)]
+    seeds = np.random.SeedSequence(seed).spawn(n_chunks)
+
+    # the first chunk runs here and fixes the NPV histogram range
+    rng = np.random.default_rng(seeds[0])
+    pilot_irr, pilot_npv = evaluate_scenarios(
+        sample_scenarios(schedule_inputs, sizes[0], rng, risk_factors), ppa_term
+    )
+    low, high = np.nanmin(pilot_npv), np.nanmax(pilot_npv)
+    pad = max(high - low, abs(high), 1.0)
+    edges = {
+        "Unlevered IRR (%)": IRR_BIN_EDGES,
+        "NPV (EBITDA @10%)": np.linspace(low - pad, high + pad, NPV_BINS + 1),
+    }
+    totals = {
+        "Unlevered IRR (%)": _stats_of(pilot_irr, edges["Unlevered IRR (%)"]),
+        "NPV (EBITDA @10%)": _stats_of(pilot_npv, edges["NPV (EBITDA @10%)"]),
+    }
+    done = sizes[0]
+    yield done, totals
+
+    tasks = (
+        (schedule_inputs, ppa_term, risk_factors, seeds[i], sizes[i], edges)
+        for i in range(1, n_chunks)
+    )
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() returns results in chunk order, keeping the merge deterministic
+            for i, chunk in enumerate(pool.map(_simulate_chunk, tasks), start=1):
+                totals = {k: _merge_stats(totals[k], chunk[k]) for k in totals}
+                done += sizes[i]
+                yield done, totals
+    else:
+        for i, task in enumerate(tasks, start=1):
+            chunk = _simulate_chunk(task)
+            totals = {k: _merge_stats(totals[k], chunk[k]) for k in totals}
+            done += sizes[i]
+            yield done, totals
+
+
+def run_monte_carlo(
+    schedule_inputs: dict,
+    ppa_term: int,
+    n_scenarios: int = 100_000,
+    chunk_size: int = 2048,
+    seed: int = 0,
+    risk_factors: dict[str, tuple[str, float]] = RISK_FACTORS,
+    workers: int = 1,
+) -> Tuple[pd.DataFrame, dict[str, Tuple[np.ndarray, np.ndarray]]]:
+    """
+    IRR / NPV distribution of one project at one PPA term.
+
+    `schedule_inputs` are the SCHEDULE_INPUTS of a single project (scalars or
+    one-element arrays, e.g. from build_schedule_inputs on a one-row table).
+    Returns a summary table (one row per metric: mean, std, min/max,
+    P90/P50/P10) and the (counts, bin edges) histogram per metric.
+    """
+    for _, totals in iter_monte_carlo(
+        schedule_inputs, ppa_term, n_scenarios, chunk_size, seed, risk_factors, workers
+    ):
+        pass
+
+    summary = pd.DataFrame(
+        {metric: summarize_stats(stats) for metric, stats in totals.items()}
+    ).T
+    summary.index.name = "Metric"
+    histograms = {
+        metric: (stats["histogram"], stats["edges"]) for metric, stats in totals.items()
+    }
+    return summary, histograms
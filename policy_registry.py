@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Tuple
+
+import pandas as pd
+
+import updated_calculator_logic_11_26_v2 as calc
+from updated_calculator_logic_11_26_v2 import PolicySnapshot
+
+# Hooks take (new snapshot, changed countries). Invalidation hooks run before
+# reload_policy returns; pre-warm hooks run afterwards on a background thread.
+PolicyHook = Callable[[PolicySnapshot, list], None]
+
+_active: PolicySnapshot | None = None
+_reload_lock = threading.Lock()
+_invalidation_hooks: list[PolicyHook] = []
+_prewarm_hooks: list[PolicyHook] = []
+_prewarm_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="policy-prewarm")
+_config_mtimes: dict[str, int] = {}
+_active_config: dict[str, dict] | None = None  # of the last reload
+
+
+def policy_table_from_config(
+    policy_config: dict[str, dict], fx_map: dict[str, float]
+) -> pd.DataFrame:
+    """build_country_policy_table for a given POLICY_CONFIG-style dict and rates."""
+    df = pd.DataFrame.from_dict(policy_config, orient="index")
+    missing = [c for c in df.index if c not in fx_map]
+    if missing:
+        raise KeyError(f"Country '{missing[0]}' not found in FX rates.")
+    df.insert(0, "FXrate", [fx_map[c] for c in df.index])
+    return df
+
+
+def install_policy(policy_table: pd.DataFrame) -> PolicySnapshot:
+    """
+    Make `policy_table` the initial active snapshot (version 0). Call it at
+    start-up to choose the policy and FX source, e.g. with
+    dev_build_country_policy_table() for offline testing; later changes go
+    through reload_policy.
+    """
+    with _reload_lock:
+        if _active is not None:
+            raise RuntimeError("A policy snapshot is already active.")
+        snapshot = PolicySnapshot(policy_table)
+        _install(snapshot)
+    return snapshot
+
+
+def active_snapshot() -> PolicySnapshot:
+    """
+    The active policy snapshot. A calculation should read it once and use
+    that snapshot throughout: reloads swap in a new object and never modify
+    an existing one, so in-flight calculations finish on the snapshot they
+    started with.
+
+    Without install_policy, the first call builds it from today's rates
+    (build_country_policy_table).
+    """
+    snapshot = _active
+    if snapshot is None:
+        with _reload_lock:
+            if _active is None:
+                _install(PolicySnapshot(calc.build_country_policy_table()))
+            snapshot = _active
+    return snapshot
+
+
+def _install(snapshot: PolicySnapshot) -> None:
+    global _active
+    _active = snapshot  # a single reference assignment: readers see old or new
+
+
+def changed_countries(old: PolicySnapshot, new: PolicySnapshot) -> list[str]:
+    """Countries added, removed, or with any policy value (or FX) changed."""
+    changed = [
+        country
+        for country in new.countries
+        if country not in old.index
+        or dict(new.lookup(country)) != dict(old.lookup(country))
+    ]
+    changed += [country for country in old.countries if country not in new.index]
+    return changed
+
+
+def register_invalidation(hook: PolicyHook) -> PolicyHook:
+    _invalidation_hooks.append(hook)
+    return hook
+
+
+def register_prewarm(hook: PolicyHook) -> PolicyHook:
+    _prewarm_hooks.append(hook)
+    return hook
+
+
+def unregister_invalidation(hook: PolicyHook) -> None:
+    if hook in _invalidation_hooks:
+        _invalidation_hooks.remove(hook)
+
+
+def _run_prewarm(snapshot: PolicySnapshot, changed: list[str]) -> None:
+    for hook in list(_prewarm_hooks):
+        hook(snapshot, changed)
+
+
+def reload_policy(
+    policy_config: dict[str, dict] | None = None,
+    fx_map: dict[str, float] | None = None,
+) -> Tuple[PolicySnapshot, list[str], Future | None]:
+    """
+    Compile `policy_config` (default: the last reloaded config, else
+    POLICY_CONFIG) with `fx_map` (default: the active snapshot's rates) and
+    make it the active snapshot.
+
+    Nothing happens when no country changed. Otherwise the new snapshot gets
+    the next version; unchanged countries keep their country_versions, so
+    caches keyed on them stay valid. Invalidation hooks are called with the
+    changed countries before the swap is reported, and pre-warm hooks are
+    queued on a background thread. Returns the active snapshot, the changed
+    countries and the pre-warm future (None when nothing changed).
+    """
+    global _active_config
+    active_snapshot()  # builds the initial snapshot on first use
+    with _reload_lock:
+        old = _active
+        config = policy_config
+        if config is None:
+            config = calc.POLICY_CONFIG if _active_config is None else _active_config
+        if fx_map is None:
+            fx_map = {c: old.lookup(c)["FXrate"] for c in config if c in old.index}
+        table = policy_table_from_config(config, fx_map)
+
+        changed = changed_countries(old, PolicySnapshot(table))
+        _active_config = config
+        if not changed:
+            return old, [], None
+        version = old.version + 1
+        snapshot = PolicySnapshot(
+            table,
+            version,
+            {c: old.country_versions[c] for c in old.countries if c not in changed},
+        )
+        _install(snapshot)
+        for hook in list(_invalidation_hooks):
+            hook(snapshot, changed)
+
+    return snapshot, changed, _prewarm_pool.submit(_run_prewarm, snapshot, changed)
+
+
+def reload_from_file(
+    path: str,
+) -> Tuple[PolicySnapshot, list[str], Future | None] | None:
+    """
+    Hot-reload a JSON file with the POLICY_CONFIG layout when it changed
+    since the last call (by modification time); None when it did not.
+    """
+    modified = os.stat(path).st_mtime_ns
+    if _config_mtimes.get(path) == modified:
+        return None
+    with open(path, "r") as f:
+        policy_config = json.load(f)
+    result = reload_policy(policy_config)
+    _config_mtimes[path] = modified
+    return result
@@ -0,0 +1,288 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from typing import Callable, Tuple
+
+import numpy as np
+import pandas as pd
+
+import policy_registry
+from concurrent_calc import SAMPLE_PROJECT_USD, sample_projects
+from updated_calculator_logic_11_26_v2 import (
+    PORTFOLIO_REQUIRED_COLUMNS,
+    PROJECT_INPUT_DEFAULTS,
+    CapexTiers,
+    FxTable,
+    PolicySnapshot,
+    PreparedProject,
+    build_tier_table,
+    capex_tiers,
+)
+
+RESULT_CACHE_SIZE = 1024  # entries kept by the default cache
+INPUT_SIGNIFICANT_DIGITS = 12  # inputs equal to this precision share an entry
+
+# Projects whose term search attach_to_registry recomputes in every changed
+# country after a reload; money in USD, converted at the year-1 rate. The
+# default is the __main__ project.
+COMMON_SCENARIOS: list[dict] = [SAMPLE_PROJECT_USD]
+
+_MISSING = object()
+
+
+def canonical_inputs(inputs: dict) -> dict:
+    """
+    The inputs a calculation depends on, normalized: defaults filled in from
+    PROJECT_INPUT_DEFAULTS, other keys dropped, NumPy scalars unwrapped and
+    numbers rounded to INPUT_SIGNIFICANT_DIGITS, so 1000, 1000.0 and
+    np.float64(1000) give the same entry.
+    """
+    canonical = {}
+    for name in (*PORTFOLIO_REQUIRED_COLUMNS, *PROJECT_INPUT_DEFAULTS):
+        value = inputs.get(name, PROJECT_INPUT_DEFAULTS.get(name))
+        if isinstance(value, np.generic):
+            value = value.item()
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            value = float(f"{value:.{INPUT_SIGNIFICANT_DIGITS}g}")
+        canonical[name] = value
+    return canonical
+
+
+def input_hash(*parts) -> str:
+    """sha256 of the canonical JSON of `parts`."""
+    text = json.dumps(parts, sort_keys=True, separators=(",", ":"), default=float)
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def cache_key(
+    kind: str,
+    inputs: dict,
+    policy: PolicySnapshot,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table: FxTable,
+    **params,
+) -> tuple:
+    """
+    (country, country version, hash) of one calculation. Only the country's
+    version is used, so reloads that change other countries keep the entry.
+
+    The hash covers the canonical inputs, `kind` and `params`, and also the
+    country's policy values, FX row and tier table, so snapshots built
+    outside policy_registry (which all have version 0) cannot collide.
+    """
+    canonical = canonical_inputs(inputs)
+    country = canonical["project_country"]
+    tiers = capex_tiers(tier_table)
+    position = fx_table.position(country)
+    digest = input_hash(
+        kind,
+        canonical,
+        params,
+        dict(policy.lookup(country)),
+        [fx_table.fx_rate[position], fx_table.devaluation[position]],
+        [t.tolist() for t in tiers.tables[tiers.country_tables.get(country, 0)]],
+    )
+    return country, policy.country_versions[country], digest
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of calculation results.
+
+    Holds at most `maxsize` entries, evicting the least recently used. An
+    entry expires `ttl` seconds after it was stored, and with fx_dated=True
+    also when the day changes, i.e. when fx_cache.get_latest serves the next
+    day's FX payload. Counts hits, misses, evictions and expirations.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = RESULT_CACHE_SIZE,
+        ttl: float | None = None,
+        fx_dated: bool = False,
+        clock: Callable[[], float] = time.monotonic,
+        today: Callable[[], date] = date.today,
+    ):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.fx_dated = fx_dated
+        self.clock = clock
+        self.today = today
+        self.hits = self.misses = self.evictions = self.expired = 0
+        # key -> (value, stored at, FX day, recipe to recompute it or None)
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _is_live(self, entry) -> bool:
+        _, stored_at, fx_day, _ = entry
+        if self.ttl is not None and self.clock() - stored_at >= self.ttl:
+            return False
+        return not self.fx_dated or fx_day == self.today()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key, _MISSING)
+            if entry is not _MISSING and not self._is_live(entry):
+                del self._entries[key]
+                self.expired += 1
+                entry = _MISSING
+            if entry is _MISSING:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value, recipe=None) -> None:
+        with self._lock:
+            self._entries[key] = (value, self.clock(), self.today(), recipe)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute: Callable[[], object], recipe=None):
+        """Cached value of `key`, else compute() stored under it."""
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.put(key, value, recipe)
+        return value
+
+    def invalidate(self, countries) -> list:
+        """Drop every entry of `countries`; returns their recipes."""
+        countries = set(countries)
+        with self._lock:
+            stale = [key for key in self._entries if key[0] in countries]
+            recipes = [self._entries.pop(key)[3] for key in stale]
+        return [recipe for recipe in recipes if recipe is not None]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expired": self.expired,
+            }
+
+
+DEFAULT_CACHE = ResultCache()
+
+
+def _irr_curve(inputs, policy, tier_table, fx_table, max_term, target_irr):
+    project = PreparedProject(inputs, policy, tier_table, fx_table)
+    return project.irr_curve(max_term, target_irr)
+
+
+def _result_table(inputs, policy, tier_table, fx_table, ppa_term):
+    project = PreparedProject(inputs, policy, tier_table, fx_table)
+    return project.irr(ppa_term), project.result_table(ppa_term)
+
+
+_KINDS = {"irr_curve": _irr_curve, "result_table": _result_table}
+
+
+def _cached(kind, inputs, policy, tier_table, fx_table, cache, **params):
+    cache = DEFAULT_CACHE if cache is None else cache
+    key = cache_key(kind, inputs, policy, tier_table, fx_table, **params)
+    return cache.get_or_compute(
+        key,
+        lambda: _KINDS[kind](inputs, policy, tier_table, fx_table, **params),
+        recipe=(kind, dict(inputs), tier_table, params),
+    )
+
+
+def cached_irr_curve(
+    inputs: dict,
+    policy: PolicySnapshot,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table: FxTable,
+    max_term: int = 25,
+    target_irr: float = 12,
+    cache: ResultCache | None = None,
+) -> Tuple[pd.Series, int | None]:
+    """
+    Memoized PreparedProject.irr_curve (the search_ppa_term term scan). The
+    curve is shared between hits; copy it before modifying it.
+    """
+    return _cached(
+        "irr_curve",
+        inputs,
+        policy,
+        tier_table,
+        fx_table,
+        cache,
+        max_term=max_term,
+        target_irr=target_irr,
+    )
+
+
+def cached_result_table(
+    inputs: dict,
+    policy: PolicySnapshot,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table: FxTable,
+    ppa_term: int,
+    cache: ResultCache | None = None,
+) -> Tuple[float, pd.DataFrame]:
+    """
+    Memoized calculate_unlevered_irr: IRR (%) and schedule table at one term.
+    The table is shared between hits; copy it before modifying it.
+    """
+    return _cached(
+        "result_table",
+        inputs,
+        policy,
+        tier_table,
+        fx_table,
+        cache,
+        ppa_term=ppa_term,
+    )
+
+
+def attach_to_registry(
+    cache: ResultCache | None = None, scenarios: list[dict] | None = None
+) -> None:
+    """
+    Keep `cache` in step with policy_registry reloads: entries of changed
+    countries are dropped when the new snapshot is installed, then
+    recomputed against it on the registry's pre-warm thread, together with
+    the term search of every `scenarios` project (default: COMMON_SCENARIOS)
+    in each changed country.
+    """
+    cache = DEFAULT_CACHE if cache is None else cache
+    scenarios = COMMON_SCENARIOS if scenarios is None else scenarios
+    dropped: dict[int, list] = {}
+
+    def invalidate(snapshot: PolicySnapshot, changed: list[str]) -> None:
+        dropped[snapshot.version] = cache.invalidate(changed)
+
+    def prewarm(snapshot: PolicySnapshot, changed: list[str]) -> None:
+        fx_table = FxTable(snapshot)
+        for kind, inputs, tier_table, params in dropped.pop(snapshot.version, []):
+            if inputs["project_country"] in snapshot.index:
+                _cached(kind, inputs, snapshot, tier_table, fx_table, cache, **params)
+        tier_table = CapexTiers(build_tier_table())
+        for project in scenarios:
+            for inputs in sample_projects(snapshot, project):
+                if inputs["project_country"] in changed:
+                    cached_irr_curve(
+                        inputs, snapshot, tier_table, fx_table, cache=cache
+                    )
+
+    policy_registry.register_invalidation(invalidate)
+    policy_registry.register_prewarm(prewarm)
@@ -0,0 +1,282 @@
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+import policy_registry
+from result_cache import DEFAULT_CACHE, ResultCache, cache_key, input_hash
+from updated_calculator_logic_11_26_v2 import (
+    CapexTiers,
+    FxTable,
+    PolicySnapshot,
+    PreparedProject,
+)
+
+# SQLite file of the persistent results store; RESULT_STORE_PATH in the
+# environment overrides it.
+RESULT_STORE_PATH = os.environ.get(
+    "RESULT_STORE_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "result_store.sqlite3"),
+)
+RESULT_STORE_MAX_BYTES = 64 * 1024 * 1024  # stored result JSON, summed
+RESULT_STORE_ACCESS_RESOLUTION = 60  # seconds; last-used times are this coarse
+
+# `total` keeps SUM(results.size) through triggers, so a write checks the size
+# limit in O(1) in every process sharing the file; the first open of an older
+# store fills it in once.
+_SCHEMA = """
+BEGIN IMMEDIATE;
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    country TEXT NOT NULL,
+    policy_version TEXT NOT NULL,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_country ON results (country, policy_version);
+CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed);
+CREATE TABLE IF NOT EXISTS total (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    size INTEGER NOT NULL
+);
+INSERT OR IGNORE INTO total SELECT 0, COALESCE(SUM(size), 0) FROM results;
+CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results BEGIN
+    UPDATE total SET size = size + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results BEGIN
+    UPDATE total SET size = size - OLD.size + NEW.size WHERE id = 0;
+END;
+CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results BEGIN
+    UPDATE total SET size = size - OLD.size WHERE id = 0;
+END;
+COMMIT;
+"""
+
+
+def policy_version(policy: PolicySnapshot, fx_table: FxTable, country: str) -> str:
+    """
+    Content version of a country's policy values and FX row. Unlike the
+    in-process snapshot versions it is the same in every process and across
+    restarts.
+    """
+    position = fx_table.position(country)
+    return input_hash(
+        dict(policy.lookup(country)),
+        [fx_table.fx_rate[position], fx_table.devaluation[position]],
+    )[:16]
+
+
+class ResultStore:
+    """
+    Persistent results store in one local SQLite file, shared by every
+    process that opens the same path.
+
+    The database runs in WAL mode, so any number of readers proceed while
+    one process writes. Each thread uses its own connection. When the stored
+    results exceed max_bytes, the least recently used are deleted down to
+    90% of it. Rows carry the policy_version they were computed with, so
+    changed policies are dropped with invalidate().
+    """
+
+    def __init__(
+        self,
+        path: str | None = None,
+        max_bytes: int = RESULT_STORE_MAX_BYTES,
+        timeout: float = 30,
+    ):
+        self.path = path or RESULT_STORE_PATH
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()  # guards the counters
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # one connection per thread and process (connections must not cross
+        # a fork)
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.path, timeout=self.timeout)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    def get(self, key: str) -> dict | None:
+        db = self._connect()
+        row = db.execute("SELECT value, accessed FROM results WHERE key = ?", (key,))
+        row = row.fetchone()
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        now = time.time()
+        if now - row[1] >= RESULT_STORE_ACCESS_RESOLUTION:
+            # best effort: a busy database only delays the LRU bookkeeping
+            try:
+                with db:
+                    db.execute(
+                        "UPDATE results SET accessed = ? WHERE key = ?", (now, key)
+                    )
+            except sqlite3.OperationalError:
+                pass
+        return json.loads(row[0])
+
+    def put(self, key: str, country: str, version: str, value: dict) -> None:
+        text = json.dumps(value, separators=(",", ":"))
+        db = self._connect()
+        with db:
+            # an upsert, not INSERT OR REPLACE: REPLACE's implicit delete does
+            # not fire the delete trigger
+            db.execute(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (key) "
+                "DO UPDATE SET country = excluded.country, "
+                "policy_version = excluded.policy_version, value = excluded.value, "
+                "size = excluded.size, accessed = excluded.accessed",
+                (key, country, version, text, len(text), time.time()),
+            )
+            total = db.execute("SELECT size FROM total").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(db, total - int(0.9 * self.max_bytes))
+
+    @staticmethod
+    def _evict(db: sqlite3.Connection, excess: int) -> None:
+        freed = 0
+        stale = []
+        for key, size in db.execute("SELECT key, size FROM results ORDER BY accessed"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        db.executemany("DELETE FROM results WHERE key = ?", stale)
+
+    def invalidate(self, country: str, keep_version: str | None = None) -> int:
+        """Delete a country's rows other than keep_version's; returns the count."""
+        db = self._connect()
+        with db:
+            cursor = db.execute(
+                "DELETE FROM results WHERE country = ? AND policy_version IS NOT ?",
+                (country, keep_version),
+            )
+        return cursor.rowcount
+
+    def prune(self, policy: PolicySnapshot, fx_table: FxTable) -> int:
+        """Delete every row not computed with the snapshot's current policies."""
+        return sum(
+            self.invalidate(country, policy_version(policy, fx_table, country))
+            for country in policy.countries
+        )
+
+    def stats(self) -> dict:
+        rows, size = (
+            self._connect()
+            .execute("SELECT COUNT(*), (SELECT size FROM total) FROM results")
+            .fetchone()
+        )
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            "rows": rows,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "hits": hits,
+            "misses": misses,
+        }
+
+    def close(self) -> None:
+        db = getattr(self._local, "db", None)
+        if db is not None:
+            db.close()
+            self._local.db = None
+
+
+def compute_quote(
+    inputs: dict,
+    policy: PolicySnapshot,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table: FxTable,
+    max_term: int = 25,
+    target_irr: float = 12,
+    exit_years=(5, 10, 15),
+) -> dict:
+    """
+    Term search and exit values of one project, as JSON-ready values: the
+    IRR of every term, the optimal term with its IRR and NPV (EBITDA at 10%,
+    as __main__), and the exit values at that term.
+    """
+    project = PreparedProject(inputs, policy, tier_table, fx_table)
+    irr_curve, optimal_term = project.irr_curve(max_term, target_irr)
+    quote = {
+        "Country": project.country,
+        "IRR Curve": [None if pd.isna(v) else float(v) for v in irr_curve],
+        "Optimal Term": optimal_term,
+        "Unlevered Post-Tax IRR (%)": None,
+        "NPV": None,
+        "Exit Values": [],
+    }
+    if optimal_term is not None:
+        quote["Unlevered Post-Tax IRR (%)"] = float(irr_curve[optimal_term])
+        quote["NPV"] = project.npv(optimal_term)
+        exit_values = project.exit_values(optimal_term, exit_years=list(exit_years))
+        quote["Exit Values"] = exit_values.reset_index().to_dict("records")
+    return quote
+
+
+def quote(
+    inputs: dict,
+    policy: PolicySnapshot,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table: FxTable,
+    max_term: int = 25,
+    target_irr: float = 12,
+    exit_years=(5, 10, 15),
+    store: ResultStore | None = None,
+    cache: ResultCache | None = DEFAULT_CACHE,
+) -> dict:
+    """
+    compute_quote answered from the in-process cache, then the persistent
+    store, and only then computed (and written to both). Pass cache=None to
+    skip the in-process layer.
+    """
+    params = {"max_term": max_term, "target_irr": target_irr}
+    params["exit_years"] = list(exit_years)
+    key = cache_key("quote", inputs, policy, tier_table, fx_table, **params)
+    country, _, digest = key
+
+    def load() -> dict:
+        value = store.get(digest) if store is not None else None
+        if value is None:
+            value = compute_quote(inputs, policy, tier_table, fx_table, **params)
+            if store is not None:
+                store.put(
+                    digest, country, policy_version(policy, fx_table, country), value
+                )
+        return value
+
+    return load() if cache is None else cache.get_or_compute(key, load)
+
+
+def attach_to_registry(store: ResultStore) -> None:
+    """Delete a changed country's stored results when policy_registry reloads."""
+
+    def invalidate(snapshot: PolicySnapshot, changed: list[str]) -> None:
+        fx_table = FxTable(snapshot)
+        for country in changed:
+            keep = (
+                policy_version(snapshot, fx_table, country)
+                if country in snapshot.index
+                else None
+            )
+            store.invalidate(country, keep)
+
+    policy_registry.register_invalidation(invalidate)
@@ -0,0 +1,359 @@
+from __future__ import annotations
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+import irr_solver
+from monte_carlo import NPV_DISCOUNT_RATE
+from updated_calculator_logic_11_26_v2 import (
+    build_schedule_inputs,
+    build_unlevered_schedule,
+    single_project,
+    stack_schedule_inputs,
+)
+
+# Tornado inputs: label -> (kind, names scaled together). Kinds:
+#   "schedule"        schedule input of the base case
+#   "policy"          policy value of the base case
+#   "project"         project column; the cost/VAT stack is rebuilt
+#   "project_policy"  policy value used by the cost/VAT stack; stack rebuilt
+#   "fx_path"         Devaluation Factor; the FX path is rebuilt from year 1
+# Capacity keeps the specific yield and the EPC cost per kWp constant.
+SENSITIVITY_INPUTS: dict[str, tuple[str, tuple[str, ...]]] = {
+    "Tariff": ("schedule", ("project_electric_tariff_excl_vat",)),
+    "Capacity": (
+        "project",
+        (
+            "project_capacity_kw",
+            "electricity_forecast_p90",
+            "epc_cost_excl_vat",
+            "epc_cost_vat",
+        ),
+    ),
+    "EPC Cost": ("project", ("epc_cost_excl_vat", "epc_cost_vat")),
+    "Land Rent": ("schedule", ("land_rent_expense",)),
+    "Insurance": ("schedule", ("insurance_risk",)),
+    "Asset Management Fee": ("schedule", ("asset_management_fee",)),
+    "Degradation": ("schedule", ("annual_power_degradation",)),
+    "Electric Tariff Escalator": ("policy", ("Electric Tariff Escalator",)),
+    "O&M Escalator": ("policy", ("O&M Escalator",)),
+    "Land Rent Escalator": ("policy", ("Land Rent Escalator",)),
+    "VAT": ("project_policy", ("VAT",)),
+    "Corporate Tax": ("policy", ("Corporate Tax",)),
+}
+
+
+STACK_KINDS = ("project", "project_policy")
+
+
+def scale_input(schedule_inputs: dict, kind: str, names, factor) -> dict:
+    """
+    Copy of schedule_inputs with the named schedule inputs or policy values
+    multiplied by `factor` (a number or one value per scenario). For kind
+    "fx_path" the FX path is rebuilt from its year-1 rate with the scaled
+    Devaluation Factor.
+    """
+    scaled = dict(schedule_inputs)
+    if kind == "schedule":
+        for name in names:
+            scaled[name] = np.asarray(schedule_inputs[name]) * factor
+    elif kind in ("policy", "fx_path"):
+        scaled["policy"] = dict(schedule_inputs["policy"])
+        for name in names:
+            scaled["policy"][name] = (
+                np.asarray(schedule_inputs["policy"][name]) * factor
+            )
+        if kind == "fx_path":
+            fx_rates = np.asarray(schedule_inputs["fx_rates"])
+            growth = 1 + np.asarray(scaled["policy"]["Devaluation Factor"])
+            scaled["fx_rates"] = fx_rates[..., :1] * growth[
+                ..., np.newaxis
+            ] ** np.arange(fx_rates.shape[-1])
+    else:
+        raise ValueError(f"Unknown sensitivity kind '{kind}'.")
+    return scaled
+
+
+def scale_stack_input(
+    projects: pd.DataFrame, policy: dict, kind: str, names, factor
+) -> Tuple[pd.DataFrame, dict]:
+    """
+    Project table and policy arrays with the named project columns or policy
+    values multiplied by `factor`, to be rebuilt with build_schedule_inputs.
+    """
+    projects = projects.copy()
+    policy = dict(policy)
+    for name in names:
+        if kind == "project":
+            projects[name] = projects[name] * factor
+        elif kind == "project_policy":
+            policy[name] = policy[name] * factor
+        else:
+            raise ValueError(f"Unknown sensitivity kind '{kind}'.")
+    return projects, policy
+
+
+# Sobol inputs default to the ones that leave the cost/VAT stack untouched, so
+# every sample reuses the base stack; any SENSITIVITY_INPUTS entry may be added.
+SOBOL_INPUTS: dict[str, tuple[str, tuple[str, ...]]] = {
+    "Tariff": ("schedule", ("project_electric_tariff_excl_vat",)),
+    "Yield": ("schedule", ("specific_power_output",)),
+    "Land Rent": ("schedule", ("land_rent_expense",)),
+    "Insurance": ("schedule", ("insurance_risk",)),
+    "Asset Management Fee": ("schedule", ("asset_management_fee",)),
+    "Degradation": ("schedule", ("annual_power_degradation",)),
+    "Electric Tariff Escalator": ("policy", ("Electric Tariff Escalator",)),
+    "O&M Escalator": ("policy", ("O&M Escalator",)),
+    "Land Rent Escalator": ("policy", ("Land Rent Escalator",)),
+    "Devaluation Factor": ("fx_path", ("Devaluation Factor",)),
+    "Corporate Tax": ("policy", ("Corporate Tax",)),
+}
+
+
+def _take(schedule_inputs: dict, rows) -> dict:
+    taken = {
+        name: np.asarray(value)[rows]
+        for name, value in schedule_inputs.items()
+        if name != "policy"
+    }
+    taken["policy"] = {
+        key: np.asarray(value)[rows] for key, value in schedule_inputs["policy"].items()
+    }
+    return taken
+
+
+def evaluate_batch(task) -> Tuple[np.ndarray, np.ndarray]:
+    """Unlevered IRR (%) and cashflow NPV of a (scenarios,) batch at one term."""
+    schedule_inputs, ppa_term = task
+    schedule = build_unlevered_schedule(ppa_term, **schedule_inputs)
+    cashflow = schedule["Project Cashflow"]
+    discount = (1 + NPV_DISCOUNT_RATE) ** -np.arange(ppa_term + 1)
+    return irr_solver.irr(cashflow) * 100, cashflow @ discount
+
+
+def tornado_analysis(
+    project,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame,
+    fx_table: pd.DataFrame,
+    ppa_term: int,
+    change: float = 0.10,
+    inputs: dict[str, tuple[str, tuple[str, ...]]] = SENSITIVITY_INPUTS,
+    workers: int = 1,
+    chunk_size: int = 64,
+) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    One-at-a-time sensitivity of one project's unlevered IRR and Project NPV.
+
+    Every input in `inputs` is scaled by (1 - change) and (1 + change) with
+    all others at base. The base cost/VAT stack is built once and shared by
+    every perturbation that does not touch it; perturbations that do
+    (capacity, EPC cost, VAT) are rebuilt together in one prepare call. All
+    scenarios are then evaluated as one batch, or split in chunks of
+    chunk_size across a process pool when workers > 1. Project NPV is the
+    project cashflow discounted at NPV_DISCOUNT_RATE (not the EBITDA NPV of
+    __main__).
+
+    `project` is a one-row DataFrame or a Series with the
+    PORTFOLIO_REQUIRED_COLUMNS. Returns the tornado table (IRR / Project NPV
+    deltas against base for the low and high case, ranked by IRR range, then
+    Project NPV range) and the base IRR / Project NPV.
+    """
+    project = single_project(project, "Tornado analysis")
+
+    base = build_schedule_inputs(project, policy_table, tier_table, fx_table, ppa_term)
+    factors = (1 - change, 1 + change)
+
+    shared, shared_labels = [base], [("Base", 1.0)]
+    rebuilt_rows, rebuilt_policies, rebuilt_labels = [], [], []
+    for label, (kind, names) in inputs.items():
+        for factor in factors:
+            if kind in STACK_KINDS:
+                row, policy = scale_stack_input(
+                    project, base["policy"], kind, names, factor
+                )
+                rebuilt_rows.append(row)
+                rebuilt_policies.append({"policy": policy})
+                rebuilt_labels.append((label, factor))
+            else:
+                shared.append(scale_input(base, kind, names, factor))
+                shared_labels.append((label, factor))
+
+    batches = [stack_schedule_inputs(shared)]
+    if rebuilt_rows:
+        batches.append(
+            build_schedule_inputs(
+                pd.concat(rebuilt_rows, ignore_index=True),
+                policy_table,
+                tier_table,
+                fx_table,
+                ppa_term,
+                policy=stack_schedule_inputs(rebuilt_policies)["policy"],
+            )
+        )
+    scenarios = stack_schedule_inputs(batches)
+    labels = shared_labels + rebuilt_labels
+
+    if workers > 1:
+        chunks = [
+            (_take(scenarios, slice(start, start + chunk_size)), ppa_term)
+            for start in range(0, len(labels), chunk_size)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_batch, chunks))
+        irr = np.concatenate([r[0] for r in results])
+        npv = np.concatenate([r[1] for r in results])
+    else:
+        irr, npv = evaluate_batch((scenarios, ppa_term))
+
+    results = pd.DataFrame(
+        {"IRR (%)": irr, "Project NPV": npv},
+        index=pd.MultiIndex.from_tuples(labels, names=["Input", "Factor"]),
+    )
+    base_case = results.loc[("Base", 1.0)]
+    low = results.xs(factors[0], level="Factor") - base_case
+    high = results.xs(factors[1], level="Factor") - base_case
+
+    tornado = pd.DataFrame(
+        {
+            "Low IRR Delta (pp)": low["IRR (%)"],
+            "High IRR Delta (pp)": high["IRR (%)"],
+            "IRR Range (pp)": (high["IRR (%)"] - low["IRR (%)"]).abs(),
+            "Low Project NPV Delta": low["Project NPV"],
+            "High Project NPV Delta": high["Project NPV"],
+            "Project NPV Range": (high["Project NPV"] - low["Project NPV"]).abs(),
+        }
+    ).loc[list(inputs)]
+    tornado = tornado.sort_values(
+        ["IRR Range (pp)", "Project NPV Range"], ascending=False
+    )
+
+    base_case = pd.Series(
+        {
+            "Unlevered IRR (%)": base_case["IRR (%)"],
+            "Project NPV": base_case["Project NPV"],
+        }
+    )
+    return tornado, base_case
+
+
+def _sample_inputs(
+    project: pd.DataFrame,
+    base: dict,
+    multipliers: np.ndarray,
+    inputs: dict[str, tuple[str, tuple[str, ...]]],
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame,
+    fx_table: pd.DataFrame,
+    ppa_term: int,
+) -> dict:
+    # one scenario per row of multipliers (one column per input); the stack is
+    # only rebuilt when an input that feeds it is sampled
+    scenario = base
+    stack_inputs = [
+        j for j, (kind, _) in enumerate(inputs.values()) if kind in STACK_KINDS
+    ]
+    if stack_inputs:
+        projects = pd.concat([project] * len(multipliers), ignore_index=True)
+        policy = {
+            key: np.repeat(value, len(multipliers))
+            for key, value in base["policy"].items()
+        }
+        for j in stack_inputs:
+            kind, names = list(inputs.values())[j]
+            projects, policy = scale_stack_input(
+                projects, policy, kind, names, multipliers[:, j]
+            )
+        scenario = build_schedule_inputs(
+            projects, policy_table, tier_table, fx_table, ppa_term, policy=policy
+        )
+    for j, (kind, names) in enumerate(inputs.values()):
+        if kind not in STACK_KINDS:
+            scenario = scale_input(scenario, kind, names, multipliers[:, j])
+    return scenario
+
+
+def sobol_indices(
+    project,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame,
+    fx_table: pd.DataFrame,
+    ppa_term: int,
+    n_samples: int = 4096,
+    change: float = 0.10,
+    inputs: dict[str, tuple[str, tuple[str, ...]]] = SOBOL_INPUTS,
+    seed: int = 0,
+    chunk_size: int = 8192,
+    workers: int = 1,
+) -> pd.DataFrame:
+    """
+    First-order and total Sobol indices of one project's unlevered IRR and
+    Project NPV (cashflow at NPV_DISCOUNT_RATE).
+
+    Every input in `inputs` is an independent multiplier, uniform on
+    [1 - change, 1 + change], on its base value. Saltelli sampling builds the
+    matrices A and B (n_samples x inputs) and, per input i, A with column i
+    taken from B: n_samples * (inputs + 2) model runs in total, evaluated in
+    chunks of chunk_size scenarios through the array engine (across a process
+    pool when workers > 1). First-order indices use the Saltelli (2010)
+    estimator, total indices the Jansen estimator; samples with no IRR are
+    dropped from the IRR estimates. Indices are NaN for a metric with no
+    variance. Returns one row per input, ranked by total IRR index.
+    """
+    project = single_project(project, "Sobol analysis")
+
+    n_inputs = len(inputs)
+    rng = np.random.default_rng(seed)
+    a, b = rng.uniform(1 - change, 1 + change, (2, n_samples, n_inputs))
+    ab = np.repeat(a[np.newaxis], n_inputs, axis=0)
+    ab[np.arange(n_inputs), :, np.arange(n_inputs)] = b.T
+    design = np.concatenate([a, b, ab.reshape(-1, n_inputs)])
+
+    base = build_schedule_inputs(project, policy_table, tier_table, fx_table, ppa_term)
+    chunks = [
+        (
+            _sample_inputs(
+                project,
+                base,
+                design[start : start + chunk_size],
+                inputs,
+                policy_table,
+                tier_table,
+                fx_table,
+                ppa_term,
+            ),
+            ppa_term,
+        )
+        for start in range(0, len(design), chunk_size)
+    ]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(evaluate_batch, chunks))
+    else:
+        results = [evaluate_batch(chunk) for chunk in chunks]
+
+    indices = {}
+    for metric, values in (
+        ("IRR", np.concatenate([r[0] for r in results])),
+        ("Project NPV", np.concatenate([r[1] for r in results])),
+    ):
+        values = values.reshape(n_inputs + 2, n_samples)
+        valid = np.isfinite(values).all(axis=0)
+        # centring on the sample mean does not change the estimators' expected
+        # values but greatly reduces their variance when the mean is large
+        values = values[:, valid] - values[:2, valid].mean()
+        f_a, f_b, f_ab = values[0], values[1], values[2:]
+        variance = np.var(np.concatenate([f_a, f_b]))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            first = np.mean(f_b * (f_ab - f_a), axis=1) / variance
+            total = 0.5 * np.mean((f_a - f_ab) ** 2, axis=1) / variance
+        if not variance > 0:
+            first = total = np.full(n_inputs, np.nan)
+        indices[f"{metric} First-Order"] = first
+        indices[f"{metric} Total"] = total
+
+    table = pd.DataFrame(indices, index=pd.Index(list(inputs), name="Input"))
+    return table.sort_values("IRR Total", ascending=False)
@@ -0,0 +1,113 @@
+"""
+The __main__ project (1 MW, money in USD) and the cost/VAT stack __main__
+builds from it, as plain engine calls, so engine tests need nothing beyond
+the calculator's table and schedule functions.
+"""
+
+import updated_calculator_logic_11_26_v2 as calc
+
+SAMPLE_PROJECT_USD = {
+    "project_capacity_kw": 1_000,
+    "epc_cost_excl_vat": 520_000,
+    "epc_cost_vat": 84,
+    "current_electricity_tariff": 0.09,
+    "electricity_forecast_p90": 1_275_000,
+    "land_rent_expense": 5_582.5,
+    "percentage_invested_by_offtaker": 0.12,
+    "saving_on_electricity_tariff": 0.0,
+    "asset_ownership_trasnferred": True,
+    "recs_enabled": True,
+}
+LOCAL_CURRENCY_INPUTS = (
+    "epc_cost_excl_vat",
+    "epc_cost_vat",
+    "current_electricity_tariff",
+    "land_rent_expense",
+)
+
+# the __main__ admin values
+PROJECT_CONTINGENCIES_PERCENTAGE = 3 / 100
+CAPEX_DEPRECIATION_YEARS = 20
+ANNUAL_POWER_DEGRADATION = 0.40 / 100
+INVERTER_REPLACEMENT_YEAR = 12
+INSURANCE_RISK = 0.5 / 100
+ASSET_MANAGEMENT_FEE = 3 / 100
+REC_RATE = 1.5
+
+
+def local_project(project: dict, country: str, policy_table) -> dict:
+    """`project` in `country`, its USD amounts at the country's policy FX rate."""
+    fx_rate = calc.lookup_country_policy(country, policy_table)["FXrate"]
+    local = dict(project, project_country=country)
+    for name in LOCAL_CURRENCY_INPUTS:
+        local[name] = project[name] * fx_rate
+    return local
+
+
+def unlevered_irr_inputs(
+    project: dict, country: str, policy_table, tier_table, fx_table
+) -> dict:
+    """calculate_unlevered_irr arguments (all but ppa_term) of local_project."""
+    policy = calc.lookup_country_policy(country, policy_table)
+    local = local_project(project, country, policy_table)
+
+    capacity = local["project_capacity_kw"]
+    epc_cost_excl_vat = local["epc_cost_excl_vat"]
+    epc_cost_vat = local["epc_cost_vat"]
+
+    project_management, fx_rate = calc.total_capex_usd(
+        capacity, country, tier_table=tier_table, fx_table=fx_table
+    )
+    project_readiness = epc_cost_excl_vat * 0.05
+    contingencies = PROJECT_CONTINGENCIES_PERCENTAGE * (
+        epc_cost_excl_vat + project_management
+    )
+    total_project_cost_excl_vat = (
+        epc_cost_excl_vat + project_management + project_readiness + contingencies
+    )
+    project_readiness_vat = project_readiness * policy["VAT"]
+    project_vat = (
+        epc_cost_vat
+        + project_management * policy["VAT"]
+        + project_readiness_vat
+        + contingencies * policy["VAT"]
+    )
+    specific_project_cost_incl_vat = (
+        (1 - local["percentage_invested_by_offtaker"])
+        * (epc_cost_excl_vat + epc_cost_vat)
+        + (project_vat - epc_cost_vat)
+        + (total_project_cost_excl_vat - epc_cost_excl_vat)
+    ) / capacity
+    total_capex_incl_vat = specific_project_cost_incl_vat * capacity
+
+    return {
+        "inverter_replacement_year": INVERTER_REPLACEMENT_YEAR,
+        "annual_power_degradation": ANNUAL_POWER_DEGRADATION,
+        "country": country,
+        "specific_power_output": local["electricity_forecast_p90"] / capacity,
+        "project_capacity_kw": capacity,
+        "project_electric_tariff_excl_vat": local["current_electricity_tariff"]
+        * (1 - local["saving_on_electricity_tariff"]),
+        "op_maintenance_monitor_expense": (12 * (1 - 0.2) * capacity)
+        * fx_rate
+        / (capacity * 1000),
+        "insurance_risk": INSURANCE_RISK,
+        "total_construction_cost_incl_vat": (
+            total_capex_incl_vat - project_readiness - project_readiness_vat
+        ),
+        "asset_management_fee": ASSET_MANAGEMENT_FEE,
+        "land_rent_expense": local["land_rent_expense"],
+        "recs_enabled": local["recs_enabled"],
+        "rec_cost": REC_RATE * fx_rate,
+        "dismantling_cost": (
+            0 if local["asset_ownership_trasnferred"] else 0.02 * epc_cost_excl_vat
+        ),
+        "es_reporting_excl_vat": 0,
+        "policy": policy,
+        "fx_table": fx_table,
+        "project_vat": project_vat,
+        "capex_depreciation_years": CAPEX_DEPRECIATION_YEARS,
+        "inverter_replacement_excl_vat": 17 * capacity * fx_rate,
+        "total_capex_incl_vat": total_capex_incl_vat,
+        "total_project_cost_excl_vat": total_project_cost_excl_vat,
+    }
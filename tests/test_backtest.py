@@ -0,0 +1,61 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import fx_history
+import updated_calculator_logic_11_26_v2 as calc
+from backtest import run_backtest
+from fx_provider import fallback_fx_payload
+from sample_inputs import SAMPLE_PROJECT_USD, local_project
+
+START = date(2025, 1, 1)
+PROJECT = pd.Series(
+    local_project(SAMPLE_PROJECT_USD, "Colombia", calc.dev_build_country_policy_table())
+)
+
+
+@pytest.fixture
+def store_dir(tmp_path):
+    """40 days of history with every third day missing."""
+    rates = calc.fx_rates_by_country(fallback_fx_payload())
+    for i in range(40):
+        if i % 3 != 2:
+            day = START + timedelta(days=i)
+            fx_map = {c: r * (1 + i / 100) for c, r in rates.items()}
+            fx_history.append_rates(day, fx_map, str(tmp_path))
+    return str(tmp_path)
+
+
+def test_one_row_per_stored_day_in_range(store_dir):
+    start, end = START + timedelta(days=5), START + timedelta(days=30)
+    result = run_backtest(PROJECT, start, end, store_dir=store_dir, chunk_size=7)
+
+    history = fx_history.read_range(start, end, store_dir)["Colombia"].dropna()
+    assert list(result.columns) == [
+        "Optimal Term",
+        "Unlevered Post-Tax IRR (%)",
+        "Project NPV",
+        "FX Rate",
+    ]
+    assert isinstance(result.index, pd.DatetimeIndex)
+    assert result.index.name == "Date"
+    assert list(result.index) == list(history.index)
+    assert len(result) == 26 - 9  # days 5..30, without days 5, 8, ..., 29
+    np.testing.assert_array_equal(result["FX Rate"], history.to_numpy())
+    terms = result["Optimal Term"].dropna()
+    assert not terms.empty and terms.between(1, 25).all()
+
+    # a one-row frame gives the same result, in one chunk or across workers
+    frame = PROJECT.to_frame().T
+    for options in ({}, {"workers": 2, "chunk_size": 4}):
+        pd.testing.assert_frame_equal(
+            run_backtest(frame, start, end, store_dir=store_dir, **options), result
+        )
+
+
+def test_rejects_more_than_one_project(store_dir):
+    projects = pd.DataFrame([PROJECT, PROJECT])
+    with pytest.raises(ValueError):
+        run_backtest(projects, START, START + timedelta(days=3), store_dir=store_dir)
@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+import calc_service
+import policy_registry
+from calc_service import CalculationService, evaluate_batch
+from concurrent_calc import evaluate_project, sample_projects
+from fx_provider import AsyncFxProvider, fallback_fx_payload
+from updated_calculator_logic_11_26_v2 import (
+    CapexTiers,
+    FxTable,
+    PolicySnapshot,
+    build_tier_table,
+    dev_build_country_policy_table,
+)
+
+
+@pytest.fixture(autouse=True)
+def fresh_registry(monkeypatch):
+    # every service installs its own policy in an empty registry
+    monkeypatch.setattr(policy_registry, "_active", None)
+    monkeypatch.setattr(policy_registry, "_active_config", None)
+
+
+def run_with_service(tmp_path, scenario, **options):
+    """Run `scenario(service)` against a started one-worker service."""
+
+    async def fetch():
+        return dict(fallback_fx_payload(), fallback=False)
+
+    async def main():
+        fx = AsyncFxProvider(fetch, cache_dir=str(tmp_path), write_cache=False)
+        service = CalculationService(fx, workers=1, **options)
+        await service.start()
+        try:
+            return await scenario(service)
+        finally:
+            await service.close()
+
+    return asyncio.run(main())
+
+
+def test_concurrent_requests_share_one_batch(tmp_path):
+    async def scenario(service):
+        projects = sample_projects(service.policy)
+        results = await asyncio.gather(*(service.calculate(p) for p in projects))
+        return service.policy, projects, results, dict(service.stats)
+
+    policy, projects, results, stats = run_with_service(
+        tmp_path, scenario, batch_window=0.05
+    )
+    assert stats["batches"] == 1
+    assert stats["projects"] == len(projects)
+    fx_table, tier_table = FxTable(policy), CapexTiers(build_tier_table())
+    for inputs, result in zip(projects, results):
+        expected = evaluate_project(inputs, policy, tier_table, fx_table)
+        assert result["Country"] == inputs["project_country"]
+        assert result["Optimal Term"] == expected["Optimal Term"]
+        assert result["NPV"] == pytest.approx(expected["NPV"], rel=1e-12)
+        np.testing.assert_allclose(
+            np.array(result["IRR Curve"], dtype=float),
+            expected["IRR Curve"],
+            atol=1e-9,
+        )
+
+
+def test_timeout_returns_504(tmp_path):
+    async def scenario(service):
+        body = {"project": sample_projects(service.policy)[0], "timeout": 1e-6}
+        return await service.handle("POST", "/calculate", json.dumps(body).encode())
+
+    status, payload = run_with_service(tmp_path, scenario)
+    assert status == 504
+    assert payload == {"error": "Calculation timed out."}
+
+
+def test_cancelled_request_leaves_its_batch(tmp_path):
+    async def scenario(service):
+        kept, dropped = sample_projects(service.policy)[:2]
+        cancelled = asyncio.ensure_future(service.calculate(dropped))
+        result = asyncio.ensure_future(service.calculate(kept))
+        await asyncio.sleep(0)  # both queued in the open batch
+        cancelled.cancel()
+        return cancelled, await result, dict(service.stats)
+
+    cancelled, result, stats = run_with_service(tmp_path, scenario, batch_window=0.05)
+    assert cancelled.cancelled()
+    assert result["Country"] == "Colombia"
+    assert stats["batches"] == 1
+    assert stats["projects"] == 1
+
+
+@pytest.mark.parametrize(
+    "options, status",
+    [({"max_term": 0}, 400), ({"timeout": -1}, 400), ({"max_term": 10}, 200)],
+)
+def test_invalid_options_return_400(tmp_path, options, status):
+    async def scenario(service):
+        body = {"project": sample_projects(service.policy)[0], **options}
+        return await service.handle("POST", "/calculate", json.dumps(body).encode())
+
+    assert run_with_service(tmp_path, scenario)[0] == status
+
+
+def test_bad_project_does_not_fail_its_neighbours(tmp_path):
+    async def scenario(service):
+        good = sample_projects(service.policy)[0]
+        bad = dict(good, project_capacity_kw=-1)
+        return await asyncio.gather(
+            service.handle("POST", "/calculate", json.dumps(good).encode()),
+            service.handle("POST", "/calculate", json.dumps(bad).encode()),
+        )
+
+    (good_status, good), (bad_status, bad) = run_with_service(tmp_path, scenario)
+    assert good_status == 200 and good["Optimal Term"] == 10
+    assert bad_status == 400
+    assert "project_capacity_kw" in bad["error"]
+
+
+def test_batch_isolates_projects_the_engine_rejects(monkeypatch):
+    # past validation, a failing project gets its own exception in the batch
+    snapshot = PolicySnapshot(dev_build_country_policy_table(), version=3)
+    monkeypatch.setattr(calc_service, "_WORKER", {})
+    calc_service._init_worker(build_tier_table(), snapshot)
+    good = sample_projects(snapshot)[:2]
+    bad = dict(good[0], project_capacity_kw=-1)
+    results = evaluate_batch((3, [good[0], bad, good[1]], 25, 12))
+    assert isinstance(results[1], ValueError)
+    assert [r["Country"] for r in (results[0], results[2])] == ["Colombia", "Peru"]
+    with pytest.raises(RuntimeError):
+        evaluate_batch((2, good, 25, 12))
@@ -0,0 +1,9 @@
+from concurrent_calc import stress_check
+
+
+def test_identical_results_under_64_threads():
+    # every sample project and max_term from 64 threads released together,
+    # racing on one shared FxTable's lazy extension, against a serial run
+    result = stress_check(n_threads=64, rounds=1)
+    assert result["evaluations"] == 64 * 9 * 3
+    assert result["mismatches"] == 0
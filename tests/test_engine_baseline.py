@@ -0,0 +1,91 @@
+import json
+import os
+
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+import updated_calculator_logic_11_26_v2 as calc
+from sample_inputs import SAMPLE_PROJECT_USD, unlevered_irr_inputs
+
+# Outputs of the per-year loop that calculate_unlevered_irr ran before the
+# NumPy engine (baseline commit), for the sample project in every country of
+# the dev policy table: the IRR at every term 1..25 and the term-25 schedule
+# rows in "rows". "retained" keeps the asset, so it also pays dismantling.
+with open(os.path.join(os.path.dirname(__file__), "data", "engine_baseline.json")) as f:
+    BASELINE = json.load(f)
+
+VARIANTS = {
+    "transferred": SAMPLE_PROJECT_USD,
+    "retained": dict(
+        SAMPLE_PROJECT_USD, asset_ownership_trasnferred=False, recs_enabled=False
+    ),
+}
+RTOL = 1e-10
+
+POLICY_TABLE = calc.dev_build_country_policy_table()
+TIER_TABLE = calc.build_tier_table()
+FX_TABLE = calc.build_fx_table(POLICY_TABLE)
+
+
+def _inputs(variant: str) -> dict[str, dict]:
+    return {
+        country: unlevered_irr_inputs(
+            VARIANTS[variant], country, POLICY_TABLE, TIER_TABLE, FX_TABLE
+        )
+        for country in POLICY_TABLE.index
+    }
+
+
+@pytest.mark.parametrize("variant", list(VARIANTS))
+def test_calculate_unlevered_irr_matches_baseline(variant):
+    for country, args in _inputs(variant).items():
+        expected = BASELINE["variants"][variant][country]
+        for term in range(1, BASELINE["max_term"] + 1):
+            irr, _, table = calc.calculate_unlevered_irr(term, **args)
+            assert irr == pytest.approx(
+                expected["Unlevered IRR (%)"][term - 1], rel=RTOL
+            ), (country, term)
+        for row in BASELINE["rows"]:
+            np.testing.assert_allclose(
+                table.loc[row].to_numpy(dtype=float),
+                expected["Schedule"][row],
+                rtol=RTOL,
+                atol=1e-6,
+                err_msg=f"{country} {row}",
+            )
+
+
+@pytest.mark.parametrize("variant", list(VARIANTS))
+def test_batched_schedule_matches_baseline(variant):
+    # every country in one (projects x years) build_unlevered_schedule call
+    max_term = BASELINE["max_term"]
+    inputs = _inputs(variant)
+    countries = list(inputs)
+    stacked = {
+        name: np.array([inputs[c][name] for c in countries])
+        for name in calc.SCHEDULE_INPUTS
+        if name not in ("policy", "fx_rates")
+    }
+    stacked["policy"] = {
+        key: np.array([inputs[c]["policy"][key] for c in countries])
+        for key in inputs[countries[0]]["policy"]
+    }
+    stacked["fx_rates"] = np.array(
+        [calc.lookup_fx_path(c, FX_TABLE, max_term) for c in countries]
+    )
+    schedule = calc.build_unlevered_schedule(max_term, **stacked)
+    expected = BASELINE["variants"][variant]
+    for row in BASELINE["rows"]:
+        np.testing.assert_allclose(
+            schedule[row],
+            [expected[country]["Schedule"][row] for country in countries],
+            rtol=RTOL,
+            atol=1e-6,
+            err_msg=row,
+        )
+    np.testing.assert_allclose(
+        [npf.irr(cashflow) * 100 for cashflow in schedule["Project Cashflow"]],
+        [expected[country]["Unlevered IRR (%)"][max_term - 1] for country in countries],
+        rtol=RTOL,
+    )
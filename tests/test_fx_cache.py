@@ -0,0 +1,79 @@
+import json
+import multiprocessing
+import os
+import threading
+import time
+from datetime import date
+
+import pytest
+
+import fx_cache
+from fx_provider import fallback_fx_payload
+
+TODAY = date(2026, 3, 2)
+
+
+@pytest.fixture(autouse=True)
+def empty_memory(monkeypatch):
+    monkeypatch.setattr(fx_cache, "_memory", {})
+
+
+def _slow_fetch(calls_path: str):
+    def fetch() -> dict:
+        with open(calls_path, "a") as f:
+            f.write(f"{os.getpid()}\n")
+        time.sleep(0.2)  # long enough for every caller to be waiting
+        return fallback_fx_payload()
+
+    return fetch
+
+
+def _get_latest(cache_dir, history_dir, calls_path, start):
+    start.wait()
+    fx_cache.get_latest(
+        _slow_fetch(calls_path), cache_dir, today=TODAY, history_dir=history_dir
+    )
+
+
+def test_concurrent_callers_fetch_once(tmp_path):
+    cache_dir, history_dir = str(tmp_path / "cache"), str(tmp_path / "history")
+    calls_path = str(tmp_path / "calls")
+    context = multiprocessing.get_context("fork")
+    start = context.Barrier(4 + 4)
+    processes = [
+        context.Process(
+            target=_get_latest, args=(cache_dir, history_dir, calls_path, start)
+        )
+        for _ in range(4)
+    ]
+    results = []
+
+    def in_thread():
+        start.wait()
+        results.append(
+            fx_cache.get_latest(
+                _slow_fetch(calls_path), cache_dir, today=TODAY, history_dir=history_dir
+            )
+        )
+
+    threads = [threading.Thread(target=in_thread) for _ in range(4)]
+    for worker in processes + threads:
+        worker.start()
+    for worker in processes + threads:
+        worker.join()
+
+    assert [p.exitcode for p in processes] == [0] * 4
+    with open(calls_path) as f:
+        assert len(f.read().split()) == 1
+    assert all(result == fallback_fx_payload() for result in results)
+    assert fx_cache.read_cached(TODAY, cache_dir) == fallback_fx_payload()
+
+
+def test_failed_write_leaves_the_previous_file(tmp_path):
+    path = fx_cache.cache_path(TODAY, str(tmp_path))
+    fx_cache.write_atomic(path, {"rates": {"COP": 1.0}})
+    with pytest.raises(TypeError):
+        fx_cache.write_atomic(path, {"rates": {"COP": object()}})
+    with open(path) as f:
+        assert json.load(f) == {"rates": {"COP": 1.0}}
+    assert os.listdir(tmp_path) == [os.path.basename(path)]
@@ -0,0 +1,49 @@
+from datetime import date, timedelta
+
+import fx_cache
+import fx_history
+from fx_provider import fallback_fx_payload
+from updated_calculator_logic_11_26_v2 import fx_rates_by_country
+
+
+def test_evicted_days_are_kept_in_the_history_store(tmp_path, monkeypatch):
+    cache_dir, history_dir = str(tmp_path / "cache"), str(tmp_path / "history")
+    monkeypatch.setattr(fx_cache, "_memory", {})
+    start = date(2026, 1, 1)
+    payloads = {}
+
+    def fetch_for(day):
+        payload = fallback_fx_payload()
+        payload["rates"] = {
+            c: rate * (1 + (day - start).days / 1000)
+            for c, rate in payload["rates"].items()
+        }
+        payloads[day] = payload
+        return lambda: payload
+
+    days = [start + timedelta(days=i) for i in range(40)]
+    for day in days:
+        fx_cache.get_latest(
+            fetch_for(day), cache_dir, ttl=0, today=day, history_dir=history_dir
+        )
+
+    # only the last 30 days stay in the cache; every day is in the history
+    cached = sorted(p.name for p in (tmp_path / "cache").glob("fx_cache_*.json"))
+    assert len(cached) == fx_cache.FX_CACHE_KEEP_DAYS + 1
+    assert fx_history.last_date(history_dir) == days[-1]
+    for day in (days[0], days[9], days[-1]):
+        assert fx_history.read_rates(day, history_dir) == fx_rates_by_country(
+            payloads[day]
+        )
+
+
+def test_unimported_files_are_not_evicted(tmp_path):
+    cache_dir, history_dir = str(tmp_path / "cache"), str(tmp_path / "history")
+    old = date(2026, 1, 1)
+    fx_cache.write_atomic(fx_cache.cache_path(old, cache_dir), {"rates": {}})
+    # the malformed payload cannot be imported, so the file stays
+    assert (
+        fx_cache.evict_stale(old + timedelta(days=60), cache_dir, None, history_dir)
+        == []
+    )
+    assert fx_history.last_date(history_dir) is None
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+from datetime import date, timedelta
+
+import requests
+
+import fx_cache
+from fx_provider import AsyncFxProvider, fallback_fx_payload, make_http_fetcher
+from updated_calculator_logic_11_26_v2 import fx_rates_by_country
+
+
+class StubResponse:
+    def __init__(self, payload: dict | None):
+        self.payload = payload
+
+    def raise_for_status(self) -> None:
+        if self.payload is None:
+            raise requests.HTTPError("503 Service Unavailable")
+
+    def json(self) -> dict:
+        return self.payload
+
+
+class StubSession:
+    """requests.Session stand-in; each get() waits until `release` is set."""
+
+    def __init__(self, payload: dict | None):
+        self.payload = payload
+        self.calls = 0
+        self.release = threading.Event()
+
+    def get(self, url, params=None, timeout=None) -> StubResponse:
+        self.calls += 1
+        self.release.wait(timeout=5)
+        return StubResponse(self.payload)
+
+
+def _scaled(payload: dict, factor: float) -> dict:
+    return {"rates": {c: r * factor for c, r in payload["rates"].items()}}
+
+
+def test_stale_rates_are_served_while_one_refresh_runs(tmp_path):
+    yesterday = _scaled(fallback_fx_payload(), 1.1)
+    fresh = _scaled(fallback_fx_payload(), 1.2)
+    fx_cache.write_atomic(
+        fx_cache.cache_path(date.today() - timedelta(days=1), str(tmp_path)), yesterday
+    )
+    session = StubSession(fresh)
+    fetch, _ = make_http_fetcher("http://stand-in/latest.json", session=session)
+
+    async def main():
+        provider = AsyncFxProvider(fetch, cache_dir=str(tmp_path))
+        # the fetch is blocked, yet every call returns yesterday's rates
+        served = [await provider.get_rates() for _ in range(3)]
+        await asyncio.sleep(0.05)
+        calls_while_blocked = session.calls
+        session.release.set()
+        await provider.refresh()
+        return served, calls_while_blocked, await provider.get_rates(), provider
+
+    served, calls_while_blocked, refreshed, provider = asyncio.run(main())
+    assert served == [fx_rates_by_country(yesterday)] * 3
+    assert calls_while_blocked == 1
+    assert refreshed == fx_rates_by_country(fresh)
+    assert not provider.is_stale()
+    # synchronous callers see the refreshed rates through the daily file
+    assert fx_cache.read_cached(date.today(), str(tmp_path)) == fresh
+
+
+def test_failed_refresh_keeps_the_stale_rates(tmp_path):
+    session = StubSession(None)
+    session.release.set()
+    fetch, _ = make_http_fetcher("http://stand-in/latest.json", session=session)
+
+    async def main():
+        provider = AsyncFxProvider(fetch, cache_dir=str(tmp_path))
+        first = await provider.get_rates()
+        await provider.refresh()
+        second = await provider.get_rates()  # still stale: retried
+        await provider.refresh()
+        return first, second, provider
+
+    first, second, provider = asyncio.run(main())
+    assert first == second == fx_rates_by_country(fallback_fx_payload())
+    assert isinstance(provider.last_error, requests.HTTPError)
+    assert session.calls == 2
+    assert fx_cache.read_newest(str(tmp_path)) is None
@@ -0,0 +1,44 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import updated_calculator_logic_11_26_v2 as calc
+from sample_inputs import SAMPLE_PROJECT_USD, local_project, unlevered_irr_inputs
+
+POLICY_TABLE = calc.dev_build_country_policy_table()
+TIER_TABLE = calc.build_tier_table()
+FX_TABLE = calc.build_fx_table(POLICY_TABLE)
+TERMS = range(5, 26, 5)
+
+
+@pytest.mark.parametrize("target_irr", [8, 12, 15])
+def test_irr_at_the_solved_tariff_is_the_target(target_irr):
+    countries = list(POLICY_TABLE.index)
+    projects = pd.DataFrame(
+        [local_project(SAMPLE_PROJECT_USD, c, POLICY_TABLE) for c in countries]
+    )
+    tariffs = calc.goal_seek_portfolio(
+        projects, POLICY_TABLE, TIER_TABLE, FX_TABLE, "tariff", TERMS, target_irr
+    )
+    assert tariffs.shape == (len(countries), len(TERMS))
+    assert not tariffs.isna().any().any()
+    for country, row in zip(countries, tariffs.to_numpy()):
+        args = unlevered_irr_inputs(
+            SAMPLE_PROJECT_USD, country, POLICY_TABLE, TIER_TABLE, FX_TABLE
+        )
+        for term, tariff in zip(TERMS, row):
+            args["project_electric_tariff_excl_vat"] = tariff
+            irr, _, _ = calc.calculate_unlevered_irr(term, **args)
+            assert irr == pytest.approx(target_irr, rel=1e-8), (country, term)
+
+
+def test_discount_is_the_saving_on_the_current_tariff():
+    projects = pd.DataFrame([local_project(SAMPLE_PROJECT_USD, "Peru", POLICY_TABLE)])
+    tariff, discount = (
+        calc.goal_seek_portfolio(
+            projects, POLICY_TABLE, TIER_TABLE, FX_TABLE, solve_for, TERMS
+        ).to_numpy()[0]
+        for solve_for in ("tariff", "discount")
+    )
+    current = projects["current_electricity_tariff"].iloc[0]
+    np.testing.assert_allclose(current * (1 - discount), tariff, rtol=1e-12)
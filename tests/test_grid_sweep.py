@@ -0,0 +1,40 @@
+import pandas as pd
+import pytest
+
+import updated_calculator_logic_11_26_v2 as calc
+from grid_sweep import SWEEP_AXES, SWEEP_METRICS, run_grid_sweep
+
+POLICY_TABLE = calc.dev_build_country_policy_table()
+SNAPSHOT = calc.PolicySnapshot(POLICY_TABLE)
+TABLES = {
+    "frames": (
+        POLICY_TABLE,
+        calc.build_tier_table(),
+        calc.build_fx_table(POLICY_TABLE),
+    ),
+    "compiled": (
+        SNAPSHOT,
+        calc.capex_tiers(calc.build_tier_table()),
+        calc.FxTable(SNAPSHOT),
+    ),
+}
+GRID = ([500, 1_000, 2_000], [0.08, 0.12], ["Colombia", "Peru", "Chile"], [5, 10, 25])
+
+
+@pytest.mark.parametrize("tables", list(TABLES))
+def test_workers_give_identical_results(tables):
+    # chunks smaller than the grid, so several land on each worker
+    serial = run_grid_sweep(*GRID, *TABLES[tables], chunk_size=4)
+    parallel = run_grid_sweep(*GRID, *TABLES[tables], workers=2, chunk_size=4)
+    assert serial.index.names == list(SWEEP_AXES)
+    assert list(serial.columns) == list(SWEEP_METRICS)
+    assert len(serial) == 3 * 2 * 3 * 3
+    pd.testing.assert_frame_equal(serial, parallel, check_exact=True)
+
+
+def test_compiled_tables_match_frames():
+    pd.testing.assert_frame_equal(
+        run_grid_sweep(*GRID, *TABLES["frames"]),
+        run_grid_sweep(*GRID, *TABLES["compiled"]),
+        check_exact=True,
+    )
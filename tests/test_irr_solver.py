@@ -0,0 +1,77 @@
+import numpy as np
+import numpy_financial as npf
+import pytest
+
+from irr_solver import irr, irr_by_term
+
+# Agreement with numpy_financial.irr: 1e-8, relative above a 100% rate
+TOL = 1e-8
+
+GOLDEN_CASHFLOWS = (
+    (-100, 39, 59, 55, 20),
+    (-100, 0, 0, 74),
+    (-100, 100, 0, -7),
+    (-100, 100, 0, 7),
+    (-5, 10.5, 1, -8, 1),
+    (-553_141.67, 70_000, 80_000, 90_000, 100_000, 110_000, 111_899.20),
+    (-1_000, 50, 50, 50, 50, 50),
+    (-1_000, 2_000),
+    (-1_000, 100, 0, 0, 0, 0, 0, 0, 0, 0, 1_500),
+    (-10, -10, 5, 5, 5, 5, 5, 5),
+    # several outflows and a deeply negative IRR: false-position steps used
+    # to crawl against the far end of the bracket and stop at a wrong root
+    (-7.77, -2.45, -0.93, -2.76, 0.02),
+    (-1_566_904.65, -572_817.69, 14_508.3),
+)
+
+
+def _random_cashflows(rng, n_vectors: int, n_periods: int) -> np.ndarray:
+    # one to n_periods - 1 outflows, then income, some periods zero; income
+    # between 1e-2 and 1e7 times the outflows, so IRRs run from near -100%
+    # to very large rates
+    values = np.empty((n_vectors, n_periods))
+    for row in values:
+        n_out = rng.integers(1, n_periods)
+        row[:n_out] = -rng.uniform(0.01, 1, n_out) * 10 ** rng.uniform(-2, 7)
+        row[n_out:] = rng.uniform(0, 1, n_periods - n_out) * 10 ** rng.uniform(-2, 7)
+        row[rng.random(n_periods) < 0.2] = 0
+        row[0] = min(row[0], -1)
+        row[-1] = max(row[-1], 1)
+    return values
+
+
+def _assert_matches_npf(actual, values):
+    expected = np.array([npf.irr(row) for row in np.atleast_2d(values)])
+    np.testing.assert_allclose(
+        np.atleast_1d(actual), expected, rtol=TOL, atol=TOL, equal_nan=True
+    )
+
+
+@pytest.mark.parametrize("cashflows", GOLDEN_CASHFLOWS)
+def test_golden_cashflows(cashflows):
+    _assert_matches_npf(irr(cashflows), cashflows)
+    _assert_matches_npf(irr(np.array([cashflows, cashflows])), [cashflows] * 2)
+
+
+@pytest.mark.parametrize("n_periods", [2, 3, 5, 11, 26])
+def test_random_cashflows_match_npf(n_periods):
+    rng = np.random.default_rng(n_periods)
+    values = _random_cashflows(rng, 400, n_periods)
+    _assert_matches_npf(irr(values), values)
+    _assert_matches_npf([irr(row) for row in values], values)
+
+
+def test_irr_by_term_matches_npf():
+    # short terms of an investment-then-income project: the shapes
+    # search_ppa_term and evaluate_portfolio solve for terms 1, 2, 3, ...
+    rng = np.random.default_rng(0)
+    n_terms = 25
+    income = rng.uniform(5e4, 2e5, (50, 1, n_terms))
+    investment = -rng.uniform(5e5, 3e6, (50, 1, 1))
+    in_term = np.arange(1, n_terms + 1)[:, None] >= np.arange(1, n_terms + 1)
+    cashflows = np.concatenate(
+        [np.broadcast_to(investment, (50, n_terms, 1)), income * in_term], axis=-1
+    )
+    _assert_matches_npf(
+        irr_by_term(cashflows).reshape(-1), cashflows.reshape(-1, n_terms + 1)
+    )
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+import updated_calculator_logic_11_26_v2 as calc
+from monte_carlo import EXCEEDANCE_LEVELS, run_monte_carlo
+from sample_inputs import SAMPLE_PROJECT_USD, local_project
+
+POLICY_TABLE = calc.dev_build_country_policy_table()
+PPA_TERM = 15
+SCHEDULE_INPUTS = calc.build_schedule_inputs(
+    pd.DataFrame([local_project(SAMPLE_PROJECT_USD, "Colombia", POLICY_TABLE)]),
+    POLICY_TABLE,
+    calc.build_tier_table(),
+    calc.build_fx_table(POLICY_TABLE),
+    PPA_TERM,
+)
+
+
+def test_workers_give_identical_results_for_a_seed():
+    # 5 chunks, the last one short, so several land on each worker
+    runs = [
+        run_monte_carlo(
+            SCHEDULE_INPUTS, PPA_TERM, 4_500, chunk_size=1_000, seed=7, workers=workers
+        )
+        for workers in (1, 2)
+    ]
+    (serial, serial_hist), (parallel, parallel_hist) = runs
+    pd.testing.assert_frame_equal(serial, parallel, check_exact=True)
+    for metric, (counts, edges) in serial_hist.items():
+        np.testing.assert_array_equal(counts, parallel_hist[metric][0])
+        np.testing.assert_array_equal(edges, parallel_hist[metric][1])
+        assert counts.sum() == 4_500
+
+    other_seed, _ = run_monte_carlo(
+        SCHEDULE_INPUTS, PPA_TERM, 4_500, chunk_size=1_000, seed=8
+    )
+    assert not serial.equals(other_seed)
+    assert list(serial.columns[-len(EXCEEDANCE_LEVELS) :]) == list(EXCEEDANCE_LEVELS)
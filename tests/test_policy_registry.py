@@ -0,0 +1,97 @@
+import copy
+
+import numpy as np
+import pytest
+
+import policy_registry
+import result_cache
+from concurrent_calc import sample_projects
+from updated_calculator_logic_11_26_v2 import (
+    POLICY_CONFIG,
+    CapexTiers,
+    FxTable,
+    build_tier_table,
+    dev_build_country_policy_table,
+)
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """An empty registry, then the development policy as version 0."""
+    monkeypatch.setattr(policy_registry, "_active", None)
+    monkeypatch.setattr(policy_registry, "_active_config", None)
+    monkeypatch.setattr(policy_registry, "_invalidation_hooks", [])
+    monkeypatch.setattr(policy_registry, "_prewarm_hooks", [])
+    return policy_registry.install_policy(dev_build_country_policy_table())
+
+
+def _config_with(country: str, **values) -> dict:
+    config = copy.deepcopy(POLICY_CONFIG)
+    config[country].update(values)
+    return config
+
+
+def test_reload_invalidates_only_changed_countries(registry):
+    cache = result_cache.ResultCache()
+    result_cache.attach_to_registry(cache, scenarios=[])
+    tier_table, fx_table = CapexTiers(build_tier_table()), FxTable(registry)
+    for inputs in sample_projects(registry):
+        result_cache.cached_irr_curve(
+            inputs, registry, tier_table, fx_table, cache=cache
+        )
+    calls = []
+    policy_registry.register_invalidation(lambda s, changed: calls.append(changed))
+
+    peru_vat = POLICY_CONFIG["Peru"]["VAT"]
+    snapshot, changed, prewarm = policy_registry.reload_policy(
+        _config_with("Peru", VAT=peru_vat + 1)
+    )
+    assert changed == ["Peru"] and calls == [["Peru"]]
+    assert policy_registry.active_snapshot() is snapshot
+    assert snapshot.version == 1
+    assert dict(snapshot.country_versions) == {
+        c: 1 if c == "Peru" else 0 for c in registry.countries
+    }
+    # only Peru's entry was dropped; the pre-warm recomputes it
+    assert cache.stats()["size"] == len(registry.countries) - 1
+    prewarm.result()
+    assert cache.stats()["size"] == len(registry.countries)
+
+    # the same config again changes nothing
+    assert policy_registry.reload_policy() == (snapshot, [], None)
+
+
+def test_snapshot_is_unchanged_by_a_later_reload(registry):
+    before = {c: dict(registry.lookup(c)) for c in registry.countries}
+    vat = registry.vat.copy()
+
+    snapshot, _, _ = policy_registry.reload_policy(
+        _config_with("Chile", VAT=5, **{"Corporate Tax": 10})
+    )
+    assert snapshot is not registry
+    assert snapshot.lookup("Chile")["VAT"] == 0.05
+    assert registry.version == 0
+    assert {c: dict(registry.lookup(c)) for c in registry.countries} == before
+    np.testing.assert_array_equal(registry.vat, vat)
+    with pytest.raises(ValueError):
+        registry.vat[0] = 0
+
+
+def test_common_scenarios_are_prewarmed_for_changed_countries(registry):
+    cache = result_cache.ResultCache()
+    result_cache.attach_to_registry(cache)
+    snapshot, changed, prewarm = policy_registry.reload_policy(
+        _config_with("Mexico", VAT=20)
+    )
+    prewarm.result()
+    assert changed == ["Mexico"]
+    assert cache.stats()["size"] == 1
+    mexico = [p for p in sample_projects(snapshot) if p["project_country"] == "Mexico"]
+    result_cache.cached_irr_curve(
+        mexico[0],
+        snapshot,
+        CapexTiers(build_tier_table()),
+        FxTable(snapshot),
+        cache=cache,
+    )
+    assert cache.stats()["hits"] == 1
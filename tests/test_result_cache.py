@@ -0,0 +1,101 @@
+from datetime import date, timedelta
+
+import pytest
+
+import result_cache
+from concurrent_calc import sample_projects
+from result_cache import ResultCache
+from updated_calculator_logic_11_26_v2 import (
+    CapexTiers,
+    FxTable,
+    PolicySnapshot,
+    build_tier_table,
+    dev_build_country_policy_table,
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now, self.day = 0.0, date(2026, 1, 1)
+
+    def __call__(self) -> float:
+        return self.now
+
+    def today(self) -> date:
+        return self.day
+
+
+def test_lru_evicts_the_least_recently_used():
+    cache = ResultCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+    cache.put("a", 4)  # overwriting refreshes without evicting
+    cache.put("d", 5)
+    assert cache.get("c") is None
+    stats = cache.stats()
+    assert stats["size"] == 2 and stats["evictions"] == 2
+    assert (stats["hits"], stats["misses"]) == (3, 2)
+
+
+def test_entries_expire_after_ttl():
+    clock = Clock()
+    cache = ResultCache(ttl=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10
+    assert cache.get("a") is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["size"] == 0
+
+
+def test_fx_dated_entries_expire_with_the_day():
+    clock = Clock()
+    dated = ResultCache(fx_dated=True, clock=clock, today=clock.today)
+    undated = ResultCache(clock=clock, today=clock.today)
+    for cache in (dated, undated):
+        cache.put("a", 1)
+    clock.day += timedelta(days=1)
+    assert dated.get("a") is None and dated.stats()["expired"] == 1
+    assert undated.get("a") == 1
+
+
+def test_invalidate_drops_countries_and_returns_recipes():
+    cache = ResultCache()
+    cache.put(("Peru", 0, "x"), 1, recipe="peru")
+    cache.put(("Peru", 0, "y"), 2)  # no recipe: dropped, not returned
+    cache.put(("Chile", 0, "x"), 3, recipe="chile")
+    assert cache.invalidate(["Peru", "Mexico"]) == ["peru"]
+    assert cache.stats()["size"] == 1
+    assert cache.get(("Chile", 0, "x")) == 3
+
+
+def test_cached_calls_share_equal_inputs():
+    policy = PolicySnapshot(dev_build_country_policy_table())
+    tier_table, fx_table = CapexTiers(build_tier_table()), FxTable(policy)
+    inputs = sample_projects(policy)[0]
+    cache = ResultCache()
+    curve, term = result_cache.cached_irr_curve(
+        inputs, policy, tier_table, fx_table, cache=cache
+    )
+    # the same project with float-equal inputs is a hit
+    again = dict(inputs, project_capacity_kw=float(inputs["project_capacity_kw"]))
+    hit_curve, hit_term = result_cache.cached_irr_curve(
+        again, policy, tier_table, fx_table, cache=cache
+    )
+    assert hit_curve is curve and hit_term == term
+    assert cache.stats()["hits"] == 1
+    [(kind, recipe_inputs, _, params)] = cache.invalidate([inputs["project_country"]])
+    assert kind == "irr_curve" and recipe_inputs == inputs
+    assert params == {"max_term": 25, "target_irr": 12}
+
+
+@pytest.mark.parametrize("maxsize", [0, 1])
+def test_put_never_exceeds_maxsize(maxsize):
+    cache = ResultCache(maxsize=maxsize)
+    for i in range(3):
+        cache.put(i, i)
+    assert cache.stats()["size"] == maxsize
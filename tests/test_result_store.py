@@ -0,0 +1,91 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+import result_store
+from concurrent_calc import sample_projects
+from result_store import ResultStore, policy_version
+from updated_calculator_logic_11_26_v2 import (
+    CapexTiers,
+    FxTable,
+    PolicySnapshot,
+    build_tier_table,
+    dev_build_country_policy_table,
+)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Fake time.time for the store, advanced by hand."""
+    clock = SimpleNamespace(now=1_000_000.0)
+    monkeypatch.setattr(result_store, "time", SimpleNamespace(time=lambda: clock.now))
+    return clock
+
+
+def stored_total(store: ResultStore) -> int:
+    db = store._connect()
+    return db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+
+def test_total_follows_upserts_and_deletes(tmp_path):
+    store = ResultStore(str(tmp_path / "store.sqlite3"))
+    store.put("a", "Peru", "v1", {"x": 1})
+    store.put("b", "Peru", "v1", {"x": list(range(10))})
+    store.put("a", "Peru", "v2", {"x": "a longer value than before"})
+    assert store.stats()["rows"] == 2
+    assert store.stats()["bytes"] == stored_total(store)
+    assert store.get("a") == {"x": "a longer value than before"}
+    assert store.invalidate("Peru", keep_version="v2") == 1
+    assert store.stats()["bytes"] == stored_total(store) > 0
+    # a second handle on the file sees the same total
+    assert ResultStore(store.path).stats()["bytes"] == stored_total(store)
+
+
+def test_eviction_drops_least_recently_used_to_90_percent(tmp_path, clock):
+    value = {"x": "0" * 92}  # 100 bytes of JSON
+    store = ResultStore(str(tmp_path / "store.sqlite3"), max_bytes=1000)
+    for key in "abcdefghij":
+        store.put(key, "Peru", "v1", value)
+        clock.now += 1
+    assert store.stats()["bytes"] == 1000
+    clock.now += result_store.RESULT_STORE_ACCESS_RESOLUTION
+    assert store.get("a") == value  # "a" becomes the most recently used
+    store.put("k", "Peru", "v1", value)
+    stats = store.stats()
+    # 1100 bytes: the two least recently used rows go, leaving 900
+    assert stats["bytes"] == stored_total(store) == 900
+    assert {key for key in "abcdk" if store.get(key) is None} == {"b", "c"}
+
+
+def test_prune_keeps_only_current_policies(tmp_path):
+    policy = PolicySnapshot(dev_build_country_policy_table())
+    tier_table, fx_table = CapexTiers(build_tier_table()), FxTable(policy)
+    store = ResultStore(str(tmp_path / "store.sqlite3"))
+    for inputs in sample_projects(policy)[:2]:
+        result_store.quote(
+            inputs, policy, tier_table, fx_table, store=store, cache=None
+        )
+    store.put("old", "Colombia", "outdated", {"x": 1})
+    assert store.prune(policy, fx_table) == 1
+    assert store.stats()["rows"] == 2
+    assert store.get("old") is None
+    version = policy_version(policy, fx_table, "Colombia")
+    assert store.invalidate("Colombia", keep_version=version) == 0
+
+
+def test_counters_are_exact_under_threads(tmp_path):
+    store = ResultStore(str(tmp_path / "store.sqlite3"))
+    store.put("a", "Peru", "v1", {"x": 1})
+
+    def lookups():
+        for _ in range(200):
+            store.get("a")
+            store.get("missing")
+
+    threads = [threading.Thread(target=lookups) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert (store.stats()["hits"], store.stats()["misses"]) == (800, 800)
@@ -1,20 +1,19 @@
 from __future__ import annotations
 
-import os
-import json
 import pandas as pd
 import numpy as np
-import numpy_financial as npf
 
+import argparse
 import bisect
 import requests
 
-from datetime import date
+import fx_cache
+import irr_solver
+
 from tabulate import tabulate
+from types import MappingProxyType
 from typing import Tuple
 
-DEBUG = True
-
 API_KEY = "b3471f654f8b4a0797fb6278010135c3"
 
 CURRENCY_BY_COUNTRY = {
@@ -124,23 +123,50 @@ POLICY_CONFIG: dict[str, dict] = {
 }
 
 
+# Defaults for batch inputs: the admin fixed values and the optional contractor
+# inputs of the __main__ block. Any of these may be overridden per project by a
+# column of the same name in the portfolio table.
+PROJECT_INPUT_DEFAULTS: dict[str, float | bool] = {
+    "percentage_invested_by_offtaker": 0.0,
+    "saving_on_electricity_tariff": 0.0,
+    "asset_ownership_trasnferred": True,
+    "recs_enabled": False,
+    "project_contingenices_percentage": 3 / 100,
+    "capex_depreciation_years": 20,
+    "annual_power_degradation": 0.40 / 100,
+    "inverter_replacement_year": 12,
+    "insurance_risk": 0.5 / 100,
+    "asset_management_fee": 3 / 100,
+    "rec_rate": 1.5,
+}
+
+PORTFOLIO_REQUIRED_COLUMNS: tuple[str, ...] = (
+    "project_capacity_kw",
+    "project_country",
+    "epc_cost_excl_vat",
+    "epc_cost_vat",
+    "current_electricity_tariff",
+    "electricity_forecast_p90",
+    "land_rent_expense",
+)
+
+
+def download_latest_fx() -> dict:
+    symbols = ",".join(CURRENCY_BY_COUNTRY.values())
+    url = "https://openexchangerates.org/api/latest.json"
+    params = {"app_id": API_KEY, "symbols": symbols}
+    resp = requests.get(url, params=params, timeout=10)
+    resp.raise_for_status()
+    return resp.json()
+
+
 def fetch_latest_fx_cached() -> dict[str, float]:
-    today = date.today().isoformat()
-    cache_file = f"fx_cache_{today}.json"
-
-    if os.path.exists(cache_file):
-        with open(cache_file, "r") as f:
-            data = json.load(f)
-    else:
-        symbols = ",".join(CURRENCY_BY_COUNTRY.values())
-        url = "https://openexchangerates.org/api/latest.json"
-        params = {"app_id": API_KEY, "symbols": symbols}
-        resp = requests.get(url, params=params, timeout=10)
-        resp.raise_for_status()
-        data = resp.json()
-        with open(cache_file, "w") as f:
-            json.dump(data, f)
+    # served from the in-process copy; the daily file in fx_cache.FX_CACHE_DIR
+    # and the network are only touched on a miss (see fx_cache.get_latest)
+    return fx_rates_by_country(fx_cache.get_latest(download_latest_fx))
+
 
+def fx_rates_by_country(data: dict) -> dict[str, float]:
     rates = data["rates"]
     fx_map: dict[str, float] = {}
     for country, curr in CURRENCY_BY_COUNTRY.items():
@@ -152,8 +178,11 @@ def fetch_latest_fx_cached() -> dict[str, float]:
     return fx_map
 
 
-def build_country_policy_table() -> pd.DataFrame:
-    fx_map = fetch_latest_fx_cached()
+def build_country_policy_table(fx_map: dict[str, float] | None = None) -> pd.DataFrame:
+    # fx_map (country -> rate) defaults to today's rates, e.g. a historical
+    # snapshot from fx_history.read_rates for backtests
+    if fx_map is None:
+        fx_map = fetch_latest_fx_cached()
 
     df = pd.DataFrame.from_dict(POLICY_CONFIG, orient="index")
     df.insert(0, "FXrate", [fx_map[c] for c in df.index])
@@ -249,7 +278,153 @@ def dev_build_country_policy_table() -> pd.DataFrame:
     return pd.DataFrame(data).set_index("Country")
 
 
-def lookup_country_policy(country: str, policy_table: pd.DataFrame) -> dict[str, float]:
+# policy value -> (PolicySnapshot attribute, divisor applied to the table value)
+POLICY_FIELDS: dict[str, tuple[str, float]] = {
+    "FXrate": ("fx_rate", 1),
+    "Devaluation Factor": ("devaluation_factor", 100),
+    "Electric Tariff Escalator": ("electric_tariff_escalator", 100),
+    "O&M Escalator": ("om_escalator", 100),
+    "Land Rent Escalator": ("land_rent_escalator", 100),
+    "VAT": ("vat", 100),
+    "Corporate Tax": ("corporate_tax", 100),
+}
+
+
+class PolicySnapshot:
+    """
+    Immutable compiled form of a country policy table.
+
+    Every policy value is a read-only NumPy vector over `countries` (in table
+    order), with percentages already divided by 100; `index` maps a country
+    to its position. lookup() returns a prebuilt read-only mapping with the
+    same keys and values as lookup_country_policy on the table, and
+    lookup_many() gathers the vectors for a list of countries, so no pandas
+    access happens after construction.
+
+    `version` numbers the snapshot; `country_versions` gives, per country,
+    the version in which its parameters last changed (default: `version`),
+    so results cached per country stay valid across unrelated changes.
+    """
+
+    __slots__ = (
+        "version",
+        "country_versions",
+        "countries",
+        "index",
+        "currency_unit",
+        "corporate_tax_exemption_years",
+        *(attribute for attribute, _ in POLICY_FIELDS.values()),
+        "_policies",
+    )
+
+    def __init__(
+        self,
+        policy_table: pd.DataFrame,
+        version: int = 0,
+        country_versions: dict[str, int] | None = None,
+    ):
+        vectors = {
+            key: policy_table[key].to_numpy(dtype=float) / divisor
+            for key, (_, divisor) in POLICY_FIELDS.items()
+        }
+        vectors["Currency Unit"] = policy_table["Currency Unit"].to_numpy(dtype=str)
+        vectors["Corporate Tax Exemption Years"] = policy_table[
+            "Corporate Tax Exemption Years"
+        ].to_numpy(dtype=int)
+        self._assign(version, country_versions, tuple(policy_table.index), vectors)
+
+    def _assign(
+        self,
+        version: int,
+        country_versions: dict[str, int] | None,
+        countries: tuple[str, ...],
+        vectors: dict[str, np.ndarray],
+    ) -> None:
+        assign = super().__setattr__
+        assign("version", version)
+        assign(
+            "country_versions",
+            MappingProxyType(
+                {c: (country_versions or {}).get(c, version) for c in countries}
+            ),
+        )
+        assign("countries", countries)
+        assign("index", MappingProxyType({c: i for i, c in enumerate(countries)}))
+
+        for values in vectors.values():
+            values.flags.writeable = False
+        for key, (attribute, _) in POLICY_FIELDS.items():
+            assign(attribute, vectors[key])
+        assign("currency_unit", vectors["Currency Unit"])
+        assign(
+            "corporate_tax_exemption_years", vectors["Corporate Tax Exemption Years"]
+        )
+
+        keys = ["FXrate", "Currency Unit", *list(POLICY_FIELDS)[1:]]
+        keys.append("Corporate Tax Exemption Years")
+        assign(
+            "_policies",
+            {
+                country: MappingProxyType({key: vectors[key][i].item() for key in keys})
+                for i, country in enumerate(countries)
+            },
+        )
+
+    @classmethod
+    def _from_vectors(cls, version, country_versions, countries, vectors):
+        snapshot = object.__new__(cls)
+        snapshot._assign(version, country_versions, countries, vectors)
+        return snapshot
+
+    def __reduce__(self):
+        # pickled as its compiled vectors, so a copy (e.g. in a worker
+        # process) holds exactly the same values
+        vectors = {
+            key: getattr(self, attribute)
+            for key, (attribute, _) in POLICY_FIELDS.items()
+        }
+        vectors["Currency Unit"] = self.currency_unit
+        vectors["Corporate Tax Exemption Years"] = self.corporate_tax_exemption_years
+        return (
+            PolicySnapshot._from_vectors,
+            (self.version, dict(self.country_versions), self.countries, vectors),
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("PolicySnapshot is immutable.")
+
+    def position(self, country: str) -> int:
+        try:
+            return self.index[country]
+        except KeyError as exc:
+            raise KeyError(f"Country '{country}' not found in policy table.") from exc
+
+    def lookup(self, country: str) -> MappingProxyType:
+        try:
+            return self._policies[country]
+        except KeyError as exc:
+            raise KeyError(f"Country '{country}' not found in policy table.") from exc
+
+    def lookup_many(self, countries) -> dict[str, np.ndarray]:
+        rows = np.array([self.position(c) for c in countries], dtype=int)
+        policies = {
+            "FXrate": self.fx_rate[rows],
+            "Currency Unit": self.currency_unit[rows],
+        }
+        for key, (attribute, _) in list(POLICY_FIELDS.items())[1:]:
+            policies[key] = getattr(self, attribute)[rows]
+        policies["Corporate Tax Exemption Years"] = self.corporate_tax_exemption_years[
+            rows
+        ]
+        return policies
+
+
+def lookup_country_policy(
+    country: str, policy_table: pd.DataFrame | PolicySnapshot
+) -> dict[str, float]:
+    if isinstance(policy_table, PolicySnapshot):
+        return policy_table.lookup(country)
+
     try:
         row = policy_table.loc[country]
     except KeyError as exc:
@@ -268,6 +443,36 @@ def lookup_country_policy(country: str, policy_table: pd.DataFrame) -> dict[str,
     }
 
 
+def lookup_country_policies(
+    countries, policy_table: pd.DataFrame | PolicySnapshot
+) -> dict[str, np.ndarray]:
+    if isinstance(policy_table, PolicySnapshot):
+        return policy_table.lookup_many(countries)
+
+    countries = list(countries)
+    for country in countries:
+        if country not in policy_table.index:
+            raise KeyError(f"Country '{country}' not found in policy table.")
+
+    rows = policy_table.loc[countries]
+    return {
+        "FXrate": rows["FXrate"].to_numpy(dtype=float),
+        "Currency Unit": rows["Currency Unit"].to_numpy(dtype=str),
+        "Devaluation Factor": rows["Devaluation Factor"].to_numpy(dtype=float) / 100,
+        "Electric Tariff Escalator": rows["Electric Tariff Escalator"].to_numpy(
+            dtype=float
+        )
+        / 100,
+        "O&M Escalator": rows["O&M Escalator"].to_numpy(dtype=float) / 100,
+        "Land Rent Escalator": rows["Land Rent Escalator"].to_numpy(dtype=float) / 100,
+        "VAT": rows["VAT"].to_numpy(dtype=float) / 100,
+        "Corporate Tax": rows["Corporate Tax"].to_numpy(dtype=float) / 100,
+        "Corporate Tax Exemption Years": rows["Corporate Tax Exemption Years"].to_numpy(
+            dtype=int
+        ),
+    }
+
+
 def build_tier_table() -> pd.DataFrame:
     return pd.DataFrame(
         {
@@ -278,8 +483,11 @@ def build_tier_table() -> pd.DataFrame:
     )
 
 
+FX_TABLE_YEARS = 25  # years built up front; FxTable extends on demand
+
+
 def build_fx_table(policy_table: pd.DataFrame) -> pd.DataFrame:
-    years = range(1, 26)
+    years = range(1, FX_TABLE_YEARS + 1)
     data = {
         year: policy_table["FXrate"]
         * (1 + policy_table["Devaluation Factor"] / 100) ** (year - 1)
@@ -290,18 +498,179 @@ def build_fx_table(policy_table: pd.DataFrame) -> pd.DataFrame:
     return fx_df
 
 
-def lookup_fx(country: str, fx_table: pd.DataFrame, year: int = 1) -> float:
+class FxTable:
+    """
+    Array-backed form of build_fx_table: a (countries x years) float64 array
+    of FXrate * (1 + devaluation) ** (year - 1), with `index` mapping a
+    country to its row.
+
+    The array covers FX_TABLE_YEARS at first and is rebuilt with (at least)
+    twice the years whenever a longer horizon is asked for, so any PPA term
+    works. path() returns a read-only view of one country's row, without a
+    copy. Values match build_fx_table exactly. Accepts a policy table or a
+    PolicySnapshot.
+    """
+
+    __slots__ = ("countries", "index", "fx_rate", "devaluation", "_rates")
+
+    def __init__(
+        self,
+        policy_table: pd.DataFrame | PolicySnapshot,
+        years: int = FX_TABLE_YEARS,
+    ):
+        if isinstance(policy_table, PolicySnapshot):
+            self.countries = policy_table.countries
+            self.fx_rate = policy_table.fx_rate
+            self.devaluation = 1 + policy_table.devaluation_factor
+        else:
+            self.countries = tuple(policy_table.index)
+            self.fx_rate = policy_table["FXrate"].to_numpy(dtype=float)
+            self.devaluation = (
+                1 + policy_table["Devaluation Factor"].to_numpy(dtype=float) / 100
+            )
+        self.index = {c: i for i, c in enumerate(self.countries)}
+        self._rates = np.empty((len(self.countries), 0))
+        self.rates(years)
+
+    @property
+    def years(self) -> int:
+        return self._rates.shape[1]
+
+    def rates(self, years: int) -> np.ndarray:
+        """Read-only (countries x years) view of the table."""
+        rates = self._rates
+        if rates.shape[1] < years:
+            n = max(years, 2 * rates.shape[1])
+            rates = self.fx_rate[:, np.newaxis] * self.devaluation[
+                :, np.newaxis
+            ] ** np.arange(n)
+            rates.flags.writeable = False
+            # swapped in whole and only ever grown: views handed out earlier
+            # keep the old array, and threads extending at the same time each
+            # return their own complete array, so no lock is needed
+            if n > self._rates.shape[1]:
+                self._rates = rates
+        return rates[:, :years]
+
+    def position(self, country: str) -> int:
+        try:
+            return self.index[country]
+        except KeyError as exc:
+            raise KeyError(f"Country '{country}' not found in FX table.") from exc
+
+    def path(self, country: str, years: int) -> np.ndarray:
+        """FX rates of years 1..years for one country (a view, not a copy)."""
+        return self.rates(years)[self.position(country)]
+
+    def paths(self, countries, years: int) -> np.ndarray:
+        """(len(countries), years) FX paths, one row per entry of countries."""
+        rows = np.array([self.position(c) for c in countries], dtype=int)
+        return self.rates(years)[rows]
+
+    def at(self, country: str, year: int = 1) -> float:
+        return float(self.path(country, year)[year - 1])
+
+    def to_frame(self, years: int | None = None) -> pd.DataFrame:
+        """The table as build_fx_table lays it out."""
+        years = years or FX_TABLE_YEARS
+        fx_df = pd.DataFrame(
+            self.rates(years), index=list(self.countries), columns=range(1, years + 1)
+        )
+        fx_df.index.name = "Country"
+        return fx_df
+
+
+def lookup_fx(country: str, fx_table: pd.DataFrame | FxTable, year: int = 1) -> float:
+    if isinstance(fx_table, FxTable):
+        return fx_table.at(country, year)
     try:
         return float(fx_table.at[country, year])
     except KeyError as exc:
         raise KeyError(f"Country '{country}' not found in FX table.") from exc
 
 
+# tier table columns, in CapexTiers array order
+TIER_COLUMNS: tuple[str, ...] = ("SizeAbove", "CostPerkWp", "FromPreviousTranche")
+
+
+class CapexTiers:
+    """
+    Piecewise per-kWp CAPEX tiers as NumPy arrays: a default tier table plus
+    optional per-country tables (country -> build_tier_table-style frame).
+
+    price() evaluates any array of plant sizes with one np.searchsorted per
+    tier table involved instead of a bisect and an .iloc per size. Values
+    match capex_piecewise exactly.
+    """
+
+    __slots__ = ("tables", "country_tables")
+
+    def __init__(
+        self,
+        tier_table: pd.DataFrame,
+        country_tier_tables: dict[str, pd.DataFrame] | None = None,
+    ):
+        self.tables = [self._compile(tier_table)]
+        self.country_tables = {}
+        for country, table in (country_tier_tables or {}).items():
+            self.country_tables[country] = len(self.tables)
+            self.tables.append(self._compile(table))
+
+    @staticmethod
+    def _compile(tier_table: pd.DataFrame) -> tuple[np.ndarray, ...]:
+        arrays = tuple(tier_table[c].to_numpy(dtype=float) for c in TIER_COLUMNS)
+        if np.any(np.diff(arrays[0]) <= 0):
+            raise ValueError("Tier breakpoints (SizeAbove) must be increasing.")
+        return arrays
+
+    @staticmethod
+    def _price(table: tuple[np.ndarray, ...], sizes: np.ndarray) -> np.ndarray:
+        size_above, cost_per_kwp, from_previous = table
+        idx = np.searchsorted(size_above, sizes, side="right") - 1
+        if np.any(idx < 0):
+            raise ValueError("Plant size is below the minimum tier breakpoint.")
+        return from_previous[idx] + (sizes - size_above[idx]) * cost_per_kwp[idx]
+
+    def price(self, sizes, countries=None) -> np.ndarray:
+        """
+        Tier subtotal (before FX) of every plant size. `countries` is None
+        (default table), one country, or one country per size; countries
+        without their own table use the default.
+        """
+        sizes = np.asarray(sizes, dtype=float)
+        if countries is None or isinstance(countries, str):
+            table = self.country_tables.get(countries, 0)
+            return self._price(self.tables[table], sizes)
+
+        tables = np.array([self.country_tables.get(c, 0) for c in countries])
+        tables = np.broadcast_to(tables, sizes.shape)
+        subtotal = np.empty(sizes.shape)
+        for table in np.unique(tables):
+            rows = tables == table
+            subtotal[rows] = self._price(self.tables[table], sizes[rows])
+        return subtotal
+
+    def for_country(self, country: str) -> CapexTiers:
+        """These tiers with `country`'s table as the default and only table."""
+        tiers = object.__new__(CapexTiers)
+        tiers.tables = [self.tables[self.country_tables.get(country, 0)]]
+        tiers.country_tables = {}
+        return tiers
+
+
+def capex_tiers(tier_table: pd.DataFrame | CapexTiers) -> CapexTiers:
+    return tier_table if isinstance(tier_table, CapexTiers) else CapexTiers(tier_table)
+
+
 def capex_piecewise(
     size_kwp: float,
     fx_rate: float,
-    tier_table: pd.DataFrame,
+    tier_table: pd.DataFrame | CapexTiers,
+    country: str | None = None,
 ) -> float:
+    if isinstance(tier_table, CapexTiers):
+        subtotal_local = float(tier_table.price(size_kwp, country))
+        return subtotal_local * fx_rate, fx_rate
 
     idx = bisect.bisect_right(tier_table["SizeAbove"], size_kwp) - 1
     if idx < 0:
@@ -320,11 +689,324 @@ def total_capex_usd(
     size_kwp: float,
     country: str,
     *,
-    tier_table: pd.DataFrame,
-    fx_table: pd.DataFrame,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table: pd.DataFrame | FxTable,
 ) -> float:
     rate = lookup_fx(country, fx_table)
-    return capex_piecewise(size_kwp, rate, tier_table)
+    return capex_piecewise(size_kwp, rate, tier_table, country)
+
+
+SCHEDULE_ROWS: tuple[str, ...] = (
+    "Energy Project Tenor Flag",
+    "Inverter Replacement Flag",
+    "Dismantling Flag",
+    "Corporate Tax Exemption Flag",
+    "Inflation Year Counter",
+    "Power Degradation Index",
+    "PPA Inflation Index",
+    "O&M Inflation Index",
+    "Land Inflation Index",
+    "FX Rate",
+    "Annual Output (kWh AC)",
+    "Energy Price ($/kWh, escalated)",
+    "Total Revenue",
+    "O&M Expense",
+    "Insurance Expense",
+    "Management Expense",
+    "Land Expense",
+    "Renewable Energy Credits",
+    "Dismantling Expense",
+    "ES Expense",
+    "Total OPEX",
+    # --- VAT schedule rows ---
+    "VAT paid on CAPEX",
+    "Net op. VAT for Recovery",
+    "Opening VAT Balance",
+    "CAPEX VAT Additions",
+    "CAPEX VAT Recovery",
+    "Closing VAT Balance",
+    # --- Ungeared corporate income tax ---
+    "CAPEX Depreciation",
+    "Project Taxable Income",
+    "Project Tax",
+    # --- Unlevered IRR post tax ---
+    "EBITDA",
+    "Tax Paid (ungeared)",
+    "Inverter Replacement",
+    "Project Cashflow",
+)
+
+
+# build_unlevered_schedule arguments other than ppa_term, by name
+SCHEDULE_INPUTS: tuple[str, ...] = (
+    "inverter_replacement_year",
+    "annual_power_degradation",
+    "specific_power_output",
+    "project_capacity_kw",
+    "project_electric_tariff_excl_vat",
+    "op_maintenance_monitor_expense",
+    "insurance_risk",
+    "total_construction_cost_incl_vat",
+    "asset_management_fee",
+    "land_rent_expense",
+    "recs_enabled",
+    "rec_cost",
+    "dismantling_cost",
+    "es_reporting_excl_vat",
+    "policy",
+    "fx_rates",
+    "project_vat",
+    "capex_depreciation_years",
+    "inverter_replacement_excl_vat",
+    "total_capex_incl_vat",
+    "total_project_cost_excl_vat",
+)
+
+
+def lookup_fx_path(
+    country: str, fx_table: pd.DataFrame | FxTable, ppa_term: int
+) -> np.ndarray:
+    if isinstance(fx_table, FxTable):
+        return fx_table.path(country, ppa_term)
+    try:
+        return fx_table.loc[country, 1:ppa_term].to_numpy(dtype=float)
+    except KeyError as exc:
+        raise KeyError(f"Country '{country}' not found in FX table.") from exc
+
+
+def lookup_fx_paths(
+    countries, fx_table: pd.DataFrame | FxTable, ppa_term: int
+) -> np.ndarray:
+    """(len(countries), ppa_term) FX paths, one row per country."""
+    if isinstance(fx_table, FxTable):
+        return fx_table.paths(countries, ppa_term)
+    return np.vstack([lookup_fx_path(c, fx_table, ppa_term) for c in countries])
+
+
+def _as_column(value) -> np.ndarray:
+    # Scalars become shape (1,), arrays of shape (...) become (..., 1) so they
+    # broadcast against the trailing year axis.
+    return np.asarray(value, dtype=float)[..., np.newaxis]
+
+
+def _with_year_zero(values: np.ndarray, year_zero=0.0) -> np.ndarray:
+    head = np.broadcast_to(
+        np.asarray(year_zero, dtype=float)[..., np.newaxis], values.shape[:-1] + (1,)
+    )
+    return np.concatenate([head, values], axis=-1)
+
+
+def _vat_closing_balance(opening_balance, net_op_vat: np.ndarray) -> np.ndarray:
+    """
+    Closing VAT balance for years 1..n without a per-year loop.
+
+    The recursion closing_t = closing_(t-1) - min(closing_(t-1), net_op_vat_t) is
+    max(closing_(t-1) - net_op_vat_t, 0), i.e. a running balance reflected at
+    zero, so it equals S_t - min(0, min_(s<=t) S_s) with S the unclamped
+    running balance.
+    """
+    running = np.subtract.accumulate(
+        _with_year_zero(net_op_vat, opening_balance), axis=-1
+    )
+    floor = np.minimum(np.minimum.accumulate(running, axis=-1), 0.0)
+    return (running - floor)[..., 1:]
+
+
+def build_unlevered_schedule(
+    ppa_term,
+    inverter_replacement_year,
+    annual_power_degradation,
+    specific_power_output,
+    project_capacity_kw,
+    project_electric_tariff_excl_vat,
+    op_maintenance_monitor_expense,
+    insurance_risk,
+    total_construction_cost_incl_vat,
+    asset_management_fee,
+    land_rent_expense,
+    recs_enabled,
+    rec_cost,
+    dismantling_cost,
+    es_reporting_excl_vat,
+    policy,
+    fx_rates,
+    project_vat,
+    capex_depreciation_years,
+    inverter_replacement_excl_vat,
+    total_capex_incl_vat,
+    total_project_cost_excl_vat,
+) -> dict[str, np.ndarray]:
+    """
+    Array version of the year 0..ppa_term unlevered schedule.
+
+    fx_rates holds the FX rate for years 1..ppa_term on its last axis. Every
+    other input (and every policy value) may be a scalar or an array; leading
+    axes broadcast, so one call can evaluate many projects at once. Returns
+    one array per SCHEDULE_ROWS label with shape (..., ppa_term + 1).
+
+    ppa_term may itself be an array of terms: the year axis then runs to the
+    longest term and every row is zero after each schedule's own term, which
+    leaves the IRR of the padded cashflow unchanged.
+    """
+    terms = np.asarray(ppa_term)
+    horizon = int(terms.max())
+    year = np.arange(1, horizon + 1)
+    fx_rate = np.asarray(fx_rates, dtype=float)[..., :horizon]
+    fx_rate_y1 = fx_rate[..., :1]
+
+    inverter_year = _as_column(inverter_replacement_year)
+    exemption_years = _as_column(policy["Corporate Tax Exemption Years"])
+    depreciation_years = _as_column(capex_depreciation_years)
+    inverter_excl_vat = _as_column(inverter_replacement_excl_vat)
+    capacity_kw = _as_column(project_capacity_kw)
+
+    # ---- flags & indices ----
+    term = terms[..., np.newaxis]
+    tenor_flag = (year <= term).astype(float)
+    inverter_flag = (year == inverter_year).astype(float)
+    dismantling_flag = (year == term).astype(float)
+    exemption_flag = (year > exemption_years).astype(float)
+
+    power_degradation_index = (1 - _as_column(annual_power_degradation)) ** year
+    ppa_index = (1 + _as_column(policy["Electric Tariff Escalator"])) ** (year - 1)
+    o_and_m_idx = (1 + _as_column(policy["O&M Escalator"])) ** (year - 1)
+    land_idx = (1 + _as_column(policy["Land Rent Escalator"])) ** (year - 1)
+
+    # ---- output & revenue ----
+    annual_output = (
+        _as_column(specific_power_output) * capacity_kw * power_degradation_index
+    )
+    energy_price = _as_column(project_electric_tariff_excl_vat) * ppa_index / fx_rate
+    revenue = energy_price * annual_output
+
+    # ---- expenses ----
+    o_and_m_exp = (
+        -o_and_m_idx
+        * _as_column(op_maintenance_monitor_expense)
+        * capacity_kw
+        * 1000
+        / fx_rate
+    )
+    ins_exp = (
+        -_as_column(insurance_risk)
+        * _as_column(total_construction_cost_incl_vat)
+        * o_and_m_idx
+        / fx_rate
+    )
+    mgmt_exp = -_as_column(asset_management_fee) * revenue * o_and_m_idx
+    land_exp = -(land_idx * _as_column(land_rent_expense)) / fx_rate
+    recs_share = np.where(np.asarray(recs_enabled, dtype=bool), 0.3, 0.0)[
+        ..., np.newaxis
+    ]
+    recs_exp = -(annual_output / 1000) * _as_column(rec_cost) * recs_share / fx_rate
+    # 0.0 - x rather than -x so a zero dismantling cost stays +0.0
+    dismant_exp = np.where(
+        dismantling_flag == 1, 0.0 - _as_column(dismantling_cost) / fx_rate, 0.0
+    )
+    es_exp = np.where(
+        year <= 2, -(_as_column(es_reporting_excl_vat) * o_and_m_idx) / fx_rate, 0.0
+    )
+
+    total_opex = (
+        o_and_m_exp + ins_exp + mgmt_exp + land_exp + recs_exp + dismant_exp + es_exp
+    )
+    ebitda = revenue + total_opex
+
+    # ---- VAT schedule ----
+    vat_paid_on_capex_y0 = np.asarray(project_vat, dtype=float) / fx_rate_y1[..., 0]
+    net_op_vat = ebitda * _as_column(policy["VAT"])
+    closing_balance = _vat_closing_balance(vat_paid_on_capex_y0, net_op_vat)
+    opening_balance = _with_year_zero(closing_balance, vat_paid_on_capex_y0)[..., :-1]
+    capex_vat_rec = -np.minimum(opening_balance, net_op_vat)
+
+    # --- Ungeared corporate income tax for project IRR ---
+    base_cost = _as_column(total_project_cost_excl_vat) + np.where(
+        year >= inverter_year, inverter_excl_vat, 0.0
+    )
+    capex_depreciation = np.where(
+        year <= depreciation_years, -(base_cost / depreciation_years) / fx_rate, 0.0
+    )
+    project_taxable_income = ebitda + capex_depreciation
+    project_tax = -(
+        project_taxable_income * _as_column(policy["Corporate Tax"]) * exemption_flag
+    )
+
+    # --- Unlevered IRR Post Tax ---
+    tax_paid_ungeared = project_tax - capex_vat_rec
+    inverter_replacement = -(inverter_flag * inverter_excl_vat / fx_rate_y1)
+    project_cashflow = ebitda + tax_paid_ungeared + inverter_replacement
+
+    ebitda_y0 = np.asarray(total_capex_incl_vat, dtype=float) / fx_rate_y1[..., 0]
+    shape = np.broadcast_shapes(
+        project_cashflow.shape, tenor_flag.shape, ebitda_y0.shape + (1,)
+    )
+    operating = {
+        "Energy Project Tenor Flag": tenor_flag,
+        "Inverter Replacement Flag": inverter_flag,
+        "Dismantling Flag": dismantling_flag,
+        "Corporate Tax Exemption Flag": exemption_flag,
+        "Inflation Year Counter": (year - 1).astype(float),
+        "Power Degradation Index": power_degradation_index,
+        "PPA Inflation Index": ppa_index,
+        "O&M Inflation Index": o_and_m_idx,
+        "Land Inflation Index": land_idx,
+        "FX Rate": fx_rate,
+        "Annual Output (kWh AC)": annual_output,
+        "Energy Price ($/kWh, escalated)": energy_price,
+        "Total Revenue": revenue,
+        "O&M Expense": o_and_m_exp,
+        "Insurance Expense": ins_exp,
+        "Management Expense": mgmt_exp,
+        "Land Expense": land_exp,
+        "Renewable Energy Credits": recs_exp,
+        "Dismantling Expense": dismant_exp,
+        "ES Expense": es_exp,
+        "Total OPEX": total_opex,
+        "VAT paid on CAPEX": np.zeros_like(year, dtype=float),
+        "Net op. VAT for Recovery": net_op_vat,
+        "Opening VAT Balance": opening_balance,
+        "CAPEX VAT Additions": np.zeros_like(year, dtype=float),
+        "CAPEX VAT Recovery": capex_vat_rec,
+        "Closing VAT Balance": closing_balance,
+        "CAPEX Depreciation": capex_depreciation,
+        "Project Taxable Income": project_taxable_income,
+        "Project Tax": project_tax,
+        "EBITDA": ebitda,
+        "Tax Paid (ungeared)": tax_paid_ungeared,
+        "Inverter Replacement": inverter_replacement,
+        "Project Cashflow": project_cashflow,
+    }
+    # year-0: no operations yet, only the CAPEX outflow and the VAT paid on it
+    year_zero = {
+        "VAT paid on CAPEX": vat_paid_on_capex_y0,
+        "CAPEX VAT Additions": vat_paid_on_capex_y0,
+        "CAPEX VAT Recovery": -np.minimum(vat_paid_on_capex_y0, 0.0),
+        "Closing VAT Balance": vat_paid_on_capex_y0,
+        "EBITDA": ebitda_y0,
+        "Project Cashflow": -ebitda_y0,
+    }
+
+    in_tenor = tenor_flag == 1
+    table = np.zeros((len(SCHEDULE_ROWS),) + shape[:-1] + (horizon + 1,))
+    for row, label in zip(table, SCHEDULE_ROWS):
+        row[..., 1:] = (
+            operating[label]
+            if terms.ndim == 0
+            else np.where(in_tenor, operating[label], 0.0)
+        )
+        if label in year_zero:
+            row[..., 0] = year_zero[label]
+
+    return dict(zip(SCHEDULE_ROWS, table))
+
+
+def schedule_to_frame(schedule: dict[str, np.ndarray]) -> pd.DataFrame:
+    df = pd.DataFrame(
+        np.vstack([schedule[label] for label in SCHEDULE_ROWS]),
+        index=list(SCHEDULE_ROWS),
+    )
+    df.index.name = "Metric"
+    return df
 
 
 def calculate_unlevered_irr(
@@ -349,203 +1031,649 @@ def calculate_unlevered_irr(
     project_vat,
     capex_depreciation_years,
     inverter_replacement_excl_vat,
+    *,
+    total_capex_incl_vat,
+    total_project_cost_excl_vat,
 ) -> Tuple[float, pd.DataFrame]:
-    rows = {
-        "Energy Project Tenor Flag": [],
-        "Inverter Replacement Flag": [],
-        "Dismantling Flag": [],
-        "Corporate Tax Exemption Flag": [],
-        "Inflation Year Counter": [],
-        "Power Degradation Index": [],
-        "PPA Inflation Index": [],
-        "O&M Inflation Index": [],
-        "Land Inflation Index": [],
-        "FX Rate": [],
-        "Annual Output (kWh AC)": [],
-        "Energy Price ($/kWh, escalated)": [],
-        "Total Revenue": [],
-        "O&M Expense": [],
-        "Insurance Expense": [],
-        "Management Expense": [],
-        "Land Expense": [],
-        "Renewable Energy Credits": [],
-        "Dismantling Expense": [],
-        "ES Expense": [],
-        "Total OPEX": [],
-        # --- VAT schedule rows ---
-        "VAT paid on CAPEX": [],
-        "Net op. VAT for Recovery": [],
-        "Opening VAT Balance": [],
-        "CAPEX VAT Additions": [],
-        "CAPEX VAT Recovery": [],
-        "Closing VAT Balance": [],
-        # --- Ungeared corporate income tax ---
-        "CAPEX Depreciation": [],
-        "Project Taxable Income": [],
-        "Project Tax": [],
-        # --- Unlevered IRR post tax ---
-        "EBITDA": [],
-        "Tax Paid (ungeared)": [],
-        "Inverter Replacement": [],
-        "Project Cashflow": [],
-    }
     cash_flows = []
-    corporate_tax_exemption_year = policy["Corporate Tax Exemption Years"]
-
-    # ------------------- initialise VAT year-0 --------------------------------------
-    fx_rate_y0 = fx_table.at[country, 1]
-    vat_paid_on_capex_y0 = project_vat / fx_rate_y0
-    net_op_vat_recovery_y0 = 0.0
-    opening_balance_y0 = 0.0
-    capex_vat_add_y0 = vat_paid_on_capex_y0
-    capex_vat_rec_y0 = -min(
-        opening_balance_y0 + capex_vat_add_y0, net_op_vat_recovery_y0
+    schedule = build_unlevered_schedule(
+        ppa_term,
+        inverter_replacement_year,
+        annual_power_degradation,
+        specific_power_output,
+        project_capacity_kw,
+        project_electric_tariff_excl_vat,
+        op_maintenance_monitor_expense,
+        insurance_risk,
+        total_construction_cost_incl_vat,
+        asset_management_fee,
+        land_rent_expense,
+        recs_enabled,
+        rec_cost,
+        dismantling_cost,
+        es_reporting_excl_vat,
+        policy,
+        lookup_fx_path(country, fx_table, ppa_term),
+        project_vat,
+        capex_depreciation_years,
+        inverter_replacement_excl_vat,
+        total_capex_incl_vat,
+        total_project_cost_excl_vat,
     )
-    closing_balance_y0 = opening_balance_y0 + capex_vat_add_y0 + capex_vat_rec_y0
-
-    ebitda_y0 = total_capex_incl_vat / fx_rate_y0
-
-    # store year-0 (no operations yet)
-    for label in rows:
-        rows[label].append(0.0)
-    rows["VAT paid on CAPEX"][0] = vat_paid_on_capex_y0
-    rows["Net op. VAT for Recovery"][0] = net_op_vat_recovery_y0
-    rows["Opening VAT Balance"][0] = opening_balance_y0
-    rows["CAPEX VAT Additions"][0] = capex_vat_add_y0
-    rows["CAPEX VAT Recovery"][0] = capex_vat_rec_y0
-    rows["Closing VAT Balance"][0] = closing_balance_y0
-    rows["EBITDA"][0] = ebitda_y0
-    rows["Project Cashflow"][0] = -ebitda_y0
-
-    # ------------------- operational years 1 … ppa_term -----------------------------
-    for year in range(1, ppa_term + 1):
-        # ---- flags & indices ----
-        rows["Energy Project Tenor Flag"].append(1)
-        rows["Inverter Replacement Flag"].append(
-            1 if year == inverter_replacement_year else 0
-        )
-        rows["Dismantling Flag"].append(1 if year == ppa_term else 0)
-        rows["Corporate Tax Exemption Flag"].append(
-            0 if year <= corporate_tax_exemption_year else 1
-        )
-        rows["Inflation Year Counter"].append(year - 1)
-
-        power_degradation_index = (1 - annual_power_degradation) ** year
-        ppa_index = (1 + policy["Electric Tariff Escalator"]) ** (year - 1)
-        o_and_m_idx = (1 + policy["O&M Escalator"]) ** (year - 1)
-        land_idx = (1 + policy["Land Rent Escalator"]) ** (year - 1)
-        fx_rate = fx_table.at[country, year]
-        fx_rate_y1 = fx_table.at[country, 1]
-
-        rows["Power Degradation Index"].append(power_degradation_index)
-        rows["PPA Inflation Index"].append(ppa_index)
-        rows["O&M Inflation Index"].append(o_and_m_idx)
-        rows["Land Inflation Index"].append(land_idx)
-        rows["FX Rate"].append(fx_rate)
-
-        # ---- output & revenue ----
-        annual_output = (
-            specific_power_output * project_capacity_kw * power_degradation_index
-        )
-        energy_price = project_electric_tariff_excl_vat * ppa_index / fx_rate
-        revenue = energy_price * annual_output
-
-        # ---- expenses ----
-        o_and_m_exp = (
-            -o_and_m_idx
-            * op_maintenance_monitor_expense
-            * project_capacity_kw
-            * 1000
-            / fx_rate
+
+    # ------------------- investment outflow & IRR -----------------------------------
+    irr = irr_solver.irr(schedule["Project Cashflow"]) * 100
+    df = schedule_to_frame(schedule)
+
+    return irr, cash_flows, df
+
+
+def _terminal_ebitda(schedule: dict[str, np.ndarray], dismantling_cost) -> np.ndarray:
+    # EBITDA of years 1..H, each as if it were the final (dismantling) year
+    fx_rate = schedule["FX Rate"][..., 1:]
+    dismant_exp = 0.0 - _as_column(dismantling_cost) / fx_rate
+
+    total_opex = (
+        schedule["O&M Expense"][..., 1:]
+        + schedule["Insurance Expense"][..., 1:]
+        + schedule["Management Expense"][..., 1:]
+        + schedule["Land Expense"][..., 1:]
+        + schedule["Renewable Energy Credits"][..., 1:]
+        + dismant_exp
+        + schedule["ES Expense"][..., 1:]
+    )
+    return schedule["Total Revenue"][..., 1:] + total_opex
+
+
+def _by_term(full: np.ndarray, terminal: np.ndarray) -> np.ndarray:
+    # (..., H + 1) full-tenor row and (..., H) terminal years -> (..., H, H + 1)
+    horizon = terminal.shape[-1]
+    year = np.arange(horizon + 1)
+    term = np.arange(1, horizon + 1)[:, np.newaxis]
+    return np.where(year < term, full[..., np.newaxis, :], 0.0) + np.where(
+        year == term, terminal[..., np.newaxis], 0.0
+    )
+
+
+def term_ebitda(schedule: dict[str, np.ndarray], dismantling_cost) -> np.ndarray:
+    """
+    EBITDA of every PPA term 1..H from one schedule built to term H, laid out
+    as term_cashflows: row T - 1 is the year 0..H EBITDA of term T.
+    """
+    return _by_term(schedule["EBITDA"], _terminal_ebitda(schedule, dismantling_cost))
+
+
+def term_cashflows(
+    schedule: dict[str, np.ndarray], policy, dismantling_cost
+) -> np.ndarray:
+    """
+    Project cashflow of every PPA term 1..H from one schedule built to term H.
+
+    Years before a term's final year do not depend on the term, so each
+    shorter term's cashflow is the full-tenor cashflow truncated at its final
+    year T, with year T recomputed as a terminal year (dismantling expense and
+    the EBITDA-driven VAT recovery and tax that follow from it). Returns shape
+    (..., H, H + 1): row T - 1 is the year 0..H cashflow of term T, zero after T.
+    """
+    ebitda = _terminal_ebitda(schedule, dismantling_cost)
+    net_op_vat = ebitda * _as_column(policy["VAT"])
+    capex_vat_rec = -np.minimum(schedule["Opening VAT Balance"][..., 1:], net_op_vat)
+    project_taxable_income = ebitda + schedule["CAPEX Depreciation"][..., 1:]
+    project_tax = -(
+        project_taxable_income
+        * _as_column(policy["Corporate Tax"])
+        * schedule["Corporate Tax Exemption Flag"][..., 1:]
+    )
+    terminal_cashflow = (
+        ebitda
+        + (project_tax - capex_vat_rec)
+        + schedule["Inverter Replacement"][..., 1:]
+    )
+    return _by_term(schedule["Project Cashflow"], terminal_cashflow)
+
+
+def search_ppa_term(
+    max_term,
+    target_irr,
+    inverter_replacement_year,
+    annual_power_degradation,
+    country,
+    specific_power_output,
+    project_capacity_kw,
+    project_electric_tariff_excl_vat,
+    op_maintenance_monitor_expense,
+    insurance_risk,
+    total_construction_cost_incl_vat,
+    asset_management_fee,
+    land_rent_expense,
+    recs_enabled,
+    rec_cost,
+    dismantling_cost,
+    es_reporting_excl_vat,
+    policy,
+    fx_table,
+    project_vat,
+    capex_depreciation_years,
+    inverter_replacement_excl_vat,
+    *,
+    total_capex_incl_vat,
+    total_project_cost_excl_vat,
+) -> Tuple[pd.Series, int | None]:
+    """
+    Unlevered IRR (%) for every PPA term 1..max_term from a single schedule.
+
+    Takes the calculate_unlevered_irr inputs (with max_term in place of
+    ppa_term) and returns the term -> IRR curve and the first term whose IRR
+    reaches target_irr, or None when no term does. The CAPEX totals are
+    passed by keyword, as for calculate_unlevered_irr.
+    """
+    schedule = build_unlevered_schedule(
+        max_term,
+        inverter_replacement_year,
+        annual_power_degradation,
+        specific_power_output,
+        project_capacity_kw,
+        project_electric_tariff_excl_vat,
+        op_maintenance_monitor_expense,
+        insurance_risk,
+        total_construction_cost_incl_vat,
+        asset_management_fee,
+        land_rent_expense,
+        recs_enabled,
+        rec_cost,
+        dismantling_cost,
+        es_reporting_excl_vat,
+        policy,
+        lookup_fx_path(country, fx_table, max_term),
+        project_vat,
+        capex_depreciation_years,
+        inverter_replacement_excl_vat,
+        total_capex_incl_vat,
+        total_project_cost_excl_vat,
+    )
+    cashflows = term_cashflows(schedule, policy, dismantling_cost)
+    irr_curve = pd.Series(
+        irr_solver.irr(cashflows) * 100,
+        index=pd.RangeIndex(1, max_term + 1, name="PPA Term"),
+        name="Unlevered Post-Tax IRR (%)",
+    )
+
+    meets_target = irr_curve.index[irr_curve >= target_irr]
+    optimal_term = int(meets_target[0]) if len(meets_target) else None
+
+    return irr_curve, optimal_term
+
+
+def single_project(project: pd.DataFrame | pd.Series, analysis: str) -> pd.DataFrame:
+    """
+    `project` (a one-row portfolio table or a Series of its columns) as a
+    one-row table indexed 0; raises ValueError naming `analysis` otherwise.
+    """
+    if isinstance(project, pd.Series):
+        project = project.to_frame().T.infer_objects()
+    if len(project) != 1:
+        raise ValueError(f"{analysis} takes exactly one project.")
+    return project.reset_index(drop=True)
+
+
+def prepare_portfolio(
+    projects: pd.DataFrame,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame | CapexTiers,
+    fx_table: pd.DataFrame,
+    policy: dict[str, np.ndarray] | None = None,
+) -> dict[str, np.ndarray]:
+    """
+    Cost/VAT stack of the __main__ block for every row of `projects` at once.
+
+    `projects` needs the PORTFOLIO_REQUIRED_COLUMNS; any column missing from
+    PROJECT_INPUT_DEFAULTS falls back to its default. `policy` replaces the
+    policy_table lookup with per-project policy arrays (as returned by
+    lookup_country_policies). Returns one array per calculate_unlevered_irr
+    input (plus the intermediate cost lines), each with one entry per project.
+    """
+    missing = [c for c in PORTFOLIO_REQUIRED_COLUMNS if c not in projects.columns]
+    if missing:
+        raise KeyError(f"Portfolio table is missing columns: {', '.join(missing)}")
+
+    def column(name: str, dtype=float) -> np.ndarray:
+        if name in projects.columns:
+            return projects[name].to_numpy(dtype=dtype)
+        return np.full(len(projects), PROJECT_INPUT_DEFAULTS[name], dtype=dtype)
+
+    countries = projects["project_country"].tolist()
+    if policy is None:
+        policy = lookup_country_policies(countries, policy_table)
+    fx_rate = lookup_fx_paths(countries, fx_table, 1)[:, 0]
+
+    project_capacity_kw = column("project_capacity_kw")
+    epc_cost_excl_vat = column("epc_cost_excl_vat")
+    epc_cost_vat = column("epc_cost_vat")
+    percentage_invested_by_offtaker = column("percentage_invested_by_offtaker")
+    project_contingenices_percentage = column("project_contingenices_percentage")
+
+    project_management_excluding_vat = (
+        capex_tiers(tier_table).price(project_capacity_kw, countries) * fx_rate
+    )
+    project_readiness_excl_vat = epc_cost_excl_vat * 0.05
+    project_es_excluding_vat = np.zeros(len(projects))
+    project_due_diligence_excl_vat = np.zeros(len(projects))
+    project_contingenices_excluding_vat = project_contingenices_percentage * (
+        epc_cost_excl_vat
+        + project_management_excluding_vat
+        + project_es_excluding_vat
+        + project_due_diligence_excl_vat
+    )
+    total_project_cost_excl_vat = (
+        epc_cost_excl_vat
+        + project_management_excluding_vat
+        + project_readiness_excl_vat
+        + project_contingenices_excluding_vat
+        + project_es_excluding_vat
+        + project_due_diligence_excl_vat
+    )
+
+    project_management_vat = project_management_excluding_vat * policy["VAT"]
+    project_readiness_vat = project_readiness_excl_vat * policy["VAT"]
+    project_contingencies_vat = project_contingenices_excluding_vat * policy["VAT"]
+    project_es_vat = project_es_excluding_vat * policy["VAT"]
+    project_due_diligence_vat = project_due_diligence_excl_vat * policy["VAT"]
+    project_vat = (
+        epc_cost_vat
+        + project_management_vat
+        + project_readiness_vat
+        + project_contingencies_vat
+        + project_es_vat
+        + project_due_diligence_vat
+    )
+    specific_project_cost_incl_vat = (
+        (1 - percentage_invested_by_offtaker) * (epc_cost_excl_vat + epc_cost_vat)
+        + (project_vat - epc_cost_vat)
+        + (total_project_cost_excl_vat - epc_cost_excl_vat)
+    ) / project_capacity_kw
+    total_capex_incl_vat = specific_project_cost_incl_vat * project_capacity_kw
+
+    op_maintenance_monitor_expense_excl_vat = (
+        12 * (1 - 0.2) * project_capacity_kw
+    ) * fx_rate
+
+    return {
+        "policy": policy,
+        "fx_rate": fx_rate,
+        "project_management_excluding_vat": project_management_excluding_vat,
+        "project_readiness_excl_vat": project_readiness_excl_vat,
+        "project_contingenices_excluding_vat": project_contingenices_excluding_vat,
+        "project_es_excluding_vat": project_es_excluding_vat,
+        "project_due_diligence_excl_vat": project_due_diligence_excl_vat,
+        "total_project_cost_excl_vat": total_project_cost_excl_vat,
+        "project_management_vat": project_management_vat,
+        "project_readiness_vat": project_readiness_vat,
+        "project_contingencies_vat": project_contingencies_vat,
+        "project_es_vat": project_es_vat,
+        "project_due_diligence_vat": project_due_diligence_vat,
+        "project_vat": project_vat,
+        "specific_project_cost_incl_vat": specific_project_cost_incl_vat,
+        "total_capex_incl_vat": total_capex_incl_vat,
+        "total_construction_cost_incl_vat": (
+            total_capex_incl_vat - project_readiness_excl_vat - project_readiness_vat
+        ),
+        "inverter_replacement_year": column("inverter_replacement_year", int),
+        "annual_power_degradation": column("annual_power_degradation"),
+        "specific_power_output": (
+            column("electricity_forecast_p90") / project_capacity_kw
+        ),
+        "project_capacity_kw": project_capacity_kw,
+        "project_electric_tariff_excl_vat": column("current_electricity_tariff")
+        * (1 - column("saving_on_electricity_tariff")),
+        "op_maintenance_monitor_expense_excl_vat": (
+            op_maintenance_monitor_expense_excl_vat
+        ),
+        "op_maintenance_monitor_expense": op_maintenance_monitor_expense_excl_vat
+        / (project_capacity_kw * 1000),
+        "insurance_risk": column("insurance_risk"),
+        "asset_management_fee": column("asset_management_fee"),
+        "land_rent_expense": column("land_rent_expense"),
+        "recs_enabled": column("recs_enabled", bool),
+        "rec_cost": column("rec_rate") * fx_rate,
+        "dismantling_cost": np.where(
+            column("asset_ownership_trasnferred", bool),
+            0.0,
+            0.02 * epc_cost_excl_vat,
+        ),
+        "es_reporting_excl_vat": np.zeros(len(projects)),
+        "capex_depreciation_years": column("capex_depreciation_years", int),
+        "inverter_replacement_excl_vat": 17 * project_capacity_kw * fx_rate,
+    }
+
+
+def build_schedule_inputs(
+    projects: pd.DataFrame,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame,
+    fx_table: pd.DataFrame,
+    horizon: int,
+    policy: dict[str, np.ndarray] | None = None,
+) -> dict:
+    """
+    SCHEDULE_INPUTS for every row of `projects`, by name, with the FX path of
+    each project's country to `horizon` years. Every value has one entry per
+    project (fx_rates: one row per project). `policy` is passed on to
+    prepare_portfolio.
+    """
+    prepared = prepare_portfolio(projects, policy_table, tier_table, fx_table, policy)
+    schedule_inputs = {name: prepared.get(name) for name in SCHEDULE_INPUTS}
+    schedule_inputs["fx_rates"] = lookup_fx_paths(
+        projects["project_country"], fx_table, horizon
+    )
+    return schedule_inputs
+
+
+def stack_schedule_inputs(batches: list[dict]) -> dict:
+    """Concatenate schedule input dicts along the leading (project) axis."""
+    stacked = {
+        name: np.concatenate([np.asarray(b[name]) for b in batches])
+        for name in batches[0]
+        if name != "policy"
+    }
+    stacked["policy"] = {
+        key: np.concatenate([np.asarray(b["policy"][key]) for b in batches])
+        for key in batches[0]["policy"]
+    }
+    return stacked
+
+
+def first_term_meeting_target(
+    irr: np.ndarray, target_irr: float
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Per row of `irr` (%, one column per term), the column of the first IRR
+    reaching target_irr (0 when none does) and whether any does.
+    """
+    meets_target = irr >= target_irr
+    return meets_target.argmax(axis=1), meets_target.any(axis=1)
+
+
+def evaluate_portfolio(
+    projects: pd.DataFrame,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame,
+    fx_table: pd.DataFrame,
+    terms=range(1, 26),
+    target_irr: float = 12,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Unlevered IRR of every project in `projects` at every PPA term in `terms`.
+
+    All projects go through build_unlevered_schedule as one (projects x years)
+    array built to the longest term; shorter terms are derived from it with
+    term_cashflows. Returns the IRR table (%, one row per project, one column
+    per term) and, per project, the first term whose IRR reaches `target_irr`
+    with the IRR at that term (NaN when none does).
+    """
+    terms = np.asarray(list(terms), dtype=int)
+    horizon = int(terms.max())
+    schedule_inputs = build_schedule_inputs(
+        projects, policy_table, tier_table, fx_table, horizon
+    )
+    schedule = build_unlevered_schedule(horizon, **schedule_inputs)
+    cashflows = term_cashflows(
+        schedule, schedule_inputs["policy"], schedule_inputs["dismantling_cost"]
+    )[:, terms - 1, :]
+    irr = irr_solver.irr_by_term(cashflows) * 100
+
+    irr_table = pd.DataFrame(irr, index=projects.index, columns=terms)
+    irr_table.columns.name = "PPA Term"
+
+    first, found = first_term_meeting_target(irr, target_irr)
+    rows = np.arange(len(projects))
+    optimal = pd.DataFrame(
+        {
+            "Optimal Term": np.where(found, terms[first], np.nan),
+            "Unlevered Post-Tax IRR (%)": np.where(found, irr[rows, first], np.nan),
+        },
+        index=projects.index,
+    )
+
+    return irr_table, optimal
+
+
+def goal_seek_unlevered_irr(
+    target_irr: float,
+    solve_for: str,
+    schedule_inputs: dict,
+    terms=range(1, 26),
+    xtol: float = 1e-10,
+    maxiter: int = 20,
+) -> np.ndarray:
+    """
+    Value of one schedule input that makes the unlevered IRR equal target_irr.
+
+    `schedule_inputs` holds every SCHEDULE_INPUTS argument by name; values may
+    be arrays over leading (e.g. project) axes, with fx_rates running to the
+    longest term on its last axis. `solve_for` names the input to solve for and
+    its given value is the starting point. Returns shape (..., len(terms)).
+
+    The IRR hits the target exactly when the NPV at the target rate is zero.
+    Cashflows are piecewise linear in inputs such as the tariff (linear
+    revenue, with kinks only where VAT recovery switches regime), so secant
+    steps on that NPV land on the root after a handful of vectorized model
+    evaluations covering all projects and terms. Entries that do not converge
+    are NaN.
+    """
+    if solve_for not in SCHEDULE_INPUTS or solve_for in ("policy", "fx_rates"):
+        raise ValueError(f"Cannot goal-seek on schedule input '{solve_for}'.")
+
+    terms = np.asarray(list(terms), dtype=int)
+    discount = (1 + target_irr / 100) ** -np.arange(terms.max() + 1)
+
+    def per_term(value):
+        # (...) -> (..., 1) so the leading axes broadcast against terms
+        return np.asarray(value)[..., np.newaxis]
+
+    fixed = {
+        name: per_term(value)
+        for name, value in schedule_inputs.items()
+        if name not in ("policy", "fx_rates", solve_for)
+    }
+    fixed["policy"] = {
+        key: per_term(value) for key, value in schedule_inputs["policy"].items()
+    }
+    fixed["fx_rates"] = np.asarray(schedule_inputs["fx_rates"])[..., np.newaxis, :]
+
+    def npv_at_target(value: np.ndarray) -> np.ndarray:
+        schedule = build_unlevered_schedule(terms, **fixed, **{solve_for: value})
+        return schedule["Project Cashflow"] @ discount
+
+    start = per_term(schedule_inputs[solve_for]).astype(float)
+    x0 = np.broadcast_to(start, np.broadcast_shapes(start.shape, terms.shape))
+    x1 = np.where(x0 != 0, x0 * 1.1, 1.0)
+    f0 = npv_at_target(x0)
+    f1 = npv_at_target(x1)
+
+    converged = np.zeros(np.broadcast_shapes(x1.shape, f1.shape), dtype=bool)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for _ in range(maxiter):
+            x2 = np.where(converged, x1, x1 - f1 * (x1 - x0) / (f1 - f0))
+            converged |= np.abs(x2 - x1) <= xtol * np.maximum(np.abs(x1), 1)
+            if converged.all() or not np.isfinite(x2).any():
+                break
+            x0, f0 = x1, f1
+            x1, f1 = x2, npv_at_target(x2)
+
+    return np.where(converged & np.isfinite(x2), x2, np.nan)
+
+
+def goal_seek_portfolio(
+    projects: pd.DataFrame,
+    policy_table: pd.DataFrame,
+    tier_table: pd.DataFrame,
+    fx_table: pd.DataFrame,
+    solve_for: str = "tariff",
+    terms=range(1, 26),
+    target_irr: float = 12,
+) -> pd.DataFrame:
+    """
+    Per project and PPA term, the input value that makes the IRR hit target_irr.
+
+    solve_for="tariff" returns the minimum clean energy tariff (project
+    electric tariff excl. VAT); solve_for="discount" returns the maximum
+    discount on the current tariff (saving_on_electricity_tariff, as a
+    fraction). Any other SCHEDULE_INPUTS name is solved for directly.
+    """
+    terms = list(terms)
+    schedule_inputs = build_schedule_inputs(
+        projects, policy_table, tier_table, fx_table, max(terms)
+    )
+
+    input_name = (
+        "project_electric_tariff_excl_vat"
+        if solve_for in ("tariff", "discount")
+        else solve_for
+    )
+    solved = goal_seek_unlevered_irr(target_irr, input_name, schedule_inputs, terms)
+    if solve_for == "discount":
+        current_tariff = projects["current_electricity_tariff"].to_numpy(dtype=float)
+        solved = 1 - solved / current_tariff[:, np.newaxis]
+
+    result = pd.DataFrame(solved, index=projects.index, columns=terms)
+    result.columns.name = "PPA Term"
+    return result
+
+
+class PreparedProject:
+    """
+    One project's cost/VAT stack, derived once.
+
+    `inputs` holds the contractor inputs by portfolio column name
+    (PORTFOLIO_REQUIRED_COLUMNS, plus any PROJECT_INPUT_DEFAULTS override).
+    The stack (project management, contingencies, project_vat, CAPEX totals,
+    inverter replacement, ...) is computed by prepare_portfolio at
+    construction and kept in `costs`; `schedule_inputs` holds every
+    SCHEDULE_INPUTS value except the FX path, which is a view of the FX table
+    per horizon. Every method works from these, so what-ifs on the same
+    project skip the preparation, and schedules are cached per PPA term.
+    Keyword overrides of SCHEDULE_INPUTS (e.g. a different tariff) bypass
+    the cache. Nothing is shared beyond the arguments, so instances can be
+    used from several threads at once.
+    """
+
+    __slots__ = (
+        "country",
+        "inputs",
+        "costs",
+        "schedule_inputs",
+        "fx_table",
+        "_schedules",
+    )
+
+    def __init__(
+        self,
+        inputs: dict | pd.Series,
+        policy_table: pd.DataFrame | PolicySnapshot,
+        tier_table: pd.DataFrame | CapexTiers,
+        fx_table: pd.DataFrame | FxTable,
+    ):
+        self.inputs = dict(inputs)
+        self.country = self.inputs["project_country"]
+        self.fx_table = fx_table
+        policy = dict(lookup_country_policy(self.country, policy_table))
+        prepared = prepare_portfolio(
+            pd.DataFrame([self.inputs]),
+            policy_table,
+            tier_table,
+            fx_table,
+            {key: np.array([value]) for key, value in policy.items()},
         )
-        ins_exp = (
-            -insurance_risk * total_construction_cost_incl_vat * o_and_m_idx / fx_rate
+        self.costs = {
+            name: values[0].item()
+            for name, values in prepared.items()
+            if name != "policy"
+        }
+        self.schedule_inputs = {
+            name: self.costs[name] for name in SCHEDULE_INPUTS if name in self.costs
+        }
+        self.schedule_inputs["policy"] = policy
+        self._schedules: dict[int, dict[str, np.ndarray]] = {}
+
+    def inputs_to(self, horizon: int, **overrides) -> dict:
+        """SCHEDULE_INPUTS by name, with the FX path to `horizon` years."""
+        return {
+            **self.schedule_inputs,
+            "fx_rates": lookup_fx_path(self.country, self.fx_table, horizon),
+            **overrides,
+        }
+
+    def schedule(self, ppa_term: int, **overrides) -> dict[str, np.ndarray]:
+        if overrides:
+            return build_unlevered_schedule(
+                ppa_term, **self.inputs_to(ppa_term, **overrides)
+            )
+        schedule = self._schedules.get(ppa_term)
+        if schedule is None:
+            schedule = self._schedules[ppa_term] = build_unlevered_schedule(
+                ppa_term, **self.inputs_to(ppa_term)
+            )
+        return schedule
+
+    def irr(self, ppa_term: int, **overrides) -> float:
+        """Unlevered post-tax IRR (%) at one PPA term."""
+        schedule = self.schedule(ppa_term, **overrides)
+        return float(irr_solver.irr(schedule["Project Cashflow"]) * 100)
+
+    def result_table(self, ppa_term: int, **overrides) -> pd.DataFrame:
+        """The calculate_unlevered_irr table (SCHEDULE_ROWS x years)."""
+        return schedule_to_frame(self.schedule(ppa_term, **overrides))
+
+    def irr_curve(
+        self, max_term: int = 25, target_irr: float = 12, **overrides
+    ) -> Tuple[pd.Series, int | None]:
+        """search_ppa_term: IRR of every term 1..max_term and the optimal term."""
+        schedule = self.schedule(max_term, **overrides)
+        policy = overrides.get("policy", self.schedule_inputs["policy"])
+        dismantling_cost = overrides.get(
+            "dismantling_cost", self.schedule_inputs["dismantling_cost"]
         )
-        mgmt_exp = -asset_management_fee * revenue * o_and_m_idx
-        land_exp = -(land_idx * land_rent_expense) / fx_rate
-        recs_exp = (
-            -(annual_output / 1000) * rec_cost * (0.3 if recs_enabled else 0) / fx_rate
+        irr_curve = pd.Series(
+            irr_solver.irr(term_cashflows(schedule, policy, dismantling_cost)) * 100,
+            index=pd.RangeIndex(1, max_term + 1, name="PPA Term"),
+            name="Unlevered Post-Tax IRR (%)",
         )
-        dismant_exp = -dismantling_cost / fx_rate if year == ppa_term else 0
-        es_exp = -(es_reporting_excl_vat * o_and_m_idx if year <= 2 else 0) / fx_rate
-
-        total_opex = sum(
-            [o_and_m_exp, ins_exp, mgmt_exp, land_exp, recs_exp, dismant_exp, es_exp]
+        meets_target = irr_curve.index[irr_curve >= target_irr]
+        return irr_curve, int(meets_target[0]) if len(meets_target) else None
+
+    def goal_seek(
+        self, target_irr: float = 12, solve_for: str = "tariff", terms=range(1, 26)
+    ) -> pd.Series:
+        """goal_seek_portfolio for this project: one solved value per term."""
+        terms = list(terms)
+        input_name = (
+            "project_electric_tariff_excl_vat"
+            if solve_for in ("tariff", "discount")
+            else solve_for
         )
-        ebitda = revenue + total_opex
-
-        # ---- VAT schedule ----
-        vat_paid_on_capex = 0.0
-        net_op_vat = ebitda * policy["VAT"]
-        opening_balance = rows["Closing VAT Balance"][year - 1]
-        capex_vat_add = vat_paid_on_capex
-        capex_vat_rec = -min(opening_balance + capex_vat_add, net_op_vat)
-        closing_balance = opening_balance + capex_vat_add + capex_vat_rec
-
-        # --- Ungeared corporate income tax for project IRR ---
-        if year <= capex_depreciation_years:
-            base_cost = total_project_cost_excl_vat
-            if year >= inverter_replacement_year:
-                base_cost += inverter_replacement_excl_vat
-
-            capex_depreciation = -(base_cost / capex_depreciation_years) / fx_rate
-        else:
-            capex_depreciation = 0.0
-
-        project_taxable_income = ebitda + capex_depreciation
-        project_tax = -(
-            project_taxable_income
-            * policy["Corporate Tax"]
-            * rows["Corporate Tax Exemption Flag"][year]
+        solved = goal_seek_unlevered_irr(
+            target_irr, input_name, self.inputs_to(max(terms)), terms
         )
-
-        # --- Unlevered IRR Post Tax ---
-        tax_paid_ungeared = project_tax - capex_vat_rec
-        inverter_replacement = -(
-            rows["Inverter Replacement Flag"][year]
-            * inverter_replacement_excl_vat
-            / fx_rate_y1
+        if solve_for == "discount":
+            solved = 1 - solved / self.inputs["current_electricity_tariff"]
+        return pd.Series(solved, index=pd.Index(terms, name="PPA Term"))
+
+    def npv(self, ppa_term: int, discount_rate: float = 0.10, **overrides) -> float:
+        """NPV of the EBITDA of years 1..ppa_term, as printed by __main__."""
+        ebitda = self.schedule(ppa_term, **overrides)["EBITDA"][1:]
+        return float(excel_npv(discount_rate, ebitda))
+
+    def exit_values(
+        self,
+        ppa_term: int,
+        discount_rate: float = 0.10,
+        exit_years=(5, 10, 15),
+        **overrides,
+    ) -> pd.DataFrame:
+        """compute_exit_values_from_ebitda on the term's EBITDA."""
+        return compute_exit_values_from_ebitda(
+            self.schedule(ppa_term, **overrides)["EBITDA"], discount_rate, exit_years
         )
-        project_cashflow = ebitda + tax_paid_ungeared + inverter_replacement
-
-        # ---- save rows ----
-        rows["Annual Output (kWh AC)"].append(annual_output)
-        rows["Energy Price ($/kWh, escalated)"].append(energy_price)
-        rows["Total Revenue"].append(revenue)
-        rows["O&M Expense"].append(o_and_m_exp)
-        rows["Insurance Expense"].append(ins_exp)
-        rows["Management Expense"].append(mgmt_exp)
-        rows["Land Expense"].append(land_exp)
-        rows["Renewable Energy Credits"].append(recs_exp)
-        rows["Dismantling Expense"].append(dismant_exp)
-        rows["ES Expense"].append(es_exp)
-        rows["Total OPEX"].append(total_opex)
-        rows["EBITDA"].append(ebitda)
-
-        rows["VAT paid on CAPEX"].append(vat_paid_on_capex)
-        rows["Net op. VAT for Recovery"].append(net_op_vat)
-        rows["Opening VAT Balance"].append(opening_balance)
-        rows["CAPEX VAT Additions"].append(capex_vat_add)
-        rows["CAPEX VAT Recovery"].append(capex_vat_rec)
-        rows["Closing VAT Balance"].append(closing_balance)
-
-        rows["CAPEX Depreciation"].append(capex_depreciation)
-        rows["Project Taxable Income"].append(project_taxable_income)
-        rows["Project Tax"].append(project_tax)
-
-        rows["Tax Paid (ungeared)"].append(tax_paid_ungeared)
-        rows["Inverter Replacement"].append(inverter_replacement)
-        rows["Project Cashflow"].append(project_cashflow)
-
-        opening_balance = closing_balance
-
-    # ------------------- investment outflow & IRR -----------------------------------
-    irr = npf.irr(rows["Project Cashflow"]) * 100
-    df = pd.DataFrame.from_dict(rows, orient="index")
-    df = df.reindex(columns=range(0, ppa_term + 1))
-    df.index.name = "Metric"
-
-    return irr, cash_flows, df
 
 
 def excel_npv(rate, values) -> float:
@@ -627,7 +1755,7 @@ def generate_debt_schedule(
 
     df = pd.DataFrame(table_data)
     leverage = debt_facility_size / total_project_cost
-    levered_irr = npf.irr(
+    levered_irr = irr_solver.irr(
         [-(total_project_cost - debt_facility_size)] + table_data["Leveraged Cashflow"]
     )
 
@@ -681,6 +1809,17 @@ def compute_exit_values_from_ebitda(
 
 
 if __name__ == "__main__":
+    # DEBUG is a switch of this script only: the calculation functions take
+    # every input, including the policy and FX tables, as arguments
+    parser = argparse.ArgumentParser(description="Run the sample project.")
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="use today's FX rates and skip the debug tables "
+        "(default: static development rates, debug output)",
+    )
+    DEBUG = not parser.parse_args().live
+
     # Contractor Inputs
     project_capacity_kw = 1000  # UNIT: kW DC                   # (PREVIOUSLY MAPPED TO proposal_project_peak_capacity)
     percentage_invested_by_offtaker = (
@@ -727,84 +1866,48 @@ if __name__ == "__main__":
     policy_table = (
         dev_build_country_policy_table() if DEBUG else build_country_policy_table()
     )
-    fx_table = build_fx_table(policy_table)
-
-    project_management_excluding_vat, fx_rate = total_capex_usd(
-        project_capacity_kw,
-        project_country,
-        tier_table=tier_table,
-        fx_table=fx_table,
-    )
-    project_readiness_excl_vat = epc_cost_excl_vat * 0.05
-    project_es_excluding_vat = 0  # PREVIOUSLY epc_cost_excl_vat * 0.01
-    project_due_diligence_excl_vat = (
-        0  # PREVIOUSLY fx_table.at[project_country, 1] * 10000
-    )
-    project_contingenices_excluding_vat = project_contingenices_percentage * (
-        epc_cost_excl_vat
-        + project_management_excluding_vat
-        + project_es_excluding_vat
-        + project_due_diligence_excl_vat
-    )
-    total_project_cost_excl_vat = (
-        epc_cost_excl_vat
-        + project_management_excluding_vat
-        + project_readiness_excl_vat
-        + project_contingenices_excluding_vat
-        + project_es_excluding_vat
-        + project_due_diligence_excl_vat
-    )
-
-    policy = lookup_country_policy(project_country, policy_table)
+    fx_table = FxTable(policy_table)
+    policy_snapshot = PolicySnapshot(policy_table)
 
-    project_management_vat = project_management_excluding_vat * policy["VAT"]
-    project_readiness_vat = project_readiness_excl_vat * policy["VAT"]
-    project_contingencies_vat = project_contingenices_excluding_vat * policy["VAT"]
-    project_es_vat = project_es_excluding_vat * policy["VAT"]
-    project_due_diligence_vat = project_due_diligence_excl_vat * policy["VAT"]
-    project_vat = (
-        epc_cost_vat
-        + project_management_vat
-        + project_readiness_vat
-        + project_contingencies_vat
-        + project_es_vat
-        + project_due_diligence_vat
-    )
-    total_project_cost_incl_vat = total_project_cost_excl_vat + project_vat
-
-    specific_project_cost_incl_vat = (
-        (1 - percentage_invested_by_offtaker) * (epc_cost_excl_vat + epc_cost_vat)
-        + (project_vat - epc_cost_vat)
-        + (total_project_cost_excl_vat - epc_cost_excl_vat)
-    ) / project_capacity_kw
-    total_capex_incl_vat = specific_project_cost_incl_vat * project_capacity_kw
-    total_construction_cost_incl_vat = (
-        total_capex_incl_vat - project_readiness_excl_vat - project_readiness_vat
+    project = PreparedProject(
+        {
+            "project_capacity_kw": project_capacity_kw,
+            "project_country": project_country,
+            "epc_cost_excl_vat": epc_cost_excl_vat,
+            "epc_cost_vat": epc_cost_vat,
+            "current_electricity_tariff": current_electricity_tariff,
+            "electricity_forecast_p90": electricity_forecast_p90,
+            "land_rent_expense": land_rent_expense,
+            "percentage_invested_by_offtaker": percentage_invested_by_offtaker,
+            "saving_on_electricity_tariff": saving_on_electricity_tariff,
+            "asset_ownership_trasnferred": asset_ownership_trasnferred,
+            "recs_enabled": recs_enabled,
+            "project_contingenices_percentage": project_contingenices_percentage,
+            "capex_depreciation_years": capex_depreciation_years,
+            "annual_power_degradation": annual_power_degradation,
+            "inverter_replacement_year": inverter_replacement_year,
+            "insurance_risk": insurance_risk,
+            "asset_management_fee": asset_management_fee,
+            "rec_rate": rec_rate,
+        },
+        policy_snapshot,
+        tier_table,
+        fx_table,
     )
-
-    project_electric_tariff_excl_vat = current_electricity_tariff * (
-        1 - saving_on_electricity_tariff
+    costs = project.costs
+    policy = lookup_country_policy(project_country, policy_snapshot)
+    fx_rate = costs["fx_rate"]
+    total_project_cost_incl_vat = (
+        costs["total_project_cost_excl_vat"] + costs["project_vat"]
     )
-    specific_power_output = electricity_forecast_p90 / project_capacity_kw
-    capacity_factor = (project_capacity_kw * specific_power_output) / (
+    capacity_factor = (project_capacity_kw * costs["specific_power_output"]) / (
         8760 * project_capacity_kw
     )
 
-    op_maintenance_monitor_expense_excl_vat = (
-        12 * (1 - 0.2) * project_capacity_kw
-    ) * fx_rate
-    op_maintenance_monitor_expense = op_maintenance_monitor_expense_excl_vat / (
-        project_capacity_kw * 1000
-    )
-    es_reporting_excl_vat = 0  # PREVIOUSLY 0.005*epc_cost_excl_vat
-    inverter_replacement_excl_vat = 17 * project_capacity_kw * fx_rate
-    dismantling_cost = 0 if asset_ownership_trasnferred else 0.02 * epc_cost_excl_vat
-    rec_cost = rec_rate * fx_rate
-
     if DEBUG:
         print(tier_table)
         print(policy_table)
-        print(fx_table)
+        print(fx_table.to_frame())
         print(policy)
 
         print(f'Policy Corporate Tax: {policy["Corporate Tax"]}%')
@@ -814,29 +1917,35 @@ if __name__ == "__main__":
 
         print(f"EPC Cost (excl. VAT): {epc_cost_excl_vat}")
         print(
-            f"Project Management (excl. VAT): ${project_management_excluding_vat:,.2f}"
+            f'Project Management (excl. VAT): ${costs["project_management_excluding_vat"]:,.2f}'
+        )
+        print(
+            f'Project Readiness (excl. VAT): ${costs["project_readiness_excl_vat"]:,.2f}'
         )
-        print(f"Project Readiness (excl. VAT): ${project_readiness_excl_vat:,.2f}")
-        print(f"Project Contingenices: ${project_contingenices_excluding_vat:,.2f}")
-        print(f"Project ES (excl. VAT): ${project_es_excluding_vat:,.2f}")
         print(
-            f"Project Due Diligence (excl. VAT): ${project_due_diligence_excl_vat:,.2f}\n"
+            f'Project Contingenices: ${costs["project_contingenices_excluding_vat"]:,.2f}'
         )
-        print(f"Project VAT: ${project_vat:,.2f}")
-        print(f"Total Project Cost (excl. VAT): {total_project_cost_excl_vat}")
+        print(f'Project ES (excl. VAT): ${costs["project_es_excluding_vat"]:,.2f}')
+        print(
+            f'Project Due Diligence (excl. VAT): ${costs["project_due_diligence_excl_vat"]:,.2f}\n'
+        )
+        print(f'Project VAT: ${costs["project_vat"]:,.2f}')
+        print(f'Total Project Cost (excl. VAT): {costs["total_project_cost_excl_vat"]}')
         print(f"Total Project Cost (incl. VAT): {total_project_cost_incl_vat}")
-        print(f"Specific Project Cost (incl. VAT): {specific_project_cost_incl_vat}")
-        print(f"Total CAPEX (incl. VAT): {total_capex_incl_vat}")
         print(
-            f"Total Construction Cost (incl. VAT): {total_construction_cost_incl_vat}\n"
+            f'Specific Project Cost (incl. VAT): {costs["specific_project_cost_incl_vat"]}'
+        )
+        print(f'Total CAPEX (incl. VAT): {costs["total_capex_incl_vat"]}')
+        print(
+            f'Total Construction Cost (incl. VAT): {costs["total_construction_cost_incl_vat"]}\n'
         )
 
         print(f"EPC Cost VAT: ${epc_cost_vat}")
-        print(f"Project Management VAT: ${project_management_vat:,.2f}")
-        print(f"Project Readiness VAT: ${project_readiness_vat:,.2f}")
-        print(f"Project Contingenices VAT: ${project_contingencies_vat:,.2f}")
-        print(f"Project ES VAT: ${project_es_vat:,.2f}")
-        print(f"Project Due Diligence VAT: ${project_due_diligence_vat:,.2f}")
+        print(f'Project Management VAT: ${costs["project_management_vat"]:,.2f}')
+        print(f'Project Readiness VAT: ${costs["project_readiness_vat"]:,.2f}')
+        print(f'Project Contingenices VAT: ${costs["project_contingencies_vat"]:,.2f}')
+        print(f'Project ES VAT: ${costs["project_es_vat"]:,.2f}')
+        print(f'Project Due Diligence VAT: ${costs["project_due_diligence_vat"]:,.2f}')
         print(f"Project Percentage Contingencies: {project_contingenices_percentage}%")
         print(f'Policy Percentage VAT: {policy["VAT"]}%')
         print(f'Corporate Percentage Tax: {policy["Corporate Tax"]}%')
@@ -848,232 +1957,211 @@ if __name__ == "__main__":
         print(f"Current Electric tariff (excl. VAT): ${current_electricity_tariff}")
         print(f"Saving on Electric Tariff: {saving_on_electricity_tariff}%")
         print(
-            f"Project Electric tariff (excl. VAT): ${project_electric_tariff_excl_vat}"
+            f'Project Electric tariff (excl. VAT): ${costs["project_electric_tariff_excl_vat"]}'
         )
         print(f'Electric Tariff Escalator: {policy["Electric Tariff Escalator"]}%')
         print(f"Electricity Forecast P90: {electricity_forecast_p90} kWh")
-        print(f"Specific Power Output: {specific_power_output} kWh/kW DC")
+        print(f'Specific Power Output: {costs["specific_power_output"]} kWh/kW DC')
         print(f"Annual power degradation: {annual_power_degradation}%")
         print(f"Capacity Factor: {capacity_factor*100}%\n")
 
         print(f"O&M EPC (excl. VAT): ${op_maintenance_epc_excl_vat}")
         print(
-            f"O&M & Monitoring Expense (excl. VAT): ${op_maintenance_monitor_expense_excl_vat}"
+            f'O&M & Monitoring Expense (excl. VAT): ${costs["op_maintenance_monitor_expense_excl_vat"]}'
         )
-        print(f"O&M & Monitoring Expense: ${op_maintenance_monitor_expense}")
+        print(f'O&M & Monitoring Expense: ${costs["op_maintenance_monitor_expense"]}')
         print(f'O&M Escalator: {policy["O&M Escalator"]*100}%')
-        print(f"ES Reporting (excl. VAT): ${es_reporting_excl_vat}")
+        print(f'ES Reporting (excl. VAT): ${costs["es_reporting_excl_vat"]}')
         print(f'Land Rent Escalator: {policy["Land Rent Escalator"]*100}%')
-        print(f"Inverter Replacement (excl. VAT): {inverter_replacement_excl_vat}")
+        print(
+            f'Inverter Replacement (excl. VAT): {costs["inverter_replacement_excl_vat"]}'
+        )
         print(f"Inverter Replacement year: {inverter_replacement_year}")
 
         print(f"Insurance All Risk: {insurance_risk}% annual")
         print(f"Asset Managmenet fee: {asset_management_fee}% annual")
-        print(f"Dismantling Expense: {dismantling_cost}% annual")
+        print(f'Dismantling Expense: {costs["dismantling_cost"]}% annual')
         print(f"RECs Cost: ${rec_rate}/REC\n")
 
-    for ppa_term in range(1, 26):
-        irr, cash_flows, result_table = calculate_unlevered_irr(
-            ppa_term,
-            inverter_replacement_year,
-            annual_power_degradation,
-            project_country,
-            specific_power_output,
-            project_capacity_kw,
-            project_electric_tariff_excl_vat,
-            op_maintenance_monitor_expense,
-            insurance_risk,
-            total_construction_cost_incl_vat,
-            asset_management_fee,
-            land_rent_expense,
-            recs_enabled,
-            rec_cost,
-            dismantling_cost,
-            es_reporting_excl_vat,
-            policy,
-            fx_table,
-            project_vat,
-            capex_depreciation_years,
-            inverter_replacement_excl_vat,
-        )
+    irr_curve, ppa_term = project.irr_curve(25, target_irr)
+    if DEBUG:
+        print(irr_curve)
 
-        if irr >= target_irr:
-            # WE ONLY CARE ABOUT THESE OUTPUTS FOR THE CALCULATOR (STEP 1)
-            average_annual_output = sum(
-                result_table.loc["Annual Output (kWh AC)"]
-            ) / len(result_table.loc["Annual Output (kWh AC)"])
-            print(result_table.loc["EBITDA", 1:])
-            net_present_value = excel_npv(0.10, result_table.loc["EBITDA", 1:])
-            total_revenue = result_table.loc["Total Revenue"].sum()
-            total_generation = result_table.loc["Annual Output (kWh AC)"].sum()
-
-            comparison_data = {
-                "Year": [],
-                "Natural Increase in Existing Tariff": [],
-                "Offtaker Savings (annually)": [],
-                "DREX Savings (annually)": [],
-            }
+    if ppa_term is not None:
+        irr = project.irr(ppa_term)
+        result_table = project.result_table(ppa_term)
 
-            for year in range(1, int(ppa_term) + 1):
-                nat_incr_in_exist_tariff = current_electricity_tariff * (1.01) ** (
-                    year - 1
-                )
-                offtaker_savings = (
-                    nat_incr_in_exist_tariff
-                    * result_table.loc["Annual Output (kWh AC)", year]
-                )
-                drex_savings = (
-                    nat_incr_in_exist_tariff
-                    * saving_on_electricity_tariff
-                    * result_table.loc["Annual Output (kWh AC)", year]
-                )
-
-                comparison_data["Year"].append(year)
-                comparison_data["Natural Increase in Existing Tariff"].append(
-                    nat_incr_in_exist_tariff
-                )
-                comparison_data["Offtaker Savings (annually)"].append(offtaker_savings)
-                comparison_data["DREX Savings (annually)"].append(drex_savings)
-
-            comparison_df = pd.DataFrame(comparison_data).set_index("Year").T
-            average_offtaker_savings = (
-                sum(comparison_df.loc["Offtaker Savings (annually)"]) / ppa_term
-            ) - (
-                op_maintenance_monitor_expense_excl_vat
-                + insurance_risk * total_capex_incl_vat
-            )
-            direct_investment_offtaker = (
-                epc_cost_excl_vat
-                + project_management_excluding_vat
-                + project_contingenices_excluding_vat
-                + epc_cost_vat
-                + project_management_vat
-                + project_contingencies_vat
-            )
-            payback_year = np.ceil(
-                direct_investment_offtaker / average_offtaker_savings
-            )
+        # WE ONLY CARE ABOUT THESE OUTPUTS FOR THE CALCULATOR (STEP 1)
+        average_annual_output = sum(result_table.loc["Annual Output (kWh AC)"]) / len(
+            result_table.loc["Annual Output (kWh AC)"]
+        )
+        print(result_table.loc["EBITDA", 1:])
+        net_present_value = excel_npv(0.10, result_table.loc["EBITDA", 1:])
+        total_revenue = result_table.loc["Total Revenue"].sum()
+        total_generation = result_table.loc["Annual Output (kWh AC)"].sum()
+
+        comparison_data = {
+            "Year": [],
+            "Natural Increase in Existing Tariff": [],
+            "Offtaker Savings (annually)": [],
+            "DREX Savings (annually)": [],
+        }
 
-            investment_by_offtaker = percentage_invested_by_offtaker * (
-                epc_cost_excl_vat + epc_cost_vat
-            )
-            average_drex_savings = (
-                sum(comparison_df.loc["DREX Savings (annually)"]) / ppa_term
+        for year in range(1, int(ppa_term) + 1):
+            nat_incr_in_exist_tariff = current_electricity_tariff * (1.01) ** (year - 1)
+            offtaker_savings = (
+                nat_incr_in_exist_tariff
+                * result_table.loc["Annual Output (kWh AC)", year]
             )
-            average_drex_payment_annual = (
-                sum(result_table.loc["Total Revenue"]) * fx_rate / ppa_term
+            drex_savings = (
+                nat_incr_in_exist_tariff
+                * saving_on_electricity_tariff
+                * result_table.loc["Annual Output (kWh AC)", year]
             )
-            average_drex_payment_monthly = average_drex_payment_annual / 12
-
-            if DEBUG:
-                print("Comparison Table")
-                print("========================================================")
-                print(comparison_df)
-                print(f"Investment Amount by Offtaker: {investment_by_offtaker}")
-                print(f"Average DREX savings: {average_drex_savings}")
-                print(f"Average DREX payment (annually): {average_drex_payment_annual}")
-                print(f"Average DREX payment (monthly): {average_drex_payment_monthly}")
-
-            print(f"Unlevered Post-Tax IRR (%): {irr:.2f}")
-            print(f"\nOptimal Contract Term Simulation")
-            print("========================================================")
-            print(
-                f"Contract Term (Optimal Loan Term): {ppa_term} years"
-            )  # PREVIOUSLY MAPPED TO Plazo (anos)
-            print(
-                f"Discount on Existing Energy Tariff: {saving_on_electricity_tariff * 100}%"
-            )  # PREVIOUSLY MAPPED TO Discuento en la tarifa energetica vigente (%)
-            print(
-                f"Investment by Offtaker: {investment_by_offtaker}"
-            )  # PREVIOUSLY MAPPED TO Inversion por parte del Comprador (USD)
-            print(
-                f"Clean Energy Tariff: ${project_electric_tariff_excl_vat:.4f}/kWh"
-            )  # PREVIOUSLY MAPPED TO Tarifa de energia limpia (USD/kWh)
-            print(f"Average Annual Output: ${average_annual_output:.2f}")
-            print(
-                f"Equivalent Monthly Payment: ${average_drex_payment_monthly:.2f}"
-            )  # PREVIOUSLY MAPPED TO Pago mensual equivalente (USD)
-            print(
-                f"Net Present Value: ${net_present_value:.2f}"
-            )  # PREVIOUSLY MAPPED TO Valor neto actual (USD)
-            print(
-                f"Total Revenue: ${total_revenue:,.2f}"
-            )  # Total revenue over the project lifetime
-            print(
-                f"Total Generation: {total_generation:,.2f} kWh"
-            )  # Total electricity generation over project lifetime
-            print(
-                f"Payback Year: {payback_year}\n"
-            )  # Year when (cumulative revenue - cumulative O&M) / project cost >= 1
-
-            viability_data = {
-                "Current Utility": {
-                    "Plazo": payback_year,
-                    "Inversion": direct_investment_offtaker,
-                    "Tarifa actual": current_electricity_tariff,
-                    "Ahorro tarifa": "100%",
-                    "Tarifa solar": 0,
-                    "Ahorro promedio": average_offtaker_savings,
-                    "Pago promedio": 0,
-                    "Pago a": "Empresa Electrica",
-                },
-                "Solar Project": {
-                    "Plazo": ppa_term,
-                    "Inversion": investment_by_offtaker,
-                    "Tarifa actual": current_electricity_tariff,
-                    "Ahorro tarifa": f"{saving_on_electricity_tariff*100:.1f}%",
-                    "Tarifa solar": project_electric_tariff_excl_vat,
-                    "Ahorro promedio": average_drex_savings,
-                    "Pago promedio": average_drex_payment_annual,
-                    "Pago a": "SPV DREX",
-                },
-            }
 
-            viability_df = pd.DataFrame(viability_data)
-            viability_df.loc["Inversion"] = viability_df.loc["Inversion"].map(
-                "${:,.2f}".format
-            )
-            viability_df.loc["Tarifa actual"] = viability_df.loc["Tarifa actual"].map(
-                "${:.4f}".format
-            )
-            viability_df.loc["Tarifa solar"] = viability_df.loc["Tarifa solar"].map(
-                "${:.4f}".format
+            comparison_data["Year"].append(year)
+            comparison_data["Natural Increase in Existing Tariff"].append(
+                nat_incr_in_exist_tariff
             )
-            viability_df.loc["Ahorro promedio"] = viability_df.loc[
-                "Ahorro promedio"
-            ].map("${:,.2f}".format)
-            viability_df.loc["Pago promedio"] = viability_df.loc["Pago promedio"].map(
-                "${:,.2f}".format
-            )
-            viability_df = viability_df.T
+            comparison_data["Offtaker Savings (annually)"].append(offtaker_savings)
+            comparison_data["DREX Savings (annually)"].append(drex_savings)
+
+        comparison_df = pd.DataFrame(comparison_data).set_index("Year").T
+        average_offtaker_savings = (
+            sum(comparison_df.loc["Offtaker Savings (annually)"]) / ppa_term
+        ) - (
+            costs["op_maintenance_monitor_expense_excl_vat"]
+            + insurance_risk * costs["total_capex_incl_vat"]
+        )
+        direct_investment_offtaker = (
+            epc_cost_excl_vat
+            + costs["project_management_excluding_vat"]
+            + costs["project_contingenices_excluding_vat"]
+            + epc_cost_vat
+            + costs["project_management_vat"]
+            + costs["project_contingencies_vat"]
+        )
+        payback_year = np.ceil(direct_investment_offtaker / average_offtaker_savings)
 
-            print("Viability Table")
+        investment_by_offtaker = percentage_invested_by_offtaker * (
+            epc_cost_excl_vat + epc_cost_vat
+        )
+        average_drex_savings = (
+            sum(comparison_df.loc["DREX Savings (annually)"]) / ppa_term
+        )
+        average_drex_payment_annual = (
+            sum(result_table.loc["Total Revenue"]) * fx_rate / ppa_term
+        )
+        average_drex_payment_monthly = average_drex_payment_annual / 12
+
+        if DEBUG:
+            print("Comparison Table")
             print("========================================================")
-            print(viability_df)
-
-            if DEBUG:
-                debug_table = result_table.map(
-                    lambda x: f"{x:,.2f}" if isinstance(x, (int, float)) else x
-                )
-                print(debug_table)
-                debug_table.to_excel(f"debug_table_ppa_{ppa_term}.xlsx")
-
-            # --- Exit value analysis at 5, 10, 15 years (unlevered, 10% discount) ---
-            ebitda_series = result_table.loc["EBITDA"].values.astype(float)
-
-            exit_df = compute_exit_values_from_ebitda(
-                ebitda_series,
-                discount_rate=0.10,
-                exit_years=[5, 10, 15],
+            print(comparison_df)
+            print(f"Investment Amount by Offtaker: {investment_by_offtaker}")
+            print(f"Average DREX savings: {average_drex_savings}")
+            print(f"Average DREX payment (annually): {average_drex_payment_annual}")
+            print(f"Average DREX payment (monthly): {average_drex_payment_monthly}")
+
+        print(f"Unlevered Post-Tax IRR (%): {irr:.2f}")
+        print(f"\nOptimal Contract Term Simulation")
+        print("========================================================")
+        print(
+            f"Contract Term (Optimal Loan Term): {ppa_term} years"
+        )  # PREVIOUSLY MAPPED TO Plazo (anos)
+        print(
+            f"Discount on Existing Energy Tariff: {saving_on_electricity_tariff * 100}%"
+        )  # PREVIOUSLY MAPPED TO Discuento en la tarifa energetica vigente (%)
+        print(
+            f"Investment by Offtaker: {investment_by_offtaker}"
+        )  # PREVIOUSLY MAPPED TO Inversion por parte del Comprador (USD)
+        print(
+            f'Clean Energy Tariff: ${costs["project_electric_tariff_excl_vat"]:.4f}/kWh'
+        )  # PREVIOUSLY MAPPED TO Tarifa de energia limpia (USD/kWh)
+        print(f"Average Annual Output: ${average_annual_output:.2f}")
+        print(
+            f"Equivalent Monthly Payment: ${average_drex_payment_monthly:.2f}"
+        )  # PREVIOUSLY MAPPED TO Pago mensual equivalente (USD)
+        print(
+            f"Net Present Value: ${net_present_value:.2f}"
+        )  # PREVIOUSLY MAPPED TO Valor neto actual (USD)
+        print(
+            f"Total Revenue: ${total_revenue:,.2f}"
+        )  # Total revenue over the project lifetime
+        print(
+            f"Total Generation: {total_generation:,.2f} kWh"
+        )  # Total electricity generation over project lifetime
+        print(
+            f"Payback Year: {payback_year}\n"
+        )  # Year when (cumulative revenue - cumulative O&M) / project cost >= 1
+
+        viability_data = {
+            "Current Utility": {
+                "Plazo": payback_year,
+                "Inversion": direct_investment_offtaker,
+                "Tarifa actual": current_electricity_tariff,
+                "Ahorro tarifa": "100%",
+                "Tarifa solar": 0,
+                "Ahorro promedio": average_offtaker_savings,
+                "Pago promedio": 0,
+                "Pago a": "Empresa Electrica",
+            },
+            "Solar Project": {
+                "Plazo": ppa_term,
+                "Inversion": investment_by_offtaker,
+                "Tarifa actual": current_electricity_tariff,
+                "Ahorro tarifa": f"{saving_on_electricity_tariff*100:.1f}%",
+                "Tarifa solar": costs["project_electric_tariff_excl_vat"],
+                "Ahorro promedio": average_drex_savings,
+                "Pago promedio": average_drex_payment_annual,
+                "Pago a": "SPV DREX",
+            },
+        }
+
+        viability_df = pd.DataFrame(viability_data)
+        viability_df.loc["Inversion"] = viability_df.loc["Inversion"].map(
+            "${:,.2f}".format
+        )
+        viability_df.loc["Tarifa actual"] = viability_df.loc["Tarifa actual"].map(
+            "${:.4f}".format
+        )
+        viability_df.loc["Tarifa solar"] = viability_df.loc["Tarifa solar"].map(
+            "${:.4f}".format
+        )
+        viability_df.loc["Ahorro promedio"] = viability_df.loc["Ahorro promedio"].map(
+            "${:,.2f}".format
+        )
+        viability_df.loc["Pago promedio"] = viability_df.loc["Pago promedio"].map(
+            "${:,.2f}".format
+        )
+        viability_df = viability_df.T
+
+        print("Viability Table")
+        print("========================================================")
+        print(viability_df)
+
+        if DEBUG:
+            debug_table = result_table.map(
+                lambda x: f"{x:,.2f}" if isinstance(x, (int, float)) else x
             )
+            print(debug_table)
+            debug_table.to_excel(f"debug_table_ppa_{ppa_term}.xlsx")
+
+        # --- Exit value analysis at 5, 10, 15 years (unlevered, 10% discount) ---
+        ebitda_series = result_table.loc["EBITDA"].values.astype(float)
+
+        exit_df = compute_exit_values_from_ebitda(
+            ebitda_series,
+            discount_rate=0.10,
+            exit_years=[5, 10, 15],
+        )
 
-            print("\nExit Values DataFrame")
-            print(exit_df)
+        print("\nExit Values DataFrame")
+        print(exit_df)
 
-            print("\nExit Values (based on EBITDA)")
-            print("==============================================")
-            print(exit_df.applymap(lambda x: f"{x:,.2f}"))
-            break
+        print("\nExit Values (based on EBITDA)")
+        print("==============================================")
+        print(exit_df.applymap(lambda x: f"{x:,.2f}"))
 
 
 """